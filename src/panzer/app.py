@@ -1,8 +1,19 @@
 import streamlit as st
 
+from core.factory.model_factory import ModelFactory
+from core.models.torch_threads import configure_torch_threads
+from core.services.telemetry.telemetry import get_telemetry
+from core.services.telemetry.metrics_server import start_metrics_server
+from core.services.warmup.warmup import WarmupManager, build_warmup
 from web.config import (
     ASSETS_PATH,
     LOGO_CONFIG,
+    METRICS_HOST,
+    METRICS_PORT,
+    TELEMETRY_CAPACITY,
+    TORCH_INTER_OP_THREADS,
+    TORCH_INTRA_OP_THREADS,
+    WARMUP_MODELS,
 )
 
 st.set_page_config(
@@ -14,6 +25,29 @@ st.set_page_config(
 )
 st.logo(**LOGO_CONFIG)
 
+
+@st.cache_resource
+def start_warmup() -> WarmupManager:
+    """Set the torch thread counts, then preload models and open provider connections in background threads, once"""
+    configure_torch_threads(TORCH_INTRA_OP_THREADS, TORCH_INTER_OP_THREADS)
+    manager = build_warmup(WARMUP_MODELS, ModelFactory.get_model)
+    manager.start()
+    return manager
+
+
+@st.cache_resource
+def start_telemetry(_warmup: WarmupManager):
+    """Create the shared telemetry and serve it with the readiness check on the metrics endpoint, once per process"""
+    telemetry = get_telemetry(TELEMETRY_CAPACITY)
+    return start_metrics_server(telemetry, METRICS_HOST, METRICS_PORT, routes={"/health": _warmup.health})
+
+
+warmup = start_warmup()
+start_telemetry(warmup)
+
+if not warmup.is_ready():
+    st.sidebar.caption(f"Warming up: {', '.join(warmup.pending())}")
+
 customize_section = [
     st.Page(
         "web/manuscripts/prompt_template_editor.py",
@@ -25,6 +59,11 @@ customize_section = [
         title="Models",
         icon=":material/book_2:",
     ),
+    st.Page(
+        "web/manuscripts/metrics.py",
+        title="Metrics",
+        icon=":material/monitoring:",
+    ),
 ]
 
 generate_section = [
@@ -43,6 +82,11 @@ generate_section = [
         title="Speech",
         icon=":material/mic:",
     ),
+    st.Page(
+        "web/manuscripts/batch.py",
+        title="Batch",
+        icon=":material/dynamic_feed:",
+    ),
 ]
 
 
@@ -0,0 +1,55 @@
+"""Measures the cold import time and resident memory of the modules every page loads.
+
+Run from `src/panzer`:
+
+    python -m benchmarks.import_time
+
+Each module is imported in a fresh interpreter so results are not skewed by modules cached in this process.
+"""
+
+import sys
+import json
+import argparse
+import subprocess
+
+
+DEFAULT_MODULES = [
+    "core.factory.model_factory",
+    "core.models.open_ai_model",
+    "core.models.transformers_model",
+]
+
+PROBE = """
+import json, resource, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def measure(module: str, repeats: int) -> dict:
+    """Imports the module `repeats` times in fresh interpreters and keeps the fastest run."""
+    runs = []
+    for _ in range(repeats):
+        completed = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module)], capture_output=True, text=True, check=False
+        )
+        if completed.returncode != 0:
+            return {"module": module, "error": completed.stderr.strip().splitlines()[-1]}
+        runs.append(json.loads(completed.stdout))
+    best = min(runs, key=lambda run: run["seconds"])
+    return {"module": module, **best}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(json.dumps([measure(module, args.repeats) for module in args.modules], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Measures the storage backends with growing chat histories and concurrent writers.
+
+Run from `src/panzer`:
+
+    python -m benchmarks.storage_load
+    python -m benchmarks.storage_load --scales 100x20 1000x50 --backends tinydb sqlite --writers 8
+
+A scale `TxM` is one synthetic user with T threads of M messages. Each backend and scale runs in a fresh process,
+so the peak resident memory covers that case only. The case populates the user with one `upsert_chat_user` and
+then reports:
+
+- The latency of `initialize_database` (cold and repeated), `load_chat_user`, `upsert_chat_user` and
+  `load_templates`. The reported latency is the time until the call returns, which is what a page rerun waits for.
+  With write-behind the queued writes are flushed between repeats, outside the timed part.
+- The size of every file in the database directory.
+- `--writers` processes that each append `--writer-ops` single messages to their own thread of the same user, with
+  the latency percentiles per append, the overall appends per second and the number of appends that are missing
+  afterwards. Anything but 0 lost appends is a bug.
+
+A case or writer that crashes, exits with an error or does not finish within `--timeout` seconds is killed and
+reported with an `error` instead of its numbers, so the benchmark always terminates.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import resource
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+from typing import List, Tuple
+
+from data.base_storage import BaseStorage
+from data.storage_factory import STORAGE_BACKENDS, get_storage
+from data.tinydb_storage import CODECS
+from shared.data_class.chat_message import ChatMessage
+from shared.data_class.chat_thread import ChatThread
+from benchmarks.storage_serialisation import synthetic_user
+
+
+WRITE_BEHIND = "+write-behind"
+BACKENDS = [*STORAGE_BACKENDS, *(backend + WRITE_BEHIND for backend in STORAGE_BACKENDS)]
+USER = "bench"
+
+
+def parse_scale(value: str) -> Tuple[int, int]:
+    threads, _, messages = value.partition("x")
+    if not threads.isdigit() or not messages.isdigit():
+        raise argparse.ArgumentTypeError(f"{value!r} is not of the form THREADSxMESSAGES")
+    return int(threads), int(messages)
+
+
+def open_storage(backend: str, db_dir: str, codec: str) -> BaseStorage:
+    write_behind = backend.endswith(WRITE_BEHIND)
+    return get_storage(backend.removesuffix(WRITE_BEHIND), db_dir, codec, write_behind)
+
+
+def _latency(function, repeats: int, between=None) -> dict:
+    runs = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - started)
+        if between is not None:
+            between()
+    return {"best_seconds": min(runs), "median_seconds": statistics.median(runs)}
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _directory_bytes(directory: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names
+    )
+
+
+def _writer(backend: str, db_dir: str, codec: str, writer: int, ops: int, start, results) -> None:
+    storage = open_storage(backend, db_dir, codec)
+    thread = ChatThread(title=f"writer-{writer}", created_date="2024-01-01 12:00:00", usage=0, messages=[])
+    storage.create_thread(USER, thread)
+    storage.flush()
+
+    start.wait()
+    seconds = []
+    for op in range(ops):
+        started = time.perf_counter()
+        storage.append_messages(thread.id, [ChatMessage(role="user", content=f"writer {writer} message {op}")])
+        seconds.append(time.perf_counter() - started)
+    storage.flush()
+    storage.close()
+    results.put(seconds)
+
+
+def _collect(processes: list, results, count: int, deadline: float) -> list:
+    """
+    Gets `count` results before `deadline` (time.monotonic) and joins the processes.
+
+    :raises RuntimeError: A process exited with an error or the deadline passed, every process is killed.
+    """
+    collected = []
+    try:
+        while len(collected) < count:
+            try:
+                collected.append(results.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                raise RuntimeError(f"timed out after {len(collected)} of {count} results") from None
+        for process in processes:
+            process.join(max(deadline - time.monotonic(), 0))
+        failed = [process.exitcode for process in processes if process.exitcode != 0]
+        if failed:
+            raise RuntimeError(f"process exit codes {failed}")
+        return collected
+    finally:
+        _kill(processes)
+
+
+def _kill(processes: list) -> None:
+    for process in processes:
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+
+def measure_writers(backend: str, db_dir: str, codec: str, writers: int, ops: int, timeout: float) -> dict:
+    deadline = time.monotonic() + timeout
+    context = multiprocessing.get_context("spawn")
+    start, results = context.Barrier(writers + 1), context.Queue()
+    processes = [
+        context.Process(target=_writer, args=(backend, db_dir, codec, writer, ops, start, results))
+        for writer in range(writers)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        start.wait(max(deadline - time.monotonic(), 0))
+    except threading.BrokenBarrierError:
+        # A writer crashed during setup or did not reach the barrier in time.
+        _kill(processes)
+        raise RuntimeError("writers did not start in time") from None
+    started = time.perf_counter()
+    seconds = [value for batch in _collect(processes, results, writers, deadline) for value in batch]
+    elapsed = time.perf_counter() - started
+
+    storage = open_storage(backend, db_dir, codec)
+    stored = sum(
+        len(chat.messages) for chat in storage.load_chat_user(USER).chats if chat.title.startswith("writer-")
+    )
+    storage.close()
+    return {
+        "writers": writers,
+        "appends": len(seconds),
+        "appends_per_second": len(seconds) / elapsed,
+        "p50_seconds": _percentile(seconds, 0.5),
+        "p95_seconds": _percentile(seconds, 0.95),
+        "max_seconds": max(seconds),
+        "lost_appends": writers * ops - stored,
+    }
+
+
+def run_case(backend: str, scale: Tuple[int, int], args: argparse.Namespace) -> dict:
+    threads, messages = scale
+    user = synthetic_user(threads, messages, args.message_chars)
+    user.id, user.user = None, USER
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        storage = open_storage(backend, db_dir, args.codec)
+        result = {"backend": backend, "threads": threads, "messages": messages}
+
+        started = time.perf_counter()
+        storage.initialize_database(USER)
+        result["initialize_database_cold_seconds"] = time.perf_counter() - started
+        result["initialize_database"] = _latency(lambda: storage.initialize_database(USER), args.repeats)
+
+        started = time.perf_counter()
+        storage.upsert_chat_user(user)
+        storage.flush()
+        result["populate_seconds"] = time.perf_counter() - started
+
+        loaded = storage.load_chat_user(USER)
+        result["load_chat_user"] = _latency(lambda: storage.load_chat_user(USER), args.repeats)
+        result["upsert_chat_user"] = _latency(lambda: storage.upsert_chat_user(loaded), args.repeats, storage.flush)
+        result["load_templates"] = _latency(lambda: storage.load_templates(USER), args.repeats)
+        storage.close()
+        result["file_bytes"] = _directory_bytes(db_dir)
+
+        if args.writers:
+            try:
+                result["concurrent_writers"] = measure_writers(
+                    backend, db_dir, args.codec, args.writers, args.writer_ops, args.timeout
+                )
+            except RuntimeError as error:
+                result["concurrent_writers"] = {"writers": args.writers, "error": str(error)}
+
+    result["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def _case_process(backend: str, scale: Tuple[int, int], args: argparse.Namespace, results) -> None:
+    # Backends print progress, which must not end up in the JSON on stdout.
+    sys.stdout = sys.stderr
+    try:
+        results.put(run_case(backend, scale, args))
+    except Exception as error:
+        results.put({"backend": backend, "threads": scale[0], "messages": scale[1], "error": repr(error)})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="*", type=parse_scale, default=[(10, 20), (100, 20), (500, 40)])
+    parser.add_argument("--backends", nargs="*", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--message-chars", type=int, default=400)
+    parser.add_argument("--codec", choices=list(CODECS), default="orjson", help="TinyDB only")
+    parser.add_argument("--writers", type=int, default=4, help="Concurrent writer processes, 0 skips them")
+    parser.add_argument("--writer-ops", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=600.0, help="Seconds a case, or its writers, may take")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for backend in args.backends:
+        for scale in args.scales:
+            case_results = context.Queue()
+            process = context.Process(target=_case_process, args=(backend, scale, args, case_results))
+            process.start()
+            try:
+                # The case's writers get the same timeout, leave them time to report first.
+                results += _collect([process], case_results, 1, time.monotonic() + 2 * args.timeout)
+            except RuntimeError as error:
+                results.append({"backend": backend, "threads": scale[0], "messages": scale[1], "error": str(error)})
+            print(f"{backend} {scale[0]}x{scale[1]} done", file=sys.stderr)
+
+    print(json.dumps({"codec": args.codec, "message_chars": args.message_chars, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
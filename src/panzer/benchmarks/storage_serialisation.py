@@ -0,0 +1,134 @@
+"""Measures how long saving and loading a large chat history takes with each serialisation path.
+
+Run from `src/panzer`:
+
+    python -m benchmarks.storage_serialisation
+    python -m benchmarks.storage_serialisation --threads 500 --messages 40 --codecs json orjson
+
+The baseline converts the user with recursive `dataclasses.asdict` and writes it with the stdlib `json` module,
+as TinyDB's default JSONStorage does. Every other row converts with the hand-written `to_dict`/`from_dict` and
+writes through `CodecStorage` with the given codec. Codecs whose package is not installed are reported as errors.
+"""
+
+import os
+import json
+import time
+import argparse
+import tempfile
+import dataclasses
+
+from data.tinydb_storage import CODECS, CodecStorage
+from shared.data_class.chat_message import ChatMessage
+from shared.data_class.chat_thread import ChatThread
+from shared.data_class.chat_user import ChatUser
+
+
+def synthetic_user(threads: int, messages: int, message_chars: int) -> ChatUser:
+    """A user with `threads` threads of `messages` alternating user/assistant messages each."""
+    text = ("lorem ipsum dolor sit amet " * (message_chars // 27 + 1))[:message_chars]
+    chats = [
+        ChatThread(
+            title=f"Thread {t}",
+            created_date="2024-01-01 12:00:00",
+            usage=t,
+            messages=[ChatMessage(role="user" if m % 2 == 0 else "assistant", content=text) for m in range(messages)],
+        )
+        for t in range(threads)
+    ]
+    return ChatUser(id=1, user="bench", chats=chats)
+
+
+def _best(function, repeats: int) -> float:
+    runs = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - started)
+    return min(runs)
+
+
+def measure_baseline(user: ChatUser, directory: str, repeats: int) -> dict:
+    path = os.path.join(directory, "baseline.json")
+
+    def save():
+        with open(path, "w") as handle:
+            json.dump({"chat_threads": {"1": dataclasses.asdict(user)}}, handle)
+
+    def load():
+        with open(path) as handle:
+            data = json.load(handle)["chat_threads"]["1"]
+        ChatUser(
+            id=1,
+            user=data["user"],
+            chats=[
+                ChatThread(
+                    title=chat["title"],
+                    created_date=chat["created_date"],
+                    usage=chat["usage"],
+                    id=chat["id"],
+                    messages=[ChatMessage(**message) for message in chat["messages"]],
+                )
+                for chat in data["chats"]
+            ],
+        )
+
+    save_seconds = _best(save, repeats)
+    return {
+        "codec": "asdict+json",
+        "save_seconds": save_seconds,
+        "load_seconds": _best(load, repeats),
+        "file_bytes": os.path.getsize(path),
+    }
+
+
+def measure_codec(user: ChatUser, directory: str, codec: str, repeats: int) -> dict:
+    path = os.path.join(directory, f"{codec}.db")
+    try:
+        storage = CodecStorage(path, codec=codec)
+    except ImportError as error:
+        return {"codec": codec, "error": str(error)}
+
+    def save():
+        storage.write({"chat_threads": {"1": user.to_dict()}})
+
+    def load():
+        ChatUser.from_dict(storage.read()["chat_threads"]["1"], id=1)
+
+    try:
+        save_seconds = _best(save, repeats)
+        load_seconds = _best(load, repeats)
+    finally:
+        storage.close()
+    return {
+        "codec": f"to_dict+{codec}",
+        "save_seconds": save_seconds,
+        "load_seconds": load_seconds,
+        "file_bytes": os.path.getsize(path),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--message-chars", type=int, default=400)
+    parser.add_argument("--codecs", nargs="*", choices=list(CODECS), default=list(CODECS))
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    user = synthetic_user(args.threads, args.messages, args.message_chars)
+    with tempfile.TemporaryDirectory() as directory:
+        results = [measure_baseline(user, directory, args.repeats)]
+        results += [measure_codec(user, directory, codec, args.repeats) for codec in args.codecs]
+
+    baseline = results[0]
+    for result in results[1:]:
+        if "error" not in result:
+            result["save_speedup"] = baseline["save_seconds"] / result["save_seconds"]
+            result["load_speedup"] = baseline["load_seconds"] / result["load_seconds"]
+
+    print(json.dumps({"threads": args.threads, "messages": args.messages, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Measures the real-time factor (transcription time / audio duration) of each model and inference profile.
+
+Run from `src/panzer` with a representative recording:
+
+    python -m benchmarks.transcription_rtf meeting.mp3
+    python -m benchmarks.transcription_rtf meeting.mp3 --models distil-whisper/distil-large-v3 --profiles cpu-int8
+
+Every model and profile pair runs in a fresh interpreter because torch thread pools are process-wide and can only be
+configured once. An RTF below 1 means faster than real time.
+"""
+
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+from web.config import TORCH_INTER_OP_THREADS, TORCH_INTRA_OP_THREADS, TRANSCRIPTION_MODELS, TRANSCRIPTION_PROFILES
+
+
+def run_single(audio_path: str, model_id: str, profile_name: str, repeats: int) -> dict:
+    """Loads one model with one profile and times its transcriptions of the audio, keeping the fastest run."""
+    from core.models.torch_threads import configure_torch_threads
+    from core.models.transformers_model import InferenceProfile, TransformersModel
+    from core.services.audio.stream_decoder import probe_duration
+
+    configure_torch_threads(TORCH_INTRA_OP_THREADS, TORCH_INTER_OP_THREADS)
+    profile = InferenceProfile.from_dict(profile_name, TRANSCRIPTION_PROFILES[profile_name])
+    client = TransformersModel(profile=profile.to_dict())
+    with open(audio_path, "rb") as audio_file:
+        audio = audio_file.read()
+    duration = probe_duration(audio_path)
+
+    started = time.perf_counter()
+    client.load_model(model_id)
+    load_seconds = time.perf_counter() - started
+
+    runs = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = client.transcribe(audio, model_id)
+        runs.append(time.perf_counter() - started)
+
+    best = min(runs)
+    return {
+        "model": model_id,
+        "profile": profile_name,
+        "audio_seconds": duration,
+        "load_seconds": load_seconds,
+        "transcribe_seconds": best,
+        "rtf": best / duration if duration else None,
+        "characters": len(result["text"]),
+    }
+
+
+def measure(audio_path: str, model_id: str, profile_name: str, repeats: int) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.transcription_rtf", audio_path, "--single", model_id, profile_name,
+         "--repeats", str(repeats)],
+        capture_output=True,
+        text=True,
+        check=False,
+    )  # fmt: skip
+    if completed.returncode != 0:
+        error = (completed.stderr.strip().splitlines() or ["unknown error"])[-1]
+        return {"model": model_id, "profile": profile_name, "error": error}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio")
+    parser.add_argument("--models", nargs="*", default=TRANSCRIPTION_MODELS)
+    parser.add_argument("--profiles", nargs="*", default=list(TRANSCRIPTION_PROFILES))
+    parser.add_argument("--repeats", type=int, default=2, help="Timed runs per pair, the first one also warms up.")
+    parser.add_argument("--single", nargs=2, metavar=("MODEL", "PROFILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.audio, *args.single, args.repeats)))
+        return
+
+    results = [
+        measure(args.audio, model_id, profile_name, args.repeats)
+        for model_id in args.models
+        for profile_name in args.profiles
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
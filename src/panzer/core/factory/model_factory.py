@@ -1,49 +1,113 @@
-from core.models.azure_cohere_model import CohereAzureModel
-from core.models.azure_openai_model import AzureOpenAIModel
-from core.models.togetherai_model import TogetherAIModel
-from core.models.ollama_model import OllamaModel
-from core.models.open_ai_model import OpenAIModel
-from core.models.transformers_model import TransformersModel
-from core.models.base_model_client import BaseModelClient
-from typing import Optional
+import json
+import hashlib
+import importlib
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
 import streamlit as st
+
+from core.models.base_model_client import BaseModelClient
+from core.models.instrumented_model import InstrumentedModel
+from core.services.telemetry.telemetry import get_telemetry
 # TODO: Add debugging mode flag, also add logger
 
 
+def _azure_config() -> dict:
+    return {
+        "api_key": st.secrets["AZURE_OPENAI_API_KEY"],
+        "api_version": st.secrets["AZURE_API_VERSION"],
+        "azure_endpoint": st.secrets["AZURE_OPENAI_BASE"],
+        "image_endpoint": st.secrets.get("AZURE_IMAGE_ENDPOINT_BASE", None),
+        "default_headers": {"Ocp-Apim-Subscription-Key": st.secrets["AZURE_OPENAI_API_KEY"]},
+    }
+
+
+def _cohere_config() -> dict:
+    return {
+        "api_key": st.secrets["AZURE_COHERE_API_KEY"],
+        "api_version": st.secrets["AZURE_API_VERSION"],
+        "azure_endpoint": st.secrets["AZURE_COHERE_BASE"],
+    }
+
+
+def _openai_config() -> dict:
+    return {"api_key": st.secrets["OPENAI_API_KEY"]}
+
+
+def _togetherai_config() -> dict:
+    return {
+        "api_key": st.secrets["TOGETHER_AI_API_KEY"],
+        "base_url": st.secrets["TOGETHER_AI_BASE"],
+    }
+
+
+def _ollama_config() -> dict:
+    return {
+        "endpoint": st.secrets["OLLAMA_BASE"],
+        "embed_endpoint": st.secrets.get("OLLAMA_EMBED_BASE", None),
+        "embedding_model": st.secrets.get("OLLAMA_EMBEDDING_MODEL", "nomic-embed-text"),
+        "keep_alive": st.secrets.get("OLLAMA_KEEP_ALIVE", "30m"),
+    }
+
+
+def _transformers_config() -> dict:
+    # Transformers runs locally, so it must keep working when no secrets file exists.
+    try:
+        ram_budget_gb = float(st.secrets.get("TRANSFORMERS_RAM_BUDGET_GB", 8.0))
+        profile = dict(st.secrets.get("TRANSFORMERS_PROFILE", {}))
+    except Exception:
+        ram_budget_gb, profile = 8.0, {}
+    return {"ram_budget_gb": ram_budget_gb, "profile": profile}
+
+
+def _no_config() -> dict:
+    return {}
+
+
+# Provider name -> (module, class, constructor arguments). Modules are only imported when the provider is first
+# requested, so pages that talk to a remote API never pay for torch/transformers.
+PROVIDER_REGISTRY: Dict[str, Tuple[str, str, Callable[[], dict]]] = {
+    "Azure": ("core.models.azure_openai_model", "AzureOpenAIModel", _azure_config),
+    "Cohere": ("core.models.azure_cohere_model", "CohereAzureModel", _cohere_config),
+    "OpenAI": ("core.models.open_ai_model", "OpenAIModel", _openai_config),
+    "TogetherAI": ("core.models.togetherai_model", "TogetherAIModel", _togetherai_config),
+    "Ollama": ("core.models.ollama_model", "OllamaModel", _ollama_config),
+    "Transformers": ("core.models.transformers_model", "TransformersModel", _transformers_config),
+    # "Coqui": ("core.models.xtts_v2_model", "XTTSV2Model", _no_config),
+}
+
+
 class ModelFactory:
+    _clients: Dict[Tuple[str, str], BaseModelClient] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def register(model_provider: str, module_path: str, class_name: str, config: Callable[[], dict]) -> None:
+        """Adds or replaces a provider in the registry."""
+        PROVIDER_REGISTRY[model_provider] = (module_path, class_name, config)
+
     @staticmethod
     def get_model(model_provider: str, model_path: Optional[str] = None) -> BaseModelClient:
-        match model_provider:
-            case "Azure":
-                return AzureOpenAIModel(
-                    api_key=st.secrets["AZURE_OPENAI_API_KEY"],
-                    api_version=st.secrets["AZURE_API_VERSION"],
-                    azure_endpoint=st.secrets["AZURE_OPENAI_BASE"],
-                    image_endpoint=st.secrets.get("AZURE_IMAGE_ENDPOINT_BASE", None),
-                    default_headers={"Ocp-Apim-Subscription-Key": st.secrets["AZURE_OPENAI_API_KEY"]},
-                )
-            case "Cohere":
-                return CohereAzureModel(
-                    api_key=st.secrets["AZURE_COHERE_API_KEY"],
-                    api_version=st.secrets["AZURE_API_VERSION"],
-                    azure_endpoint=st.secrets["AZURE_COHERE_BASE"],
-                )
-            case "OpenAI":
-                return OpenAIModel(
-                    api_key=st.secrets["OPENAI_API_KEY"],
-                )
-            case "TogetherAI":
-                return TogetherAIModel(
-                    api_key=st.secrets["TOGETHER_AI_API_KEY"],
-                    base_url=st.secrets["TOGETHER_AI_BASE"],
-                )
-            case "Ollama":
-                return OllamaModel(
-                    endpoint=st.secrets["OLLAMA_BASE"],
-                )
-            case "Transformers":
-                return TransformersModel()
-        # elif model_provider == "Coqui":
-        # return CoquiTTSModel()
-            case _:
-                raise ValueError("Invalid Model Provider")
+        """Returns the client for a provider, importing and constructing it on first use.
+
+        Clients are cached per provider and configuration, so repeated calls with the same secrets share one client.
+        Every client is wrapped in an InstrumentedModel that records its calls into the shared telemetry.
+        """
+        if model_provider not in PROVIDER_REGISTRY:
+            raise ValueError("Invalid Model Provider")
+
+        module_path, class_name, config_builder = PROVIDER_REGISTRY[model_provider]
+        config = config_builder()
+        config_hash = hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        key = (model_provider, config_hash)
+
+        client = ModelFactory._clients.get(key)
+        if client is None:
+            # Import outside the lock so a slow provider import does not block the others.
+            module = importlib.import_module(module_path)
+            with ModelFactory._lock:
+                if key not in ModelFactory._clients:
+                    client = getattr(module, class_name)(**config)
+                    ModelFactory._clients[key] = InstrumentedModel(client, model_provider, get_telemetry())
+                client = ModelFactory._clients[key]
+        return client
@@ -74,19 +74,20 @@ class CohereAzureModel(BaseModelClient):
             url = self.azure_endpoint
             response = requests.post(
                 url,
-                json={"messages": messages},
+                json={"messages": messages, **kwargs},
                 headers={
                     "Content-Type": "application/json",
                     "Authorization": f"Bearer {self.api_key}",
                 },
             )
             response.raise_for_status()
+            ttfb = response.elapsed.total_seconds()
             response = response.json()
-            return ModelResponse(response["choices"][0]["message"], response["usage"])
+            return ModelResponse(response["choices"][0]["message"], response["usage"], {"ttfb": ttfb})
         except Exception as error:
             return ModelResponse(
                 {"role": "assistant", "content": str(error)},
-                {"completion_tokens": 1, "prompt_tokens": 2, "total_tokens": 4},
+                {"completion_tokens": 0, "prompt_tokens": 0, "total_tokens": 0},
             )
 
     def image(self) -> ImageResponse:
@@ -53,13 +53,12 @@ class AzureOpenAIModel(BaseModelClient):
             api_key=self.api_key,
             api_version=self.api_version,
             azure_endpoint=self.azure_endpoint.format(model_name),
-            **kwargs,
         )
 
         if model_name == "o1-preview":
-            response = client.chat.completions.create(model=model_name, messages=messages[1:])
+            response = client.chat.completions.create(model=model_name, messages=messages[1:], **kwargs)
         else:
-            response = client.chat.completions.create(model=model_name, messages=messages)
+            response = client.chat.completions.create(model=model_name, messages=messages, **kwargs)
         return ModelResponse(
             {"role": "assistant", "content": response.choices[0].message.content or "None"},
             {
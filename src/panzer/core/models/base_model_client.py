@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Sequence
 from core.models.responses.model_response import ModelResponse
 from core.models.responses.image_response import ImageResponse
 from core.models.responses.embedding_response import EmbeddingResponse
@@ -26,3 +27,18 @@ class BaseModelClient(ABC):
     @abstractmethod
     def embedding(self, model_name: str, messages) -> EmbeddingResponse:
         pass
+
+    def warm_up(self, model_names: Sequence[str] = ()) -> None:
+        """Opens connections and loads the given models ahead of the first real request. No-op by default."""
+        return None
+
+    def unwrap(self) -> "BaseModelClient":
+        """Returns the provider client behind any wrappers, the client itself if it is not wrapped."""
+        return self
+
+    def chat_many(self, requests, max_concurrency: int = 8, on_progress=None) -> list:
+        """Runs many chat requests concurrently and returns their results in order, see `batch_chat.chat_many`."""
+        # Imported here because the batch service itself depends on this module.
+        from core.services.batch.batch_chat import chat_many
+
+        return chat_many(self, requests, max_concurrency, on_progress)
@@ -0,0 +1,72 @@
+from typing import Sequence
+
+from core.models.base_model_client import BaseModelClient
+from core.models.responses.model_response import ModelResponse
+from core.models.responses.image_response import ImageResponse
+from core.models.responses.embedding_response import EmbeddingResponse
+from core.services.cache.response_cache import ResponseCache
+
+
+class CachedModel(BaseModelClient):
+    """Wraps any model client and serves repeated deterministic chat requests from a ResponseCache.
+
+    Only requests that are reproducible are cached: either ``temperature`` is 0 or a ``seed`` is given. Everything
+    else is passed straight through to the wrapped client.
+    """
+
+    def __init__(self, client: BaseModelClient, provider: str, cache: ResponseCache):
+        self.client = client
+        self.provider = provider
+        self.cache = cache
+
+    @staticmethod
+    def is_deterministic(params: dict) -> bool:
+        """Checks whether the request parameters pin down the model output."""
+        return params.get("temperature") == 0 or params.get("seed") is not None
+
+    def unwrap(self) -> BaseModelClient:
+        return self.client.unwrap()
+
+    def warm_up(self, model_names: Sequence[str] = ()) -> None:
+        return self.client.warm_up(model_names)
+
+    def models(self):
+        return self.client.models()
+
+    def chat(self, model_name: str, messages, **kwargs) -> ModelResponse:
+        """
+        Returns the cached response for an identical deterministic request, otherwise calls the wrapped client.
+
+        Parameters
+        ----------
+        model_name : str
+            The model to send the request to.
+        messages : list
+            The messages in the OpenAI format.
+        kwargs : dict
+            Request parameters forwarded to the wrapped client. They are part of the cache key.
+
+        Returns
+        -------
+        response : ModelResponse
+            The response from the model or the cache.
+        """
+        if not self.is_deterministic(kwargs):
+            return self.client.chat(model_name=model_name, messages=messages, **kwargs)
+
+        key = ResponseCache.fingerprint(self.provider, model_name, messages, kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        response = self.client.chat(model_name=model_name, messages=messages, **kwargs)
+        # Clients report failures as a response with no token usage, those must not be cached.
+        if response.usage and response.usage.get("total_tokens", 0) > 0:
+            self.cache.put(key, response)
+        return response
+
+    def image(self, *args, **kwargs) -> ImageResponse:
+        return self.client.image(*args, **kwargs)
+
+    def embedding(self, *args, **kwargs) -> EmbeddingResponse:
+        return self.client.embedding(*args, **kwargs)
@@ -124,7 +124,7 @@ class GenericHttpsModel(BaseModelClient):
 
         return ModelResponse(
             {"role": "assistant", "content": "Maximum number of retries exceeded."},
-            {"completion_tokens": 1, "prompt_tokens": 2, "total_tokens": 4},
+            {"completion_tokens": 0, "prompt_tokens": 0, "total_tokens": 0},
         )
 
     def image(self, model_name: str):
@@ -0,0 +1,23 @@
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class InferenceProfile:
+    """How a speech model is loaded and executed. Profiles are part of the pipeline cache key."""
+
+    name: str = "default"
+    device: Optional[str] = None
+    '''Force a device such as "cpu", by default CUDA is used when available'''
+    quantize: bool = False
+    '''Dynamic int8 quantisation of the linear layers, CPU only'''
+    compile: bool = False
+    '''Compile the encoder with torch.compile, the first call pays for the compilation'''
+
+    @classmethod
+    def from_dict(cls, name: str, data: dict) -> "InferenceProfile":
+        """Builds a profile from config settings, a `name` inside the settings takes precedence."""
+        return cls(**{"name": name, **data})
+
+    def to_dict(self) -> dict:
+        return asdict(self)
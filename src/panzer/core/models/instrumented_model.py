@@ -0,0 +1,143 @@
+import json
+import time
+from typing import Sequence
+
+from core.models.base_model_client import BaseModelClient
+from core.models.responses.model_response import ModelResponse
+from core.models.responses.image_response import ImageResponse
+from core.models.responses.embedding_response import EmbeddingResponse
+from core.services.telemetry.telemetry import CallRecord, Telemetry
+
+
+class InstrumentedModel(BaseModelClient):
+    """Wraps any model client and records latency, retries, payload sizes and token usage of every call.
+
+    Methods the wrapper does not define (e.g. `transcribe`, `load_model`, `fetch_models`) are forwarded unchanged.
+    """
+
+    def __init__(self, client: BaseModelClient, provider: str, telemetry: Telemetry):
+        self.client = client
+        self.provider = provider
+        self.telemetry = telemetry
+
+    def __getattr__(self, name: str):
+        # Only called for attributes not found on the wrapper itself.
+        if name == "client":
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+    def unwrap(self) -> BaseModelClient:
+        return self.client.unwrap()
+
+    def warm_up(self, model_names: Sequence[str] = ()) -> None:
+        return self.client.warm_up(model_names)
+
+    @staticmethod
+    def _payload_size(payload) -> int:
+        try:
+            return len(json.dumps(payload, default=str))
+        except (TypeError, ValueError):
+            return 0
+
+    def _record(
+        self,
+        call: str,
+        model_name: str,
+        started: float,
+        elapsed: float,
+        request_bytes: int,
+        response_bytes: int = 0,
+        usage=None,
+        metadata=None,
+        error: bool = False,
+    ) -> None:
+        usage = usage or {}
+        metadata = metadata or {}
+        self.telemetry.record(
+            CallRecord(
+                provider=self.provider,
+                model_name=model_name or "",
+                call=call,
+                started=started,
+                duration=elapsed,
+                ttfb=metadata.get("ttfb"),
+                retries=metadata.get("retries", 0),
+                request_bytes=request_bytes,
+                response_bytes=response_bytes,
+                prompt_tokens=usage.get("prompt_tokens", 0),
+                completion_tokens=usage.get("completion_tokens", 0),
+                error=error,
+            )
+        )
+
+    def models(self):
+        return self.client.models()
+
+    def chat(self, model_name: str, messages, **kwargs) -> ModelResponse:
+        """Calls the wrapped client's chat and records the call. Zero-usage responses are counted as errors."""
+        started, clock = time.time(), time.perf_counter()
+        request_bytes = self._payload_size(messages)
+        try:
+            response = self.client.chat(model_name=model_name, messages=messages, **kwargs)
+        except Exception:
+            self._record("chat", model_name, started, time.perf_counter() - clock, request_bytes, error=True)
+            raise
+
+        self._record(
+            "chat",
+            model_name,
+            started,
+            time.perf_counter() - clock,
+            request_bytes,
+            response_bytes=len(str(response.message.get("content", ""))),
+            usage=response.usage,
+            metadata=response.metadata,
+            error=not response.usage or response.usage.get("total_tokens", 0) == 0,
+        )
+        return response
+
+    def image(self, *args, **kwargs) -> ImageResponse:
+        started, clock = time.time(), time.perf_counter()
+        model_name = kwargs.get("model_name", args[0] if args else "")
+        request_bytes = self._payload_size([args, kwargs])
+        try:
+            response = self.client.image(*args, **kwargs)
+        except Exception:
+            self._record("image", model_name, started, time.perf_counter() - clock, request_bytes, error=True)
+            raise
+
+        self._record("image", model_name, started, time.perf_counter() - clock, request_bytes)
+        return response
+
+    def _embedding_model(self, args: tuple, kwargs: dict) -> str:
+        """
+        The model an embedding call asked for. Clients differ: Ollama takes `(texts, model_name=None)`, Together
+        `(model_name, texts)` and Azure `(text, model=...)`. Without one, the client's default embedding model.
+        """
+        model_name = kwargs.get("model_name") or kwargs.get("model")
+        if not model_name and len(args) > 1 and isinstance(args[0], str):
+            model_name = args[0]
+        return model_name or getattr(self.unwrap(), "embedding_model", "")
+
+    def embedding(self, *args, **kwargs) -> EmbeddingResponse:
+        """Calls the wrapped client's embedding and records the call under the model the response reports."""
+        started, clock = time.time(), time.perf_counter()
+        model_name = self._embedding_model(args, kwargs)
+        request_bytes = self._payload_size([args, kwargs])
+        try:
+            response = self.client.embedding(*args, **kwargs)
+        except Exception:
+            self._record("embedding", model_name, started, time.perf_counter() - clock, request_bytes, error=True)
+            raise
+
+        self._record(
+            "embedding",
+            (response.metadata or {}).get("model") or model_name,
+            started,
+            time.perf_counter() - clock,
+            request_bytes,
+            response_bytes=getattr(response.embeddings, "nbytes", 0),
+            usage=(response.metadata or {}).get("usage"),
+            metadata=response.metadata,
+        )
+        return response
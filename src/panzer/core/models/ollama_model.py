@@ -1,6 +1,9 @@
 import time
 import json
 import requests
+import numpy as np
+from typing import List, Optional, Sequence
+from urllib.parse import urljoin
 from core.models.responses.model_response import ModelResponse
 from core.models.responses.image_response import ImageResponse
 from core.models.responses.embedding_response import EmbeddingResponse
@@ -11,12 +14,35 @@ class OllamaModel(BaseModelClient):
     def __init__(
         self,
         endpoint: str,
+        embed_endpoint: Optional[str] = None,
+        embedding_model: str = "nomic-embed-text",
+        keep_alive: Optional[str] = "30m",
     ):
+        """
+        :param endpoint: URL of Ollama's chat endpoint, e.g. http://localhost:11434/api/chat.
+        :param embed_endpoint: URL of the batch embed endpoint, derived from `endpoint` when omitted.
+        :param embedding_model: Model used by `embedding` when no model is given.
+        :param keep_alive: How long Ollama keeps a model loaded after a request (e.g. "30m"), None for its default.
+        """
         self.endpoint = endpoint
+        self.embed_endpoint = embed_endpoint or urljoin(endpoint, "/api/embed")
+        self.embedding_model = embedding_model
+        self.keep_alive = keep_alive
+        # One pooled session so chat and embedding requests reuse the same keep-alive connections.
+        self.session = requests.Session()
 
     def test_connection(self):
         pass
 
+    def warm_up(self, model_names: Sequence[str] = ()) -> None:
+        """Opens the pooled connection and loads each model into memory without generating anything."""
+        self.session.get(urljoin(self.endpoint, "/api/version"), timeout=10).raise_for_status()
+        for model_name in model_names:
+            data = {"model": model_name, "messages": []}
+            if self.keep_alive is not None:
+                data["keep_alive"] = self.keep_alive
+            self.session.post(self.endpoint, json=data).raise_for_status()
+
     def models(self):
         raise NotImplementedError()
 
@@ -66,24 +92,38 @@ class OllamaModel(BaseModelClient):
                     "stream": False,
                     "messages": messages[1:],  # does not have system role
                 }
+                options = {key: kwargs[key] for key in ("temperature", "seed", "top_p") if key in kwargs}
+                if options:
+                    data["options"] = options
+                if self.keep_alive is not None:
+                    data["keep_alive"] = self.keep_alive
 
                 headers = {
                     "Content-Type": "application/json",
                 }
 
-                response = requests.post(self.endpoint, headers=headers, data=json.dumps(data))
+                response = self.session.post(self.endpoint, headers=headers, data=json.dumps(data))
 
                 if response.status_code == 200:
                     response_text = response.text
                     data = json.loads(response_text)
+                    prompt_tokens = data.get("prompt_eval_count", 0)
+                    completion_tokens = data.get("eval_count", 0)
                     return ModelResponse(
-                        data["message"], {"completion_tokens": 1, "prompt_tokens": 2, "total_tokens": 4}
+                        data["message"],
+                        {
+                            "completion_tokens": completion_tokens,
+                            "prompt_tokens": prompt_tokens,
+                            "total_tokens": prompt_tokens + completion_tokens,
+                        },
+                        {"ttfb": response.elapsed.total_seconds(), "retries": retries},
                     )
                 else:
                     error_message = f"Error: {response.status_code} - {response.text}"
                     return ModelResponse(
                         {"role": "assistant", "content": error_message},
-                        {"completion_tokens": 1, "prompt_tokens": 2, "total_tokens": 4},
+                        {"completion_tokens": 0, "prompt_tokens": 0, "total_tokens": 0},
+                        {"ttfb": response.elapsed.total_seconds(), "retries": retries},
                     )
 
             except Exception as err:
@@ -98,7 +138,8 @@ class OllamaModel(BaseModelClient):
 
         return ModelResponse(
             {"role": "assistant", "content": "Maximum number of retries exceeded."},
-            {"completion_tokens": 1, "prompt_tokens": 2, "total_tokens": 4},
+            {"completion_tokens": 0, "prompt_tokens": 0, "total_tokens": 0},
+            {"retries": retries},
         )
 
     def image(
@@ -109,6 +150,32 @@ class OllamaModel(BaseModelClient):
 
     def embedding(
         self,
-        model_name: str,
+        texts: List[str],
+        model_name: Optional[str] = None,
+        keep_alive: Optional[str] = None,
     ) -> EmbeddingResponse:
-        raise NotImplementedError()
+        """
+        Embeds a batch of texts in a single request to Ollama's embed endpoint.
+
+        :param texts: The texts to embed.
+        :param model_name: The embedding model, defaults to the client's `embedding_model`.
+        :param keep_alive: Overrides the client's keep-alive for this request.
+        :return: An EmbeddingResponse with one row per text.
+        """
+        data = {"model": model_name or self.embedding_model, "input": texts}
+        if keep_alive or self.keep_alive is not None:
+            data["keep_alive"] = keep_alive or self.keep_alive
+
+        response = self.session.post(self.embed_endpoint, json=data)
+        response.raise_for_status()
+        body = response.json()
+
+        prompt_tokens = body.get("prompt_eval_count", 0)
+        return EmbeddingResponse(
+            embeddings=np.array(body["embeddings"], dtype=np.float32),
+            metadata={
+                "model": body.get("model", data["model"]),
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 0, "total_tokens": prompt_tokens},
+                "ttfb": response.elapsed.total_seconds(),
+            },
+        )
@@ -1,3 +1,4 @@
+from typing import Sequence
 from openai import OpenAI
 from core.models.responses.model_response import ModelResponse
 from core.models.responses.image_response import ImageResponse
@@ -19,6 +20,10 @@ class OpenAIModel(BaseModelClient):
     def models(self):
         raise NotImplementedError()
 
+    def warm_up(self, model_names: Sequence[str] = ()) -> None:
+        """Opens the client's connection pool with a cheap authenticated request."""
+        self.client.models.list()
+
     def chat(self, messages, model_name: str, **kwargs) -> ModelResponse:
         """
         Sends a request to the model with exponential backoff retry policy.
@@ -37,9 +42,9 @@ class OpenAIModel(BaseModelClient):
         """
 
         try:
-            response = self.client.chat.completions.create(model=model_name, messages=messages)
+            response = self.client.chat.completions.create(model=model_name, messages=messages, **kwargs)
             return ModelResponse(
-                {"message": response.choices[0].message.content or "None"},
+                {"role": "assistant", "content": response.choices[0].message.content or "None"},
                 {
                     "completion_tokens": response.usage.completion_tokens if response.usage else 0,
                     "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
@@ -49,7 +54,7 @@ class OpenAIModel(BaseModelClient):
         except Exception as error:
             return ModelResponse(
                 {"role": "assistant", "content": str(error)},
-                {"completion_tokens": 1, "prompt_tokens": 2, "total_tokens": 4},
+                {"completion_tokens": 0, "prompt_tokens": 0, "total_tokens": 0},
             )
 
     def image(
@@ -0,0 +1,66 @@
+from typing import Sequence
+
+from core.models.base_model_client import BaseModelClient
+from core.models.responses.model_response import ModelResponse
+from core.models.responses.image_response import ImageResponse
+from core.models.responses.embedding_response import EmbeddingResponse
+from core.services.rate_limit.rate_limiter import RateLimiter, DEFAULT_COMPLETION_TOKENS
+
+
+class RateLimitedModel(BaseModelClient):
+    """Wraps any model client and shapes its chat calls to stay within the provider's request and token quotas."""
+
+    def __init__(self, client: BaseModelClient, provider: str, limiter: RateLimiter):
+        self.client = client
+        self.provider = provider
+        self.limiter = limiter
+
+    def unwrap(self) -> BaseModelClient:
+        return self.client.unwrap()
+
+    def warm_up(self, model_names: Sequence[str] = ()) -> None:
+        return self.client.warm_up(model_names)
+
+    def models(self):
+        return self.client.models()
+
+    def chat(self, model_name: str, messages, **kwargs) -> ModelResponse:
+        """
+        Waits for capacity in the shared rate limiter, then calls the wrapped client.
+
+        Parameters
+        ----------
+        model_name : str
+            The model to send the request to.
+        messages : list
+            The messages in the OpenAI format.
+        kwargs : dict
+            Request parameters forwarded to the wrapped client. `max_tokens` is used to size the reservation.
+
+        Returns
+        -------
+        response : ModelResponse
+            The response from the model.
+        """
+        estimated_tokens = self.limiter.count_tokens(messages) + kwargs.get("max_tokens", DEFAULT_COMPLETION_TOKENS)
+        reserved_tokens = self.limiter.acquire(self.provider, model_name, estimated_tokens)
+        try:
+            response = self.client.chat(model_name=model_name, messages=messages, **kwargs)
+        except Exception as error:
+            if "429" in str(error):
+                self.limiter.penalize(self.provider, model_name)
+            raise error
+
+        usage = response.usage or {}
+        if usage and usage.get("total_tokens", 0) == 0 and "429" in str(response.message):
+            self.limiter.penalize(self.provider, model_name)
+        else:
+            # Without usage the estimate stays charged, settle ignores an actual count of 0.
+            self.limiter.settle(self.provider, model_name, reserved_tokens, usage.get("total_tokens", 0))
+        return response
+
+    def image(self, *args, **kwargs) -> ImageResponse:
+        return self.client.image(*args, **kwargs)
+
+    def embedding(self, *args, **kwargs) -> EmbeddingResponse:
+        return self.client.embedding(*args, **kwargs)
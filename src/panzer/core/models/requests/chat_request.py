@@ -0,0 +1,11 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class ChatRequest:
+    model_name: str
+    '''Model to send the request to'''
+    messages: list[dict]
+    '''Messages in the OpenAI format'''
+    params: dict = field(default_factory=dict)
+    '''Additional keyword arguments for the client's chat method'''
@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+from typing import Optional
+from core.models.responses.model_response import ModelResponse
+
+
+@dataclass
+class BatchChatResult:
+    index: int
+    '''Position of the request in the submitted batch'''
+    response: Optional[ModelResponse]
+    '''The model response, None if the call raised'''
+    error: Optional[str]
+    '''Error message if the item failed, None on success'''
+    elapsed: float
+    '''Wall time of the call in seconds'''
@@ -1,9 +1,12 @@
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
 class ImageResponse:
     image_url: str | None
     '''URL of the image being returned'''
-    metadata = None
+    path: Optional[str] = None
+    '''Local copy of the image in the blob store, set once it has been downloaded'''
+    metadata: Optional[dict] = None
     '''Metadata about the image being returned'''
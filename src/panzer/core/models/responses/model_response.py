@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
@@ -7,3 +8,5 @@ class ModelResponse:
     '''Message content in the OpenAI format for the model response. '''
     usage: dict[str, int]
     '''The token usage stats for the specific response'''
+    metadata: Optional[dict] = None
+    '''Additional information about how the response was produced, e.g. whether it was served from cache'''
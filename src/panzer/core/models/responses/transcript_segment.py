@@ -0,0 +1,26 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+@dataclass
+class TranscriptSegment:
+    start: float
+    '''Start of the segment in seconds from the beginning of the audio'''
+    end: Optional[float]
+    '''End of the segment in seconds, None if the model did not predict one'''
+    text: str
+    '''Transcribed text of the segment'''
+
+    def to_chunk(self) -> dict:
+        """Returns the segment in the pipeline's chunk format."""
+        return {"timestamp": [self.start, self.end], "text": self.text}
+
+    @classmethod
+    def from_chunk(cls, chunk: dict) -> "TranscriptSegment":
+        start, end = chunk["timestamp"]
+        return cls(start=start or 0.0, end=end, text=chunk["text"].strip())
+
+
+def segments_to_result(segments: List[TranscriptSegment]) -> dict:
+    """Assembles segments into a result shaped like the pipeline output, with absolute timestamps."""
+    return {"text": " ".join(segment.text for segment in segments), "chunks": [s.to_chunk() for s in segments]}
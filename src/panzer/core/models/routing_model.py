@@ -0,0 +1,154 @@
+import time
+from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional, Tuple
+
+from core.models.base_model_client import BaseModelClient
+from core.models.responses.model_response import ModelResponse
+from core.models.responses.image_response import ImageResponse
+from core.models.responses.embedding_response import EmbeddingResponse
+from core.services.routing.latency_tracker import LatencyTracker
+
+
+@dataclass
+class ModelRoute:
+    provider: str
+    '''Name of the provider, used for latency tracking'''
+    client: BaseModelClient
+    '''Client used to reach the provider'''
+    model_name: str
+    '''Model to request from the provider'''
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}/{self.model_name}"
+
+
+class RoutingModel(BaseModelClient):
+    """Routes chat requests over an ordered list of provider/model routes.
+
+    Routes are tried in order. A route that raises or returns a response without token usage fails over to the next
+    one. With hedging enabled, if a route has not answered within its observed p95 latency the next route is started
+    as well and whichever answers first wins.
+    """
+
+    def __init__(
+        self,
+        routes: List[ModelRoute],
+        hedge: bool = True,
+        hedge_after: float = 5.0,
+        max_hedges: int = 1,
+        tracker: Optional[LatencyTracker] = None,
+    ):
+        """
+        :param routes: Routes in order of preference.
+        :param hedge: Whether to send a hedged request when a route is slower than its p95.
+        :param hedge_after: Seconds to wait before hedging while a route has too few samples for a p95.
+        :param max_hedges: Maximum number of extra requests in flight for a single call.
+        :param tracker: Latency tracker to record into, a new one is created when omitted.
+        """
+        if not routes:
+            raise ValueError("At least one route is required")
+        self.routes = routes
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.max_hedges = max_hedges
+        self.tracker = tracker or LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=len(routes) * 4, thread_name_prefix="routing")
+
+    def models(self):
+        return [route.key for route in self.routes]
+
+    def _hedge_delay(self, route: ModelRoute) -> float:
+        p95 = self.tracker.percentile(route.key, 0.95)
+        return p95 if p95 is not None else self.hedge_after
+
+    def _launch(self, route: ModelRoute, messages, kwargs: dict) -> Future:
+        started = time.perf_counter()
+        future = self._executor.submit(route.client.chat, model_name=route.model_name, messages=messages, **kwargs)
+
+        def _record(done: Future) -> None:
+            # Runs for losing hedges too, so the tracker sees every route's real latency.
+            if done.exception() is None and self._succeeded(done.result()):
+                self.tracker.record(route.key, time.perf_counter() - started)
+            else:
+                self.tracker.record_failure(route.key)
+
+        future.add_done_callback(_record)
+        return future
+
+    @staticmethod
+    def _succeeded(response: ModelResponse) -> bool:
+        return bool(response.usage) and response.usage.get("total_tokens", 0) > 0
+
+    def chat(self, model_name: str, messages, **kwargs) -> ModelResponse:
+        """
+        Sends the request over the routes with hedging and failover.
+
+        Parameters
+        ----------
+        model_name : str
+            Unused, every route carries its own model name.
+        messages : list
+            The messages in the OpenAI format.
+        kwargs : dict
+            Request parameters forwarded to every route.
+
+        Returns
+        -------
+        response : ModelResponse
+            The first successful response. Its metadata names the route that produced it. If all routes fail, the
+            last failure is returned.
+        """
+        pending: Dict[Future, Tuple[ModelRoute, float]] = {}
+        next_route = 0
+        hedges = 0
+        last_failure: Optional[ModelResponse] = None
+
+        while pending or next_route < len(self.routes):
+            if not pending:
+                route = self.routes[next_route]
+                pending[self._launch(route, messages, kwargs)] = (route, time.perf_counter())
+                next_route += 1
+                continue
+
+            timeout = None
+            if self.hedge and hedges < self.max_hedges and next_route < len(self.routes):
+                newest_route, newest_start = max(pending.values(), key=lambda item: item[1])
+                timeout = max(0.0, newest_start + self._hedge_delay(newest_route) - time.perf_counter())
+
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                route = self.routes[next_route]
+                pending[self._launch(route, messages, kwargs)] = (route, time.perf_counter())
+                next_route += 1
+                hedges += 1
+                continue
+
+            for future in done:
+                route, _ = pending.pop(future)
+                if future.exception() is not None:
+                    last_failure = ModelResponse(
+                        {"role": "assistant", "content": str(future.exception())},
+                        {"completion_tokens": 0, "prompt_tokens": 0, "total_tokens": 0},
+                    )
+                    continue
+
+                response = future.result()
+                if not self._succeeded(response):
+                    last_failure = response
+                    continue
+
+                response.metadata = {**(response.metadata or {}), "route": route.key, "hedges": hedges}
+                return response
+
+        return last_failure or ModelResponse(
+            {"role": "assistant", "content": "All routes failed."},
+            {"completion_tokens": 0, "prompt_tokens": 0, "total_tokens": 0},
+        )
+
+    def image(self, *args, **kwargs) -> ImageResponse:
+        return self.routes[0].client.image(*args, **kwargs)
+
+    def embedding(self, *args, **kwargs) -> EmbeddingResponse:
+        return self.routes[0].client.embedding(*args, **kwargs)
@@ -7,7 +7,7 @@ from core.models.responses.image_response import ImageResponse
 from core.models.responses.embedding_response import EmbeddingResponse
 from shared.data_class.aimodel import AIModel
 from core.models.base_model_client import BaseModelClient
-from typing import List
+from typing import List, Optional, Sequence, Tuple
 
 
 class TogetherAIModel(BaseModelClient):
@@ -16,45 +16,68 @@ class TogetherAIModel(BaseModelClient):
         self.api_key = api_key
         self.base_url = base_url
 
+    def warm_up(self, model_names: Sequence[str] = ()) -> None:
+        """Opens the client's connection pool with a cheap authenticated request."""
+        self.client.with_options(timeout=10).models.list()
+
     def transcribe(self, audio) -> str:
         """Transcribe audio using Open AI whisper v3"""
         raise NotImplementedError()
 
     def models(self) -> List[AIModel]:
         """Gets a list of available models"""
+        models, _ = self.fetch_models()
+        return models or []
+
+    def fetch_models(
+        self, etag: Optional[str] = None, last_modified: Optional[str] = None
+    ) -> Tuple[Optional[List[AIModel]], dict]:
+        """
+        Gets the list of available models, conditionally if validators from a previous fetch are given.
+
+        :param etag: ETag of a previously fetched list, sent as If-None-Match.
+        :param last_modified: Last-Modified of a previously fetched list, sent as If-Modified-Since.
+        :return: The models, or None if the list has not changed, and the validators of this response.
+        """
         headers = {
             "accept": "application/json",
             "content-type": "application/json",
             "Authorization": f"Bearer {self.api_key}",
         }
-        response = requests.get(f"{self.base_url}/models", headers=headers)
-        models = response.json()
-        model_objects = []
-        for model in models:
-            model_objects.append(
-                AIModel(
-                    id=model["id"],
-                    created=model["created"],
-                    type=model["type"],
-                    display_name=model["display_name"],
-                    organization=model["organization"],
-                    license=model["license"] if "license" in model.keys() else "",
-                    context_length=model["context_length"] if "context_length" in model.keys() else 0,
-                    price_input=model["pricing"]["input"],
-                    price_output=model["pricing"]["output"],
-                )
-            )
-        assert isinstance(model_objects, list)
-        assert isinstance(model_objects[0], AIModel)
-        assert len(model_objects) == len(models)
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        response = requests.get(f"{self.base_url}/models", headers=headers, timeout=30)
+        validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+        if response.status_code == 304:
+            return None, validators
 
-        return model_objects
+        response.raise_for_status()
+        return [self._parse_model(model) for model in response.json()], validators
+
+    @staticmethod
+    def _parse_model(model: dict) -> AIModel:
+        pricing = model.get("pricing", {})
+        return AIModel(
+            id=model["id"],
+            created=model["created"],
+            type=model["type"],
+            display_name=model["display_name"],
+            organization=model["organization"],
+            license=model.get("license", ""),
+            context_length=model.get("context_length", 0),
+            price_input=pricing.get("input", 0.0),
+            price_output=pricing.get("output", 0.0),
+        )
 
     # Rename to ChatResponse
     def chat(
         self,
         model_name: str,
         messages,
+        **kwargs,
     ) -> ModelResponse:
         """
         Sends a request to the model with exponential backoff retry policy.
@@ -63,6 +86,8 @@ class TogetherAIModel(BaseModelClient):
         ----------
         message : str
             The message to send to the model.
+        kwargs : dict
+            Additional keyword arguments to be passed to the ChatCompletion.create() function.
 
         Returns
         -------
@@ -71,7 +96,7 @@ class TogetherAIModel(BaseModelClient):
         """
         response = None
         try:
-            response = self.client.chat.completions.create(model=model_name, messages=messages)
+            response = self.client.chat.completions.create(model=model_name, messages=messages, **kwargs)
             return ModelResponse(
                 {"role": "assistant", "content": response.choices[0].message.content or "None"},
                 {
@@ -101,7 +126,7 @@ class TogetherAIModel(BaseModelClient):
             )
             return ImageResponse(image_url=response.data[0].url)
         except Exception as error:
-            return ImageResponse(image_url=str(error))
+            return ImageResponse(image_url=None, metadata={"error": str(error)})
 
     def embedding(self, model_name: str, texts: List[str]) -> EmbeddingResponse:
         """Generate embedding using the OpenAI library with Together AI"""
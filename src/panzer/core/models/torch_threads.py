@@ -0,0 +1,44 @@
+import logging
+import threading
+from typing import Optional, Tuple
+
+
+_settings: Tuple[Optional[int], Optional[int]] = (None, None)
+_applied = False
+_lock = threading.Lock()
+
+
+def configure_torch_threads(intra_op_threads: Optional[int], inter_op_threads: Optional[int]) -> None:
+    """
+    Records the process-wide torch thread counts, to be called once at server start. Does not import torch.
+
+    :param intra_op_threads: Threads used inside a single operator, None keeps torch's default of one per core.
+    :param inter_op_threads: Threads used to run independent operators in parallel, None keeps torch's default.
+    """
+    global _settings
+    with _lock:
+        if _applied:
+            logging.warning("Torch threads are already set, ignoring %s", (intra_op_threads, inter_op_threads))
+            return
+        _settings = (intra_op_threads, inter_op_threads)
+
+
+def apply_torch_threads() -> None:
+    """Applies the configured thread counts the first time it is called, later calls do nothing."""
+    global _applied
+    with _lock:
+        if _applied:
+            return
+        _applied = True
+        intra_op_threads, inter_op_threads = _settings
+
+    import torch
+
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError:
+            # Torch only allows this before the first parallel operator has run.
+            logging.warning("Inter-op threads are already fixed at %s", torch.get_num_interop_threads())
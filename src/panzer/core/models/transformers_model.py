@@ -1,14 +1,109 @@
+import gc
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
 from core.models.responses.model_response import ModelResponse
 from core.models.responses.image_response import ImageResponse
 from core.models.responses.embedding_response import EmbeddingResponse
+from core.models.responses.transcript_segment import TranscriptSegment, segments_to_result
 from core.models.base_model_client import BaseModelClient
+from core.models.inference_profile import InferenceProfile
+from core.models.torch_threads import apply_torch_threads
+from core.services.audio.stream_decoder import SAMPLING_RATE, iter_audio_windows, segments_for_window
+from core.services.cache.transcription_cache import TranscriptionCache
+import numpy as np
 import torch
 from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
 
 
+PipelineKey = Tuple[str, str, str, str]
+
+
+class PipelineCache:
+    """Process-wide LRU cache of loaded pipelines with a memory budget.
+
+    Every session shares the same loaded weights. Loads of different models can run in parallel, but the same model
+    is only ever loaded once. When the cached pipelines exceed the budget, the least recently used are dropped.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self._entries: "OrderedDict[PipelineKey, Tuple[object, int]]" = OrderedDict()
+        self._loading: Dict[PipelineKey, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: PipelineKey):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def get_or_load(self, key: PipelineKey, loader: Callable[[], Tuple[object, int]]):
+        """Returns the cached pipeline for the key, calling `loader` (returning pipeline and size) on a miss."""
+        with self._lock:
+            pipe = self._lookup(key)
+            if pipe is not None:
+                return pipe
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                pipe = self._lookup(key)
+                if pipe is not None:
+                    return pipe
+
+            pipe, size = loader()
+            with self._lock:
+                self._entries[key] = (pipe, size)
+                self._loading.pop(key, None)
+                self._evict()
+            return pipe
+
+    def _evict(self) -> None:
+        # The most recently used pipeline is always kept, even if it alone exceeds the budget.
+        evicted = False
+        while len(self._entries) > 1 and self.memory_usage() > self.budget_bytes:
+            self._entries.popitem(last=False)
+            evicted = True
+        if evicted:
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    def memory_usage(self) -> int:
+        return sum(size for _, size in self._entries.values())
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+
+def _model_size(model) -> int:
+    """Bytes held by the model's weights, including the packed weights of quantised layers."""
+    size = 0
+    for value in model.state_dict().values():
+        tensors = value if isinstance(value, tuple) else (value,)
+        size += sum(tensor.numel() * tensor.element_size() for tensor in tensors if isinstance(tensor, torch.Tensor))
+    return size
+
+
 class TransformersModel(BaseModelClient):
-    def __init__(self) -> None:
-        pass
+    _pipelines: Optional[PipelineCache] = None
+    _pipelines_lock = threading.Lock()
+
+    def __init__(self, ram_budget_gb: float = 8.0, profile: Optional[dict] = None) -> None:
+        """
+        :param ram_budget_gb: Memory the process-wide pipeline cache may hold before evicting the least recently used.
+        :param profile: Default InferenceProfile fields, used by calls that do not pass their own profile.
+        """
+        with TransformersModel._pipelines_lock:
+            if TransformersModel._pipelines is None:
+                TransformersModel._pipelines = PipelineCache(int(ram_budget_gb * 1024**3))
+        self.model_id: Optional[str] = None
+        self.profile = InferenceProfile.from_dict("configured", profile) if profile else InferenceProfile()
 
     def chat(
         self,
@@ -19,11 +114,23 @@ class TransformersModel(BaseModelClient):
     def models(self):
         raise NotImplementedError()
 
-    def load_model(self, model_id) -> None:
-        # TODO add support for using cache, downloaed model, or specify local model path
-        device = "cuda:0" if torch.cuda.is_available() else "cpu"
-        torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+    def load_model(self, model_id, profile: Optional[InferenceProfile] = None) -> None:
+        """Selects the model used by `transcribe`, loading it into the shared pipeline cache if needed."""
+        self._get_pipeline(model_id, profile)
+        self.model_id = model_id
 
+    def _get_pipeline(self, model_id: str, profile: Optional[InferenceProfile] = None):
+        profile = profile or self.profile
+        device = profile.device or ("cuda:0" if torch.cuda.is_available() else "cpu")
+        torch_dtype = torch.float16 if device.startswith("cuda") else torch.float32
+        key = (model_id, str(torch_dtype), device, repr(profile))
+        return self._pipelines.get_or_load(key, lambda: self._build_pipeline(model_id, torch_dtype, device, profile))
+
+    @staticmethod
+    def _build_pipeline(model_id: str, torch_dtype, device: str, profile: InferenceProfile) -> Tuple[object, int]:
+        # Thread pools are process-wide, they come from the server config and never from a session's profile.
+        apply_torch_threads()
+        # TODO add support for using downloaded model, or specify local model path
         model = AutoModelForSpeechSeq2Seq.from_pretrained(
             model_id, torch_dtype=torch_dtype, low_cpu_mem_usage=True, use_safetensors=True
         )
@@ -31,6 +138,14 @@ class TransformersModel(BaseModelClient):
         # model_path = pathlib.Path(model_path)
 
         model.to(device)
+        if profile.quantize:
+            if device == "cpu":
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            else:
+                logging.warning("Profile %s asks for int8 quantisation, which is only supported on CPU", profile.name)
+        if profile.compile:
+            encoder = model.get_encoder()
+            encoder.forward = torch.compile(encoder.forward)
         processor = AutoProcessor.from_pretrained(model_id)
 
         pipe = pipeline(
@@ -45,18 +160,112 @@ class TransformersModel(BaseModelClient):
             torch_dtype=torch_dtype,
             device=device,
         )
-        self.pipe = pipe
+        return pipe, _model_size(model)
+
+    def warm_up(self, model_names: Sequence[str] = ()) -> None:
+        """Downloads and loads each listed model so the first transcription does not pay for it."""
+        for model_id in model_names:
+            self.load_model(model_id)
 
-    def transcribe(self, audio, model_path) -> dict:
-        """Transcribe audio using Open AI whisper v3 and the transformers library"""
+    def cache_scope(self, model_id: str, profile: Optional[InferenceProfile] = None, **options) -> dict:
+        """Returns what, besides the audio, determines a transcription result, for use as TranscriptionCache scope.
 
-        if not self.pipe:
-            self.load_model(model_id="openai/whisper-large-v3")
+        Compilation only changes speed, so results are shared between profiles differing in that.
+        """
+        settings = (profile or self.profile).to_dict()
+        for name in ("name", "compile"):
+            settings.pop(name)
+        return {"model_id": model_id, "profile": settings, **options}
 
-        result = self.pipe(audio)
+    def transcribe(
+        self,
+        audio,
+        model_path: Optional[str] = None,
+        profile: Optional[InferenceProfile] = None,
+        cache: Optional[TranscriptionCache] = None,
+    ) -> dict:
+        """Transcribe audio using Open AI whisper v3 and the transformers library
+
+        `model_path` selects the model for this call only, so sessions sharing this client cannot switch it under
+        each other. Without it the model chosen by `load_model` is used. With a `cache`, audio given as bytes is
+        looked up by content first and the result is stored for the next upload of the same file.
+        """
+        model_id = model_path or self.model_id or "openai/whisper-large-v3"
+        key = None
+        if cache is not None and isinstance(audio, (bytes, bytearray)):
+            key = cache.key(audio, self.cache_scope(model_id, profile, mode="full"))
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        result = self._get_pipeline(model_id, profile)(audio)
+        if key is not None:
+            cache.put(key, result)
 
         return result  # type: ignore
 
+    def transcribe_stream(
+        self,
+        audio,
+        model_path: Optional[str] = None,
+        window_s: float = 30.0,
+        overlap_s: float = 4.0,
+        profile: Optional[InferenceProfile] = None,
+        cache: Optional[TranscriptionCache] = None,
+    ) -> Iterator[TranscriptSegment]:
+        """
+        Transcribes audio window by window and yields timestamped segments as soon as each window is done.
+
+        Only one window of decoded audio is held at a time, so memory does not grow with the length of the file.
+        Windows overlap and each segment is emitted by the window in which it starts furthest from the edges, so
+        segments are neither duplicated nor cut at window boundaries.
+
+        :param audio: Encoded audio as bytes or a path to an audio or video file.
+        :param model_path: The model to use for this call, see `transcribe`.
+        :param window_s: Seconds of audio per window, 30 s matches Whisper's receptive field.
+        :param overlap_s: Seconds shared by consecutive windows.
+        :param profile: How to load and run the model, defaults to the client's profile.
+        :param cache: Replays a cached result for audio given as bytes, and stores the result once the stream has
+            been consumed to the end.
+        :return: A generator of TranscriptSegment in audio order.
+        """
+        model_id = model_path or self.model_id or "openai/whisper-large-v3"
+        key = None
+        if cache is not None and isinstance(audio, (bytes, bytearray)):
+            scope = self.cache_scope(model_id, profile, mode="windowed", window_s=window_s, overlap_s=overlap_s)
+            key = cache.key(audio, scope)
+            cached = cache.get(key)
+            if cached is not None:
+                yield from (TranscriptSegment.from_chunk(chunk) for chunk in cached["chunks"])
+                return
+
+        pipe = self._get_pipeline(model_id, profile)
+        segments = []
+        for window in iter_audio_windows(audio, window_s=window_s, overlap_s=overlap_s):
+            result = pipe({"raw": window.samples, "sampling_rate": SAMPLING_RATE})
+            for segment in segments_for_window(window, result.get("chunks", []), window_s, overlap_s):
+                segments.append(segment)
+                yield segment
+
+        if key is not None:
+            cache.put(key, segments_to_result(segments))
+
+    def transcribe_batch(
+        self, windows: Sequence[np.ndarray], model_path: Optional[str] = None, profile: Optional[InferenceProfile] = None
+    ) -> List[dict]:
+        """
+        Transcribes several decoded windows in one pipeline call so they share forward passes.
+
+        :param windows: Mono float32 PCM at 16 kHz, each at most 30 s long. They may come from different files.
+        :param model_path: The model to use for this call, see `transcribe`.
+        :param profile: How to load and run the model, defaults to the client's profile.
+        :return: One pipeline result per window, in the same order.
+        """
+        model_id = model_path or self.model_id or "openai/whisper-large-v3"
+        pipe = self._get_pipeline(model_id, profile)
+        inputs = [{"raw": samples, "sampling_rate": SAMPLING_RATE} for samples in windows]
+        return pipe(inputs, batch_size=max(len(inputs), 1))
+
     def image(
         self,
         model_name: str,
@@ -0,0 +1,148 @@
+import os
+import shutil
+import subprocess
+import threading
+from dataclasses import dataclass
+from typing import IO, Iterator, List, Optional, Union
+
+import numpy as np
+
+from core.models.responses.transcript_segment import TranscriptSegment
+
+
+SAMPLING_RATE = 16000
+'''Sampling rate expected by Whisper feature extractors'''
+
+_SAMPLE_BYTES = np.dtype(np.float32).itemsize
+
+
+@dataclass
+class AudioWindow:
+    start: float
+    '''Offset of the first sample in seconds from the beginning of the audio'''
+    samples: np.ndarray
+    '''Mono float32 PCM at SAMPLING_RATE'''
+    is_last: bool
+    '''True for the final window of the audio'''
+
+
+def _feed(stdin: IO[bytes], data: bytes) -> None:
+    # Writing from a separate thread keeps ffmpeg from blocking on a full stdout pipe while we are still writing.
+    try:
+        stdin.write(data)
+    except BrokenPipeError:
+        pass
+    finally:
+        stdin.close()
+
+
+def _read_exact(stream: IO[bytes], size: int) -> bytes:
+    chunks, remaining = [], size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def iter_audio_windows(
+    audio: Union[bytes, str, os.PathLike],
+    window_s: float = 30.0,
+    overlap_s: float = 4.0,
+    sampling_rate: int = SAMPLING_RATE,
+) -> Iterator[AudioWindow]:
+    """
+    Decodes any ffmpeg-readable audio into overlapping mono PCM windows without holding the whole file in memory.
+
+    Consecutive windows overlap by `overlap_s` seconds so a word cut at the edge of one window is complete in the
+    next. At most one window of samples is buffered at any time.
+
+    :param audio: Encoded audio as bytes or a path to an audio or video file.
+    :param window_s: Length of each window in seconds.
+    :param overlap_s: Overlap between consecutive windows in seconds, must be shorter than the window.
+    :param sampling_rate: Sampling rate to resample to.
+    :return: A generator of AudioWindow.
+    """
+    if not 0 <= overlap_s < window_s:
+        raise ValueError(f"overlap_s must be in [0, {window_s}), got {overlap_s}")
+    if shutil.which("ffmpeg") is None:
+        raise ValueError("ffmpeg was not found, it is required to decode audio files")
+
+    window = int(window_s * sampling_rate)
+    hop = window - int(overlap_s * sampling_rate)
+    source = "pipe:0" if isinstance(audio, (bytes, bytearray)) else os.fspath(audio)
+    command = ["ffmpeg", "-loglevel", "quiet", "-i", source, "-ac", "1", "-ar", str(sampling_rate), "-f", "f32le", "pipe:1"]
+
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE if source == "pipe:0" else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+    )
+    if source == "pipe:0":
+        threading.Thread(target=_feed, args=(process.stdin, bytes(audio)), daemon=True).start()
+
+    try:
+        buffer = np.empty(0, dtype=np.float32)
+        start_sample = 0
+        while True:
+            needed = window - len(buffer)
+            data = _read_exact(process.stdout, needed * _SAMPLE_BYTES)
+            data = data[: len(data) - len(data) % _SAMPLE_BYTES]
+            buffer = np.concatenate([buffer, np.frombuffer(data, dtype=np.float32)])
+            is_last = len(data) < needed * _SAMPLE_BYTES
+            if len(buffer):
+                yield AudioWindow(start=start_sample / sampling_rate, samples=buffer, is_last=is_last)
+            if is_last:
+                break
+            buffer = buffer[hop:].copy()
+            start_sample += hop
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+
+
+def probe_duration(audio: Union[bytes, str, os.PathLike]) -> Optional[float]:
+    """Returns the duration of the audio in seconds, or None if ffprobe is missing or cannot tell."""
+    if shutil.which("ffprobe") is None:
+        return None
+    source = "pipe:0" if isinstance(audio, (bytes, bytearray)) else os.fspath(audio)
+    command = ["ffprobe", "-v", "quiet", "-show_entries", "format=duration", "-of", "csv=p=0", "-i", source]
+    try:
+        completed = subprocess.run(
+            command,
+            input=bytes(audio) if source == "pipe:0" else None,
+            stdout=subprocess.PIPE,
+            timeout=60,
+        )
+        return float(completed.stdout.decode().strip())
+    except (subprocess.SubprocessError, ValueError):
+        return None
+
+
+def segments_for_window(
+    window: AudioWindow, chunks: List[dict], window_s: float, overlap_s: float
+) -> List[TranscriptSegment]:
+    """
+    Converts the pipeline chunks of one window into segments on the audio timeline.
+
+    Only segments starting in the part of the window it owns are kept: from the middle of the overlap with the
+    previous window to the middle of the overlap with the next one. Every segment is therefore emitted exactly once
+    and by the window that has the most context around it.
+    """
+    margin = overlap_s / 2
+    owned_from = window.start + margin if window.start > 0 else 0.0
+    owned_to = float("inf") if window.is_last else window.start + window_s - margin
+
+    segments = []
+    for chunk in chunks:
+        start, end = chunk["timestamp"]
+        start = window.start + (start or 0.0)
+        text = chunk["text"].strip()
+        if owned_from <= start < owned_to and text:
+            segments.append(
+                TranscriptSegment(start=start, end=window.start + end if end is not None else None, text=text)
+            )
+    return segments
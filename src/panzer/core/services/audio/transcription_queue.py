@@ -0,0 +1,227 @@
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.models.responses.transcript_segment import TranscriptSegment, segments_to_result
+from core.services.audio.stream_decoder import (
+    SAMPLING_RATE,
+    AudioWindow,
+    iter_audio_windows,
+    probe_duration,
+    segments_for_window,
+)
+from core.services.cache.transcription_cache import TranscriptionCache
+
+
+@dataclass
+class TranscriptionJob:
+    id: str
+    name: str
+    status: str = "queued"
+    '''One of queued, running, done or failed'''
+    duration: Optional[float] = None
+    '''Length of the audio in seconds, None when it could not be probed'''
+    processed_seconds: float = 0.0
+    segments: List[TranscriptSegment] = field(default_factory=list)
+    error: Optional[str] = None
+    finished_at: Optional[float] = None
+    '''time.monotonic() when the job became done or failed'''
+
+    @property
+    def progress(self) -> Optional[float]:
+        """Fraction of the audio transcribed, None while the duration is unknown and the job is not finished."""
+        if self.status == "done":
+            return 1.0
+        if not self.duration:
+            return None
+        return min(self.processed_seconds / self.duration, 1.0)
+
+    @property
+    def text(self) -> str:
+        return " ".join(segment.text for segment in self.segments)
+
+
+class TranscriptionQueue:
+    """Transcribes many files on a dedicated worker thread, packing their windows into full batches.
+
+    Windows are pulled round-robin from every active file, so a batch is filled across files instead of leaving
+    the tail of each file to run in a small batch. At most one window of decoded audio is held per active file.
+    Finished jobs, transcript included, are dropped `job_ttl_s` seconds after they finished.
+    """
+
+    def __init__(
+        self,
+        transcribe_batch: Callable[[Sequence[np.ndarray]], List[dict]],
+        batch_size: int = 16,
+        window_s: float = 30.0,
+        overlap_s: float = 4.0,
+        cache: Optional[TranscriptionCache] = None,
+        cache_scope: Optional[dict] = None,
+        job_ttl_s: float = 3600.0,
+    ):
+        """
+        :param transcribe_batch: Transcribes a list of windows, normally `TransformersModel.transcribe_batch`.
+        :param batch_size: Windows per pipeline call, match the pipeline's batch size.
+        :param window_s: Seconds of audio per window.
+        :param overlap_s: Seconds shared by consecutive windows of a file.
+        :param cache: Files with a cached result finish on submit, finished files are added to the cache.
+        :param cache_scope: Model and options the results depend on, see `TransformersModel.cache_scope`.
+        :param job_ttl_s: Seconds a done or failed job stays available to `get` and `jobs`.
+        """
+        self.transcribe_batch = transcribe_batch
+        self.batch_size = batch_size
+        self.window_s = window_s
+        self.overlap_s = overlap_s
+        self.job_ttl_s = job_ttl_s
+        self._jobs: Dict[str, TranscriptionJob] = {}
+        self._pending: Deque[Tuple[TranscriptionJob, bytes]] = deque()
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self.cache = cache
+        self.cache_scope = {**(cache_scope or {}), "mode": "windowed", "window_s": window_s, "overlap_s": overlap_s}
+        self._cache_keys: Dict[str, str] = {}
+
+    def submit(self, name: str, audio: bytes) -> str:
+        """Queues a file for transcription and returns its job id."""
+        job = TranscriptionJob(id=uuid.uuid4().hex, name=name)
+        if self.cache is not None:
+            key = self.cache.key(audio, self.cache_scope)
+            cached = self.cache.get(key)
+            if cached is not None:
+                job.segments = [TranscriptSegment.from_chunk(chunk) for chunk in cached["chunks"]]
+                self._finish(job)
+                with self._condition:
+                    self._evict()
+                    self._jobs[job.id] = job
+                return job.id
+            self._cache_keys[job.id] = key
+
+        with self._condition:
+            self._evict()
+            self._jobs[job.id] = job
+            self._pending.append((job, audio))
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True, name="transcription-queue")
+                self._worker.start()
+            self._condition.notify()
+        return job.id
+
+    def get(self, job_id: str) -> Optional[TranscriptionJob]:
+        """The job, None if it is unknown or was finished longer than `job_ttl_s` ago."""
+        with self._condition:
+            self._evict()
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[TranscriptionJob]:
+        with self._condition:
+            self._evict()
+            return list(self._jobs.values())
+
+    def _evict(self) -> None:
+        """Drops jobs that finished more than `job_ttl_s` ago. Must be called with the condition held."""
+        expired = time.monotonic() - self.job_ttl_s
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and job.finished_at < expired:
+                del self._jobs[job_id]
+
+    @staticmethod
+    def _finish(job: TranscriptionJob, error: Optional[str] = None) -> None:
+        job.status, job.error = ("failed", error) if error is not None else ("done", None)
+        job.finished_at = time.monotonic()
+
+    def is_busy(self) -> bool:
+        return any(job.status in ("queued", "running") for job in self.jobs())
+
+    def _activate(self, job: TranscriptionJob, audio: bytes) -> Iterator[AudioWindow]:
+        job.status = "running"
+        job.duration = probe_duration(audio)
+        return iter_audio_windows(audio, window_s=self.window_s, overlap_s=self.overlap_s)
+
+    def _fill_batch(self, active: Dict[str, Tuple[TranscriptionJob, Iterator[AudioWindow]]]):
+        """
+        Takes windows round-robin from active jobs, admitting queued jobs as long as the batch is not full.
+
+        :return: The batch of (job, window) and the jobs whose audio was fully decoded while filling it.
+        """
+        batch: List[Tuple[TranscriptionJob, AudioWindow]] = []
+        finished: List[TranscriptionJob] = []
+        while len(batch) < self.batch_size:
+            while len(active) < self.batch_size:
+                with self._condition:
+                    if not self._pending:
+                        break
+                    job, audio = self._pending.popleft()
+                active[job.id] = (job, self._activate(job, audio))
+            if not active:
+                break
+
+            for job_id, (job, windows) in list(itertools.islice(active.items(), self.batch_size - len(batch))):
+                try:
+                    batch.append((job, next(windows)))
+                except StopIteration:
+                    del active[job_id]
+                    finished.append(job)
+                except Exception as error:
+                    logging.error("Decoding %s failed: %s", job.name, error)
+                    del active[job_id]
+                    self._cache_keys.pop(job_id, None)
+                    self._finish(job, str(error))
+        return batch, finished
+
+    def _run(self) -> None:
+        active: Dict[str, Tuple[TranscriptionJob, Iterator[AudioWindow]]] = {}
+        while True:
+            with self._condition:
+                while not self._pending and not active:
+                    self._condition.wait()
+
+            batch, finished = self._fill_batch(active)
+            if batch:
+                self._process(batch, active)
+
+            # A job is only done once the batch holding its last window has been transcribed.
+            for job in finished:
+                if job.status == "running":
+                    self._finish(job)
+                    self._store(job)
+
+    def _store(self, job: TranscriptionJob) -> None:
+        key = self._cache_keys.pop(job.id, None)
+        if self.cache is not None and key is not None:
+            try:
+                self.cache.put(key, segments_to_result(job.segments))
+            except OSError as error:
+                logging.error("Could not cache the transcript of %s: %s", job.name, error)
+
+    def _process(
+        self,
+        batch: List[Tuple[TranscriptionJob, AudioWindow]],
+        active: Dict[str, Tuple[TranscriptionJob, Iterator[AudioWindow]]],
+    ) -> None:
+        try:
+            results = self.transcribe_batch([window.samples for _, window in batch])
+        except Exception as error:
+            logging.error("Transcription batch failed: %s", error)
+            for job, _ in batch:
+                _, windows = active.pop(job.id, (job, None))
+                if windows is not None:
+                    # Stops the job's ffmpeg decoder instead of leaving it to the garbage collector.
+                    windows.close()
+                self._cache_keys.pop(job.id, None)
+                if job.status == "running":
+                    self._finish(job, str(error))
+            return
+
+        for (job, window), result in zip(batch, results):
+            if job.status != "running":
+                continue
+            chunks = result.get("chunks", [])
+            job.segments.extend(segments_for_window(window, chunks, self.window_s, self.overlap_s))
+            job.processed_seconds = window.start + len(window.samples) / SAMPLING_RATE
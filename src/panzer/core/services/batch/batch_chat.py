@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, List, Optional
+
+from core.models.base_model_client import BaseModelClient
+from core.models.requests.chat_request import ChatRequest
+from core.models.responses.batch_chat_response import BatchChatResult
+
+
+ProgressCallback = Callable[[int, int, BatchChatResult], None]
+
+
+def _run_one(client: BaseModelClient, index: int, request: ChatRequest) -> BatchChatResult:
+    started = time.perf_counter()
+    try:
+        response = client.chat(model_name=request.model_name, messages=request.messages, **request.params)
+    except Exception as error:
+        return BatchChatResult(index, None, str(error), time.perf_counter() - started)
+
+    error = None
+    # Clients report failures as a response without token usage.
+    if not response.usage or response.usage.get("total_tokens", 0) == 0:
+        error = response.message.get("content", "Request failed")
+    return BatchChatResult(index, response, error, time.perf_counter() - started)
+
+
+def iter_chat_many(
+    client: BaseModelClient, requests: List[ChatRequest], max_concurrency: int = 8
+) -> Iterator[BatchChatResult]:
+    """
+    Runs chat requests with at most `max_concurrency` in flight and yields results as they complete.
+
+    :param client: Any model client, ideally rate limited so concurrency is capped by the provider quota.
+    :param requests: The requests to run.
+    :param max_concurrency: Maximum number of requests in flight.
+    :return: An iterator of results in completion order. Use `BatchChatResult.index` to restore request order.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="chat-many") as executor:
+        futures = [executor.submit(_run_one, client, i, request) for i, request in enumerate(requests)]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def chat_many(
+    client: BaseModelClient,
+    requests: List[ChatRequest],
+    max_concurrency: int = 8,
+    on_progress: Optional[ProgressCallback] = None,
+) -> List[BatchChatResult]:
+    """
+    Runs chat requests concurrently and returns the results in request order.
+
+    A failing item is reported in its result's `error` field and does not abort the rest of the batch.
+
+    :param client: Any model client.
+    :param requests: The requests to run.
+    :param max_concurrency: Maximum number of requests in flight.
+    :param on_progress: Called with (completed, total, result) each time an item finishes.
+    :return: One result per request, in the same order as `requests`.
+    """
+    results: List[Optional[BatchChatResult]] = [None] * len(requests)
+    for completed, result in enumerate(iter_chat_many(client, requests, max_concurrency), start=1):
+        results[result.index] = result
+        if on_progress is not None:
+            on_progress(completed, len(requests), result)
+    return results  # type: ignore
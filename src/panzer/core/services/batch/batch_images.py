@@ -0,0 +1,78 @@
+import time
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Optional
+
+import requests
+
+from core.models.base_model_client import BaseModelClient
+from core.models.responses.image_response import ImageResponse
+from core.services.cache.blob_store import BlobStore
+
+
+DOWNLOAD_TIMEOUT_SECONDS = 60
+
+# One pooled session for every download, image hosts are few and connections are reused.
+_session = requests.Session()
+
+
+def _download(url: str, store: BlobStore) -> str:
+    """Downloads the image into the blob store and returns its local path."""
+    response = _session.get(url, timeout=DOWNLOAD_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+    suffix = mimetypes.guess_extension(content_type) or ".png"
+    return store.put(response.content, suffix=suffix)
+
+
+def _generate_one(
+    client: BaseModelClient, index: int, model_name: str, prompt: str, store: BlobStore
+) -> ImageResponse:
+    started = time.perf_counter()
+    try:
+        response = client.image(model_name=model_name, prompt=prompt)
+        if not response.image_url:
+            raise ValueError((response.metadata or {}).get("error", "No image was returned"))
+        path = _download(response.image_url, store)
+    except Exception as error:
+        return ImageResponse(None, metadata={"index": index, "error": str(error)})
+
+    metadata = {**(response.metadata or {}), "index": index, "elapsed": time.perf_counter() - started}
+    return ImageResponse(response.image_url, path=path, metadata=metadata)
+
+
+def iter_generate_images(
+    client: BaseModelClient, model_name: str, prompt: str, n: int, store: BlobStore, max_concurrency: int = 4
+) -> Iterator[ImageResponse]:
+    """
+    Generates `n` images from one prompt concurrently and yields each once it is stored locally.
+
+    Each worker requests an image and immediately downloads it into the blob store, so downloads overlap with the
+    remaining generations and the returned responses point at local files that outlive the provider's URL.
+
+    :param client: Any model client implementing `image`.
+    :param model_name: The image model.
+    :param prompt: The prompt for every image.
+    :param n: Number of images.
+    :param store: Blob store receiving the image bytes.
+    :param max_concurrency: Maximum number of generations in flight.
+    :return: An iterator of responses in completion order. `metadata["index"]` restores request order and
+        `metadata["error"]` is set for failed images.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, max(n, 1)), thread_name_prefix="images") as executor:
+        futures = [executor.submit(_generate_one, client, i, model_name, prompt, store) for i in range(n)]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def generate_images(
+    client: BaseModelClient, model_name: str, prompt: str, n: int, store: BlobStore, max_concurrency: int = 4
+) -> List[ImageResponse]:
+    """Generates `n` images concurrently, see `iter_generate_images`, and returns them in request order."""
+    results: List[Optional[ImageResponse]] = [None] * n
+    for response in iter_generate_images(client, model_name, prompt, n, store, max_concurrency):
+        results[response.metadata["index"]] = response
+    return results  # type: ignore
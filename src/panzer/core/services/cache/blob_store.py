@@ -0,0 +1,125 @@
+import os
+import hashlib
+import tempfile
+import threading
+from typing import Optional
+
+
+class BlobStore:
+    """Content-addressed files on disk with a size budget and least recently used eviction.
+
+    Blobs are stored under ``<root>/<first two hex digits>/<key><suffix>`` so no directory grows too large. Writes go
+    through a temporary file and an atomic rename, so readers never see a partial blob. The modification time of a
+    file doubles as its last access time, which keeps the store usable from several processes without an index.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 1024 * 1024 * 1024):
+        """
+        :param root: Directory holding the blobs, created if missing.
+        :param max_bytes: Total size of the blobs before the least recently used are evicted.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._scan())
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        """Returns the content address of the data."""
+        return hashlib.sha256(data).hexdigest()
+
+    def path(self, key: str, suffix: str = "") -> str:
+        return os.path.join(self.root, key[:2], f"{key}{suffix}")
+
+    def exists(self, key: str, suffix: str = "") -> bool:
+        return os.path.exists(self.path(key, suffix))
+
+    def get(self, key: str, suffix: str = "") -> Optional[bytes]:
+        """Returns the blob and marks it as recently used, or None if it is missing or was evicted."""
+        path = self.path(key, suffix)
+        try:
+            with open(path, "rb") as blob:
+                data = blob.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, data: bytes, key: Optional[str] = None, suffix: str = "") -> str:
+        """
+        Stores the data unless a blob with the same key exists, then evicts if the store is over budget.
+
+        :param data: The blob content.
+        :param key: Address of the blob, defaults to the hash of the data.
+        :param suffix: File extension, e.g. ".png", so the file can be served or opened directly.
+        :return: Path of the stored blob.
+        """
+        key = key or self.digest(data)
+        path = self.path(key, suffix)
+        if os.path.exists(path):
+            os.utime(path)
+            return path
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as blob:
+            blob.write(data)
+
+        with self._lock:
+            if os.path.exists(path):
+                # Another writer stored the same blob while this one was writing.
+                os.remove(temporary_path)
+                return path
+            os.replace(temporary_path, path)
+            self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict(keep=path)
+        return path
+
+    def delete(self, key: str, suffix: str = "") -> None:
+        path = self.path(key, suffix)
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                return
+            self._total_bytes -= size
+
+    def usage(self) -> int:
+        return self._total_bytes
+
+    def _scan(self):
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _evict(self, keep: str) -> None:
+        """Deletes the least recently used blobs until the store is at 90% of its budget."""
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        self._total_bytes = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for path, size, _ in entries:
+            if self._total_bytes <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._total_bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            for path, _, _ in list(self._scan()):
+                os.remove(path)
+            self._total_bytes = 0
@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Optional
+
+from core.models.responses.model_response import ModelResponse
+
+
+ENCODING = "utf-8"
+
+
+class ResponseCache:
+    """Size-bounded on-disk store for chat responses with TTL and LRU eviction.
+
+    Entries live in a single SQLite file so the cache is shared by every session and survives restarts. Each entry
+    records when it was created (for the TTL) and when it was last read (for LRU eviction once the store grows
+    beyond ``max_bytes``).
+    """
+
+    def __init__(self, cache_path: str, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: int = 7 * 24 * 3600):
+        """
+        Opens (or creates) the cache store.
+
+        :param cache_path: Path of the SQLite file backing the cache.
+        :param max_bytes: Maximum total size of the stored payloads before the least recently used are evicted.
+        :param ttl_seconds: Number of seconds an entry stays valid after it was written.
+        """
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def fingerprint(provider: str, model_name: str, messages, params: dict) -> str:
+        """Returns a stable hash of everything that determines the model output."""
+        payload = json.dumps(
+            {"provider": provider, "model": model_name, "messages": messages, "params": params},
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(payload.encode(ENCODING)).hexdigest()
+
+    def get(self, key: str) -> Optional[ModelResponse]:
+        """Returns the cached response for the key, or None if it is missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT payload, size, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            payload, size, created = row
+            if now - created > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+
+        data = json.loads(payload)
+        return ModelResponse(message=data["message"], usage=data["usage"], metadata={"cache": "hit"})
+
+    def put(self, key: str, response: ModelResponse) -> None:
+        """Stores a response and evicts the least recently used entries if the store is over budget."""
+        payload = json.dumps({"message": response.message, "usage": response.usage})
+        size = len(payload.encode(ENCODING))
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, payload, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, size, now, now),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def clear(self) -> None:
+        """Removes every entry from the cache."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._total_bytes = 0
+
+    def _evict(self) -> None:
+        """Drops expired entries, then the least recently used ones, until the store is back under budget."""
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,))
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        # Evict down to 90% of the budget so a full cache does not evict on every write.
+        target = self.max_bytes * 0.9
+        cursor = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed ASC")
+        stale_keys = []
+        for key, size in cursor:
+            if self._total_bytes <= target:
+                break
+            stale_keys.append((key,))
+            self._total_bytes -= size
+        cursor.close()
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
@@ -0,0 +1,54 @@
+import gzip
+import json
+import hashlib
+from typing import Optional
+
+from core.services.cache.blob_store import BlobStore
+
+
+ENCODING = "utf-8"
+
+
+class TranscriptionCache:
+    """Stores complete transcription results, timestamps included, gzip-compressed in a BlobStore.
+
+    Results are addressed by the hash of the audio bytes together with everything else that changes the output
+    (model, inference profile, windowing), so a re-upload of the same recording is answered without inference.
+    """
+
+    SUFFIX = ".json.gz"
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        """
+        :param cache_dir: Directory of the underlying blob store.
+        :param max_bytes: Compressed size of all results before the least recently used are evicted.
+        """
+        self.store = BlobStore(cache_dir, max_bytes)
+
+    @staticmethod
+    def key(audio: bytes, scope: dict) -> str:
+        """
+        Returns the cache key of a transcription.
+
+        :param audio: The encoded audio exactly as uploaded.
+        :param scope: Model id and options the result depends on, see `TransformersModel.cache_scope`.
+        """
+        audio_hash = hashlib.sha256(audio).hexdigest()
+        payload = json.dumps({"audio": audio_hash, "scope": scope}, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode(ENCODING)).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Returns the stored result ({"text", "chunks"}), or None on a miss."""
+        data = self.store.get(key, self.SUFFIX)
+        if data is None:
+            return None
+        try:
+            return json.loads(gzip.decompress(data).decode(ENCODING))
+        except (OSError, ValueError):
+            # A truncated or foreign file is dropped so the next put can replace it.
+            self.store.delete(key, self.SUFFIX)
+            return None
+
+    def put(self, key: str, result: dict) -> None:
+        payload = json.dumps({"text": result.get("text", ""), "chunks": result.get("chunks", [])}, default=float)
+        self.store.put(gzip.compress(payload.encode(ENCODING)), key=key, suffix=self.SUFFIX)
@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from core.models.base_model_client import BaseModelClient
+from shared.data_class.aimodel import AIModel
+
+
+ENCODING = "utf-8"
+
+
+class ModelIndex:
+    """Immutable snapshot of a provider's models with precomputed lookups."""
+
+    def __init__(self, models: List[AIModel]):
+        self.models = models
+        self._by_id = {model.id: model for model in models}
+        self._by_type: Dict[str, List[AIModel]] = {}
+        self._by_organization: Dict[str, List[AIModel]] = {}
+        for model in models:
+            self._by_type.setdefault(model.type, []).append(model)
+            self._by_organization.setdefault(model.organization, []).append(model)
+
+        self._by_context = sorted(models, key=lambda model: model.context_length or 0)
+        self._context_keys = [model.context_length or 0 for model in self._by_context]
+        self._by_price = sorted(models, key=lambda model: (model.price_input + model.price_output, model.id))
+
+    def get(self, model_id: str) -> Optional[AIModel]:
+        return self._by_id.get(model_id)
+
+    def types(self) -> List[str]:
+        return sorted(self._by_type)
+
+    def organizations(self) -> List[str]:
+        return sorted(self._by_organization)
+
+    def by_type(self, model_type: str) -> List[AIModel]:
+        return self._by_type.get(model_type, [])
+
+    def by_organization(self, organization: str) -> List[AIModel]:
+        return self._by_organization.get(organization, [])
+
+    def with_context_at_least(self, context_length: int) -> List[AIModel]:
+        """Models whose context window is at least `context_length`, smallest window first."""
+        return self._by_context[bisect.bisect_left(self._context_keys, context_length):]
+
+    def cheapest(self, limit: Optional[int] = None, model_type: Optional[str] = None) -> List[AIModel]:
+        """Models ordered by combined input and output price, optionally restricted to one type."""
+        models = [model for model in self._by_price if model_type is None or model.type == model_type]
+        return models[:limit] if limit else models
+
+
+class ModelCatalogue:
+    """Disk-backed, TTL-refreshed catalogue of the models a provider offers.
+
+    The last fetched list is persisted as JSON so every session and restart starts from it. Once it is older than the
+    TTL, reads keep returning it while a background thread revalidates it with ETag/If-Modified-Since if the client
+    supports conditional fetches.
+    """
+
+    def __init__(self, provider: str, client: BaseModelClient, cache_dir: str, ttl_seconds: int = 24 * 3600):
+        self.provider = provider
+        self.client = client
+        self.cache_path = catalogue_path(provider, cache_dir)
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._fetched_at = 0.0
+        self._validators: dict = {}
+        self._index: Optional[ModelIndex] = None
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.isfile(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding=ENCODING) as f:
+                data = json.load(f)
+            self._index = ModelIndex([AIModel.from_dict(model) for model in data["models"]])
+            self._fetched_at = data["fetched_at"]
+            self._validators = data.get("validators", {})
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            logging.error("Ignoring unreadable model catalogue %s: %s", self.cache_path, error)
+
+    def _save(self) -> None:
+        data = {
+            "fetched_at": self._fetched_at,
+            "validators": self._validators,
+            "models": [model.to_dict() for model in self._index.models] if self._index else [],
+        }
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding=ENCODING) as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def refresh(self) -> None:
+        """Fetches the model list now, conditionally when the client supports it."""
+        fetch_models = getattr(self.client, "fetch_models", None)
+        if fetch_models is not None and self._index is not None:
+            models, validators = fetch_models(self._validators.get("etag"), self._validators.get("last_modified"))
+        elif fetch_models is not None:
+            models, validators = fetch_models()
+        else:
+            models, validators = self.client.models(), {}
+
+        with self._lock:
+            if models is not None:
+                self._index = ModelIndex(models)
+            self._validators = validators or self._validators
+            self._fetched_at = time.time()
+            self._save()
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        except Exception as error:
+            logging.error("Refreshing the %s model catalogue failed: %s", self.provider, error)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def is_stale(self) -> bool:
+        return time.time() - self._fetched_at > self.ttl_seconds
+
+    def peek(self) -> Optional[ModelIndex]:
+        """Returns the current snapshot without ever touching the network."""
+        return self._index
+
+    def get(self) -> ModelIndex:
+        """Returns the current snapshot, fetching synchronously only if there is none yet.
+
+        A stale snapshot is returned as is while a single background refresh brings it up to date.
+        """
+        if self._index is None:
+            self.refresh()
+        elif self.is_stale():
+            with self._lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(target=self._refresh_in_background, daemon=True).start()
+        return self._index or ModelIndex([])
+
+
+_catalogues: Dict[str, ModelCatalogue] = {}
+_catalogues_lock = threading.Lock()
+_cached_indexes: Dict[str, Tuple[int, ModelIndex]] = {}
+
+
+def catalogue_path(provider: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"{provider.lower()}.json")
+
+
+def peek_catalogue(provider: str, cache_dir: str) -> Optional[ModelIndex]:
+    """
+    Returns the provider's snapshot without creating a client or touching the network, None if there is none yet.
+    The process-wide catalogue is used once it exists, otherwise its cache file, read again only when it changed.
+    """
+    with _catalogues_lock:
+        catalogue = _catalogues.get(provider)
+    if catalogue is not None:
+        return catalogue.peek()
+
+    path = catalogue_path(provider, cache_dir)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _cached_indexes.get(path)
+    if cached is None or cached[0] != mtime:
+        try:
+            with open(path, "r", encoding=ENCODING) as f:
+                index = ModelIndex([AIModel.from_dict(model) for model in json.load(f)["models"]])
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            logging.error("Ignoring unreadable model catalogue %s: %s", path, error)
+            return None
+        cached = _cached_indexes[path] = (mtime, index)
+    return cached[1]
+
+
+def get_catalogue(
+    provider: str, client: BaseModelClient, cache_dir: str, ttl_seconds: int = 24 * 3600
+) -> ModelCatalogue:
+    """Returns the process-wide catalogue for a provider, creating it on first use."""
+    with _catalogues_lock:
+        if provider not in _catalogues:
+            _catalogues[provider] = ModelCatalogue(provider, client, cache_dir, ttl_seconds)
+        return _catalogues[provider]
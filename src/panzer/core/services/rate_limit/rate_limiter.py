@@ -0,0 +1,159 @@
+import time
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+
+DEFAULT_COMPLETION_TOKENS = 256
+TOKENS_PER_MESSAGE = 4
+
+
+class TokenBucket:
+    """A token bucket that refills continuously and lets callers reserve capacity ahead of time.
+
+    Reservations may drive the bucket negative. The caller is told how long to wait until its reservation is covered,
+    so concurrent callers queue up behind each other in the order they reserved instead of all retrying at once.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> Tuple[float, float]:
+        """
+        Takes `amount` from the bucket, at most its capacity so an oversized call can still pass.
+
+        :return: The seconds to wait before the reservation is available and the amount actually taken.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level -= amount
+            return (0.0 if self.level >= 0 else -self.level / self.rate), amount
+
+    def adjust(self, amount: float) -> None:
+        """Returns (positive) or takes (negative) capacity after the real cost of a call is known."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level + amount)
+
+    def drain(self) -> None:
+        """Empties the bucket, used when the provider reports that the quota was exceeded anyway."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.level, 0.0)
+
+
+class RateLimiter:
+    """Process-wide requests-per-minute and tokens-per-minute limiter keyed by provider and model.
+
+    Limits are configured per provider, optionally overridden per model, and scaled by `headroom` so throughput
+    settles just under the provider quota rather than bouncing off it.
+    """
+
+    def __init__(self, limits: Optional[dict] = None, headroom: float = 0.95):
+        """
+        :param limits: Mapping of provider name to a dict with `requests_per_minute` and/or `tokens_per_minute` and
+            an optional `models` dict holding the same keys per model name.
+        :param headroom: Fraction of the configured quota the limiter will actually hand out.
+        """
+        self.limits = limits or {}
+        self.headroom = headroom
+        self._buckets: Dict[Tuple[str, str], Tuple[Optional[TokenBucket], Optional[TokenBucket]]] = {}
+        self._lock = threading.Lock()
+        self._encoding = None
+
+    def _get_limits(self, provider: str, model_name: str) -> dict:
+        provider_limits = self.limits.get(provider, {})
+        return provider_limits.get("models", {}).get(model_name, provider_limits)
+
+    def _get_buckets(self, provider: str, model_name: str) -> Tuple[Optional[TokenBucket], Optional[TokenBucket]]:
+        key = (provider, model_name)
+        with self._lock:
+            if key not in self._buckets:
+                limits = self._get_limits(provider, model_name)
+                rpm = limits.get("requests_per_minute")
+                tpm = limits.get("tokens_per_minute")
+                self._buckets[key] = (
+                    TokenBucket(rpm * self.headroom) if rpm else None,
+                    TokenBucket(tpm * self.headroom) if tpm else None,
+                )
+            return self._buckets[key]
+
+    def count_tokens(self, messages) -> int:
+        """Estimates the prompt size locally with tiktoken, or roughly from the character count without it."""
+        text_parts = []
+        for message in messages:
+            content = message.get("content", "") if isinstance(message, dict) else message
+            if isinstance(content, list):
+                text_parts.extend(part.get("text", "") for part in content if isinstance(part, dict))
+            else:
+                text_parts.append(str(content))
+
+        if self._encoding is None:
+            try:
+                import tiktoken
+
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+            except ImportError:
+                self._encoding = False
+            except (OSError, ValueError) as error:
+                # The encoding is downloaded on first use, which fails offline.
+                logging.warning("Could not load the tiktoken encoding, estimating tokens from characters: %s", error)
+                self._encoding = False
+
+        if self._encoding:
+            tokens = sum(len(self._encoding.encode(part)) for part in text_parts)
+        else:
+            tokens = sum(len(part) for part in text_parts) // 4
+        return tokens + TOKENS_PER_MESSAGE * len(messages)
+
+    def acquire(self, provider: str, model_name: str, estimated_tokens: int) -> float:
+        """
+        Blocks until the call fits within both buckets.
+
+        :return: The tokens reserved, which `settle` must be given. Less than `estimated_tokens` if the estimate
+            exceeds the bucket's capacity.
+        """
+        request_bucket, token_bucket = self._get_buckets(provider, model_name)
+        wait, reserved_tokens = 0.0, 0.0
+        if request_bucket:
+            wait = max(wait, request_bucket.reserve(1)[0])
+        if token_bucket:
+            token_wait, reserved_tokens = token_bucket.reserve(estimated_tokens)
+            wait = max(wait, token_wait)
+        if wait > 0:
+            time.sleep(wait)
+        return reserved_tokens
+
+    def settle(self, provider: str, model_name: str, reserved_tokens: float, actual_tokens: int) -> None:
+        """Corrects the token bucket by the difference between the reservation and the real usage of a call."""
+        _, token_bucket = self._get_buckets(provider, model_name)
+        if token_bucket and actual_tokens > 0:
+            token_bucket.adjust(reserved_tokens - actual_tokens)
+
+    def penalize(self, provider: str, model_name: str) -> None:
+        """Empties both buckets after the provider rejected a call with a rate limit error."""
+        for bucket in self._get_buckets(provider, model_name):
+            if bucket:
+                bucket.drain()
+
+
+_shared_limiter: Optional[RateLimiter] = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter(limits: Optional[dict] = None, headroom: float = 0.95) -> RateLimiter:
+    """Returns the limiter shared by every client in the process, creating it on first use."""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter(limits, headroom)
+        return _shared_limiter
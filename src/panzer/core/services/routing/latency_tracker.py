@@ -0,0 +1,50 @@
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class LatencyTracker:
+    """Keeps a sliding window of recent call latencies and failures per route."""
+
+    def __init__(self, window: int = 200, min_samples: int = 10):
+        """
+        :param window: Number of most recent latencies kept per route.
+        :param min_samples: Number of samples required before percentiles are reported.
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._failures: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float) -> None:
+        """Records the latency of a successful call."""
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def record_failure(self, key: str) -> None:
+        """Records a failed call."""
+        with self._lock:
+            self._failures[key] = self._failures.get(key, 0) + 1
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        """Returns the q-th quantile (0-1) of the recent latencies, or None without enough samples."""
+        with self._lock:
+            samples = sorted(self._latencies.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def stats(self) -> Dict[str, dict]:
+        """Returns the sample count, failures, p50 and p95 for every route seen so far."""
+        with self._lock:
+            keys = set(self._latencies) | set(self._failures)
+        return {
+            key: {
+                "count": len(self._latencies.get(key, ())),
+                "failures": self._failures.get(key, 0),
+                "p50": self.percentile(key, 0.5),
+                "p95": self.percentile(key, 0.95),
+            }
+            for key in sorted(keys)
+        }
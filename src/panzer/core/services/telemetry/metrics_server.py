@@ -0,0 +1,105 @@
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+from core.services.telemetry.telemetry import Telemetry
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(provider: str, model_name: str, call: str, **extra) -> str:
+    labels = {"provider": provider, "model": model_name, "call": call, **extra}
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def render_prometheus(telemetry: Telemetry, window_seconds: Optional[float] = None) -> str:
+    """Renders the telemetry summary in the Prometheus text exposition format.
+
+    All values describe the calls currently held in the ring buffer (or the given window), so they are exported as
+    gauges rather than monotonic counters.
+    """
+    lines = []
+
+    def metric(name: str, help_text: str, samples: Dict[str, Optional[float]]) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in samples.items():
+            if value is not None:
+                lines.append(f"{name}{labels} {value}")
+
+    summary = telemetry.summary(window_seconds)
+    quantile_metrics = {
+        "panzer_call_duration_seconds": ("duration", "Wall time of model calls."),
+        "panzer_call_ttfb_seconds": ("ttfb", "Time to first byte of model calls."),
+    }
+    for name, (field, help_text) in quantile_metrics.items():
+        metric(
+            name,
+            help_text,
+            {
+                _labels(*key, quantile=q): value
+                for key, stats in summary.items()
+                for q, value in stats[field].items()
+            },
+        )
+
+    total_metrics = {
+        "panzer_calls": ("count", "Number of model calls."),
+        "panzer_call_errors": ("errors", "Number of failed model calls."),
+        "panzer_call_retries": ("retries", "Retries performed inside model clients."),
+        "panzer_prompt_tokens": ("prompt_tokens", "Prompt tokens reported by providers."),
+        "panzer_completion_tokens": ("completion_tokens", "Completion tokens reported by providers."),
+        "panzer_request_bytes": ("request_bytes", "Size of request payloads."),
+        "panzer_response_bytes": ("response_bytes", "Size of response payloads."),
+    }
+    for name, (field, help_text) in total_metrics.items():
+        metric(name, help_text, {_labels(*key): stats[field] for key, stats in summary.items()})
+
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(
+    telemetry: Telemetry, host: str, port: int, routes: Optional[Dict[str, Callable[[], tuple]]] = None
+) -> Optional[ThreadingHTTPServer]:
+    """
+    Serves `/metrics` in the Prometheus text format from a daemon thread.
+
+    :param telemetry: The telemetry to export.
+    :param host: Interface to bind to.
+    :param port: Port to bind to.
+    :param routes: Extra paths mapped to callables returning (status, content type, body).
+    :return: The running server, or None if the port could not be bound (e.g. another process already serves it).
+    """
+    extra_routes = routes or {}
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/metrics":
+                status, content_type, body = 200, "text/plain; version=0.0.4", render_prometheus(telemetry)
+            elif path in extra_routes:
+                status, content_type, body = extra_routes[path]()
+            else:
+                status, content_type, body = 404, "text/plain", "Not found\n"
+
+            payload = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as error:
+        logging.error("Could not start the metrics server on %s:%s: %s", host, port, error)
+        return None
+
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    return server
@@ -0,0 +1,116 @@
+import time
+import itertools
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class CallRecord:
+    provider: str
+    '''Provider the call went to'''
+    model_name: str
+    '''Model requested, empty if the call has no model'''
+    call: str
+    '''Client method, e.g. chat, embedding or image'''
+    started: float
+    '''Unix time at which the call started'''
+    duration: float
+    '''Wall time of the call in seconds'''
+    ttfb: Optional[float]
+    '''Seconds until the first byte of the response, if the client can tell'''
+    retries: int
+    '''Retries performed inside the client'''
+    request_bytes: int
+    '''Size of the serialised request payload'''
+    response_bytes: int
+    '''Size of the response content'''
+    prompt_tokens: int
+    '''Prompt tokens reported by the provider'''
+    completion_tokens: int
+    '''Completion tokens reported by the provider'''
+    error: bool
+    '''Whether the call raised or returned an error response'''
+
+
+class RingBuffer:
+    """Fixed-size buffer of the most recent records.
+
+    Writers never take a lock: `itertools.count` hands out slots atomically and a single list item assignment is atomic
+    in CPython, so a slow reader can never stall a model call.
+    """
+
+    def __init__(self, capacity: int = 10_000):
+        self.capacity = capacity
+        self._slots: List[Optional[CallRecord]] = [None] * capacity
+        self._counter = itertools.count()
+
+    def append(self, record: CallRecord) -> None:
+        self._slots[next(self._counter) % self.capacity] = record
+
+    def snapshot(self) -> List[CallRecord]:
+        """Returns the records currently held, in no particular order."""
+        return [record for record in list(self._slots) if record is not None]
+
+
+def _quantile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Telemetry:
+    """Collects call records and summarises them per provider, model and call type."""
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, capacity: int = 10_000):
+        self.buffer = RingBuffer(capacity)
+
+    def record(self, record: CallRecord) -> None:
+        self.buffer.append(record)
+
+    def summary(self, window_seconds: Optional[float] = None) -> Dict[Tuple[str, str, str], dict]:
+        """
+        Aggregates the buffered records.
+
+        :param window_seconds: Only include calls that started within this many seconds, all buffered calls if None.
+        :return: A dict keyed by (provider, model, call) with counts, totals and latency quantiles.
+        """
+        since = time.time() - window_seconds if window_seconds else 0.0
+        groups: Dict[Tuple[str, str, str], List[CallRecord]] = {}
+        for record in self.buffer.snapshot():
+            if record.started >= since:
+                groups.setdefault((record.provider, record.model_name, record.call), []).append(record)
+
+        summary = {}
+        for key, records in groups.items():
+            durations = [record.duration for record in records]
+            ttfbs = [record.ttfb for record in records if record.ttfb is not None]
+            summary[key] = {
+                "count": len(records),
+                "errors": sum(record.error for record in records),
+                "retries": sum(record.retries for record in records),
+                "duration_sum": sum(durations),
+                "duration": {q: _quantile(durations, q) for q in self.QUANTILES},
+                "ttfb": {q: _quantile(ttfbs, q) for q in self.QUANTILES},
+                "prompt_tokens": sum(record.prompt_tokens for record in records),
+                "completion_tokens": sum(record.completion_tokens for record in records),
+                "request_bytes": sum(record.request_bytes for record in records),
+                "response_bytes": sum(record.response_bytes for record in records),
+            }
+        return dict(sorted(summary.items()))
+
+
+_shared_telemetry: Optional[Telemetry] = None
+_shared_lock = threading.Lock()
+
+
+def get_telemetry(capacity: int = 10_000) -> Telemetry:
+    """Returns the telemetry collector shared by every client in the process, creating it on first use."""
+    global _shared_telemetry
+    with _shared_lock:
+        if _shared_telemetry is None:
+            _shared_telemetry = Telemetry(capacity)
+        return _shared_telemetry
@@ -0,0 +1,77 @@
+import json
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+
+class WarmupManager:
+    """Runs warm-up tasks in background threads and tracks their readiness.
+
+    Each task gets its own daemon thread so a slow model download never delays the others or the app itself.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, Callable[[], None]] = {}
+        self._status: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def add_task(self, name: str, task: Callable[[], None]) -> None:
+        """Registers a task to run on `start`."""
+        self._tasks[name] = task
+        self._status[name] = {"state": "pending", "seconds": None, "error": None}
+
+    def _run(self, name: str, task: Callable[[], None]) -> None:
+        started = time.perf_counter()
+        self._update(name, state="running")
+        try:
+            task()
+            self._update(name, state="ready", seconds=time.perf_counter() - started)
+        except Exception as error:
+            logging.error("Warm-up task %s failed: %s", name, error)
+            self._update(name, state="failed", seconds=time.perf_counter() - started, error=str(error))
+
+    def _update(self, name: str, **fields) -> None:
+        with self._lock:
+            self._status[name] = {**self._status[name], **fields}
+
+    def start(self) -> None:
+        """Starts every registered task in its own background thread."""
+        for name, task in self._tasks.items():
+            threading.Thread(target=self._run, args=(name, task), daemon=True, name=f"warmup-{name}").start()
+
+    def status(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: dict(status) for name, status in self._status.items()}
+
+    def is_ready(self) -> bool:
+        """True once no task is pending or running. Failed tasks do not block readiness, they are reported."""
+        return all(status["state"] in ("ready", "failed") for status in self.status().values())
+
+    def pending(self) -> List[str]:
+        return [name for name, status in self.status().items() if status["state"] in ("pending", "running")]
+
+    def health(self) -> tuple:
+        """Returns (status code, content type, body) for a readiness endpoint."""
+        body = json.dumps({"ready": self.is_ready(), "tasks": self.status()})
+        return (200 if self.is_ready() else 503), "application/json", body
+
+
+def build_warmup(
+    providers: Dict[str, List[str]], get_model: Callable[[str], object], manager: Optional[WarmupManager] = None
+) -> WarmupManager:
+    """
+    Creates one warm-up task per provider that builds its client and calls `warm_up` with the listed models.
+
+    :param providers: Mapping of provider name to the models to preload for it.
+    :param get_model: Returns the client for a provider, normally `ModelFactory.get_model`.
+    :param manager: Manager to add the tasks to, a new one is created when omitted.
+    """
+    manager = manager or WarmupManager()
+
+    def make_task(provider: str, model_names: List[str]) -> Callable[[], None]:
+        return lambda: get_model(provider).warm_up(model_names)
+
+    for provider, model_names in providers.items():
+        manager.add_task(provider, make_task(provider, model_names))
+    return manager
@@ -0,0 +1,138 @@
+from abc import ABC, abstractmethod
+from typing import Iterable, List, Optional, Tuple
+
+from shared.data_class.chat_message import ChatMessage
+from shared.data_class.chat_thread import ChatThread
+from shared.data_class.chat_thread_summary import ChatThreadSummary
+from shared.data_class.chat_user import ChatUser
+from shared.data_class.prompt_template import PromptTemplate
+from shared.data_class.search_hit import SearchHit
+
+
+def default_templates(user: str) -> List[dict]:
+    """Templates every new database starts with."""
+    return [
+        {"user": user, "name": "None", "text": "{}"},
+        {
+            "user": user,
+            "name": "Summarize",
+            "text": "Summarize the following text: {}",
+        },
+    ]
+
+
+PREVIEW_CHARS = 70
+
+
+def thread_preview(messages: Iterable[Tuple[str, str]], length: Optional[int] = PREVIEW_CHARS) -> str:
+    """Sidebar preview of a thread from its (role, content) pairs: the first user message, else the first
+    non-system one. A `length` of None keeps the whole message."""
+    fallback = ""
+    for role, content in messages:
+        if role == "user":
+            return content[:length]
+        if role != "system" and not fallback:
+            fallback = content[:length]
+    return fallback
+
+
+DEFAULT_CHAT_USERS = [
+    {
+        "user": "Emile",
+        "chats": [
+            {
+                "title": "Basic Chat 1",
+                "created_date": "2019-05-31",
+                "usage": "5",
+                "messages": [
+                    {"role": "system", "content": "You are an all-knowing, highly compliant AI assistant."},
+                    {"role": "assistant", "content": "Test chat"},
+                ],
+            }
+        ],
+    },
+    {
+        "user": "Bob",
+        "chats": [
+            {
+                "title": "Basic Chat 2",
+                "created_date": "2020-05-31",
+                "usage": "5",
+                "messages": [
+                    {"role": "system", "content": "You are an all-knowing, highly compliant AI assistant."},
+                    {"role": "assistant", "content": "Test chat 2"},
+                ],
+            }
+        ],
+    },
+]
+
+
+class BaseStorage(ABC):
+    """Abstract class for all chat and prompt template storage backends"""
+
+    @abstractmethod
+    def initialize_database(self, user: str) -> None:
+        pass
+
+    @abstractmethod
+    def load_templates(self, user: str) -> List[PromptTemplate]:
+        pass
+
+    @abstractmethod
+    def load_chat_user(self, user: str) -> ChatUser:
+        pass
+
+    @abstractmethod
+    def list_thread_summaries(self, user: str) -> List[ChatThreadSummary]:
+        """Lists the user's threads in order without building their messages."""
+
+    @abstractmethod
+    def page_thread_summaries(
+        self, user: str, offset: int, limit: int, search: str = ""
+    ) -> Tuple[List[ChatThreadSummary], int]:
+        """
+        Lists one page of the user's threads, newest first.
+
+        :param offset: Number of matching threads to skip.
+        :param limit: Maximum number of summaries returned.
+        :param search: Case-insensitive text the title or the first message must contain, empty for all threads.
+        :return: The page and the total number of matching threads.
+        """
+
+    @abstractmethod
+    def load_thread(self, thread_id: str) -> Optional[ChatThread]:
+        """Loads one thread with all its messages, None if it does not exist."""
+
+    @abstractmethod
+    def upsert_chat_user(self, chat_user: ChatUser) -> None:
+        pass
+
+    @abstractmethod
+    def upsert_prompt_template(self, user: str, template: PromptTemplate) -> None:
+        pass
+
+    @abstractmethod
+    def create_thread(self, user: str, chat_thread: ChatThread) -> None:
+        """Stores a new thread with the messages it already has."""
+
+    @abstractmethod
+    def append_messages(self, thread_id: str, messages: List[ChatMessage]) -> None:
+        """Adds messages to the end of a stored thread, at a cost independent of the history size."""
+
+    @abstractmethod
+    def delete_thread(self, thread_id: str) -> None:
+        pass
+
+    @abstractmethod
+    def search(self, user: str, query: str, limit: int = 20) -> List[SearchHit]:
+        """Ranked full-text search over the user's messages and templates, with highlighted snippets."""
+
+    def flush(self) -> None:
+        """Writes pending changes to disk. Backends that write through do nothing."""
+
+    def raise_errors(self) -> None:
+        """Raises writes that failed after their call returned. Backends that write through have none."""
+
+    def close(self) -> None:
+        """Releases the backend's files and connections."""
@@ -0,0 +1,37 @@
+import os
+import logging
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, locks then only hold within the process
+    fcntl = None
+    logging.warning("fcntl is not available, storage files are not locked against other processes")
+
+
+class FileLock:
+    """Advisory lock on a lock file, shared for readers and exclusive for writers, across processes.
+
+    Locks are held per open file description, so the same process must not nest two FileLocks on one path. Pair it
+    with a threading lock for exclusion between the threads of one process.
+    """
+
+    def __init__(self, path: str, shared: bool = False):
+        self.path = path
+        self.shared = shared
+        self._handle = None
+
+    def __enter__(self) -> "FileLock":
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._handle = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._handle.fileno(), fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._handle.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._handle.close()
+            self._handle = None
+        return False
@@ -0,0 +1,124 @@
+import os
+import json
+import threading
+from typing import Dict, List, Tuple
+
+from shared.data_class.chat_message import ChatMessage
+
+
+ENCODING = "utf-8"
+
+
+class MessageLog:
+    """Append-only JSON-lines log of chat messages with an in-memory index of each thread's entries.
+
+    Every line records the thread id and the position of the message in its thread. Positions make replaying the
+    log idempotent: messages already present in the compacted document are skipped, so a crash between writing the
+    compacted document and truncating the log cannot duplicate messages.
+    """
+
+    def __init__(self, path: str, fsync: bool = False):
+        """
+        :param path: The log file, created if missing.
+        :param fsync: Force every append to stable storage, not only to the OS.
+        """
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._index: Dict[str, List[Tuple[int, int, int]]] = {}
+        self._size = 0
+        self._load_index()
+
+    def _load_index(self, offset: int = 0) -> None:
+        """Indexes the entries from `offset`, the end of the entries indexed so far, to the end of the file."""
+        if not os.path.exists(self.path):
+            open(self.path, "ab").close()
+
+        with open(self.path, "rb") as log:
+            log.seek(offset)
+            for line in log:
+                if not line.endswith(b"\n"):
+                    break  # a torn write at the end of the file, dropped below
+                try:
+                    entry = json.loads(line)
+                    thread_id, position = entry["thread"], entry["position"]
+                except (ValueError, KeyError):
+                    break
+                self._index.setdefault(thread_id, []).append((offset, len(line), position))
+                offset += len(line)
+
+        if offset != os.path.getsize(self.path):
+            os.truncate(self.path, offset)
+        self._size = offset
+
+    def append(self, thread_id: str, start_position: int, messages: List[ChatMessage]) -> None:
+        """Appends the messages of one thread in a single write. `start_position` is the first message's index."""
+        lines = [
+            (json.dumps({"thread": thread_id, "position": position, "role": m.role, "content": m.content}) + "\n")
+            .encode(ENCODING)
+            for position, m in enumerate(messages, start=start_position)
+        ]
+        with self._lock:
+            with open(self.path, "ab") as log:
+                log.write(b"".join(lines))
+                log.flush()
+                if self.fsync:
+                    os.fsync(log.fileno())
+            entries = self._index.setdefault(thread_id, [])
+            for position, line in enumerate(lines, start=start_position):
+                entries.append((self._size, len(line), position))
+                self._size += len(line)
+
+    def read(self, thread_id: str) -> List[Tuple[int, ChatMessage]]:
+        """Returns (position, message) pairs of the thread in append order, reading only its own lines."""
+        with self._lock:
+            entries = list(self._index.get(thread_id, ()))
+        if not entries:
+            return []
+
+        messages = []
+        with open(self.path, "rb") as log:
+            for offset, length, _ in entries:
+                log.seek(offset)
+                entry = json.loads(log.read(length))
+                messages.append((entry["position"], ChatMessage(role=entry["role"], content=entry["content"])))
+        return messages
+
+    def next_position(self, thread_id: str) -> int:
+        """Position following the last logged message of the thread, 0 if nothing is logged for it."""
+        with self._lock:
+            entries = self._index.get(thread_id)
+            return entries[-1][2] + 1 if entries else 0
+
+    def threads(self) -> List[str]:
+        with self._lock:
+            return list(self._index)
+
+    def size(self) -> int:
+        return self._size
+
+    def count(self) -> int:
+        """Number of logged messages, over all threads."""
+        with self._lock:
+            return sum(len(entries) for entries in self._index.values())
+
+    def refresh(self, reload: bool = False) -> None:
+        """
+        Picks up entries appended by other processes. Must be called with the file locked against writers.
+
+        :param reload: Index the whole file again, e.g. after another process compacted and truncated it.
+        """
+        with self._lock:
+            size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            if reload or size < self._size:
+                self._index.clear()
+                self._size = 0
+            if size != self._size:
+                self._load_index(self._size)
+
+    def clear(self) -> None:
+        """Empties the log once its content has been compacted into the main document."""
+        with self._lock:
+            os.truncate(self.path, 0)
+            self._index.clear()
+            self._size = 0
@@ -0,0 +1,68 @@
+"""Copies every user, chat thread and prompt template from the TinyDB shards into the SQLite backend.
+
+Run from `src/panzer`, then set DB_BACKEND = "sqlite" in web/config.py:
+
+    python -m data.migrate_tinydb_to_sqlite ./data/db
+    python -m data.migrate_tinydb_to_sqlite ./data/db --target ./data/db-sqlite
+
+The source is opened like the app does, so a single-file database is split into shards first and messages that
+are only in a message log are included. Template ids are per user in TinyDB, SQLite assigns new ones.
+"""
+
+import sys
+import argparse
+
+from data.sqlite_access import SQLiteAccess
+from data.tinydb_access import TinyDBAccess
+from data.tinydb_storage import CODECS
+
+
+def migrate(source_dir: str, target_dir: str, codec: str = "json") -> dict:
+    """
+    Copies the TinyDB database in `source_dir` into a new SQLite database in `target_dir`.
+
+    :param codec: Codec the TinyDB files were written with.
+
+    :return: Counts of the migrated users, threads, messages and templates.
+    :raises ValueError: If the target database already holds users.
+    """
+    target = SQLiteAccess(target_dir)
+    if target._conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is not None:
+        raise ValueError(f"{target.db_path} is not empty, refusing to merge into it")
+
+    counts = {"users": 0, "threads": 0, "messages": 0, "templates": 0}
+    source = TinyDBAccess(source_dir, codec=codec)
+    with target._transaction():
+        for user in source.users():
+            user_id = target._user_id(user)
+            threads = source.load_chat_user(user).chats
+            target._write_threads(user_id, threads)
+            counts["users"] += 1
+            counts["threads"] += len(threads)
+            counts["messages"] += sum(len(thread.messages) for thread in threads)
+
+            for template in source.load_templates(user):
+                target._insert_template(user_id, template.name, template.text)
+                counts["templates"] += 1
+
+    source.close()
+    target.close()
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Directory of the TinyDB database")
+    parser.add_argument("--target", help="Directory for db.sqlite, defaults to the source directory")
+    parser.add_argument("--codec", choices=list(CODECS), default="json")
+    args = parser.parse_args()
+
+    try:
+        counts = migrate(args.source, args.target or args.source, args.codec)
+    except ValueError as error:
+        sys.exit(str(error))
+    print("Migrated " + ", ".join(f"{count} {name}" for name, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+from data.base_storage import PREVIEW_CHARS
+from shared.data_class.chat_thread_summary import ChatThreadSummary
+from shared.data_class.search_hit import SearchHit
+
+
+SEARCH_KINDS = ("message", "template")
+SNIPPET_TOKENS = 12
+# Streamlit renders the snippets as markdown, matches are shown in bold.
+SNIPPET_MARKERS = ("**", "**", "…")
+TOKENIZER = "porter unicode61"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    user TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    position INTEGER,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_ref ON documents(kind, ref);
+CREATE INDEX IF NOT EXISTS idx_documents_user ON documents(user, kind, ref);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    content, content='documents', content_rowid='id', tokenize='{TOKENIZER}'
+);
+CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts(documents_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+CREATE TABLE IF NOT EXISTS threads (
+    ref TEXT PRIMARY KEY,
+    user TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    created_date TEXT NOT NULL,
+    first_user TEXT,
+    first_other TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_threads_user ON threads(user, position);
+"""
+
+
+def fts_query(text: str) -> str:
+    """
+    Turns free text into an FTS5 query matching documents that contain every word, the last one as a prefix so
+    results appear while typing. Words are quoted, so FTS5 operators in the input are searched for literally.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def like_pattern(text: str) -> str:
+    """LIKE pattern, with ESCAPE '\\', matching values that contain `text` literally."""
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _first_messages(messages: Iterable[Tuple[str, str]]) -> Tuple[Optional[str], Optional[str]]:
+    """The first user message and the first non-system message, which a thread's preview is taken from."""
+    first_user = first_other = None
+    for role, content in messages:
+        if role != "system" and first_other is None:
+            first_other = content
+        if role == "user":
+            first_user = content
+            break
+    return first_user, first_other
+
+
+class SearchIndex:
+    """Full-text index of chat messages and prompt templates in an SQLite FTS5 database.
+
+    Backends without a full-text engine of their own keep one next to their data and update it on every write, so
+    a search never scans the history. Matches are ranked with BM25 and returned with a highlighted snippet.
+
+    It also keeps a summary row per thread, its order, title and first messages, so a page of threads whose title
+    or first message contains a text is one query with the same LIKE semantics as SQLiteAccess.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        summarised = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'threads'").fetchone()
+        self._conn.executescript(SCHEMA)
+        # An index created before thread summaries existed has to be filled again.
+        self._summaries_missing = summarised is None
+
+    def add_messages(
+        self, user: str, thread_id: str, title: str, start_position: int, messages: Iterable[Tuple[str, str]]
+    ) -> None:
+        """
+        Indexes (role, content) pairs of a thread, `start_position` being the position of the first one. Fills in
+        the thread's first messages if the summary has none yet.
+        """
+        messages = list(messages)
+        with self._lock, self._conn:
+            self._insert_messages(user, thread_id, title, start_position, messages)
+            self._conn.execute(
+                "UPDATE threads SET first_user = COALESCE(first_user, ?), first_other = COALESCE(first_other, ?) "
+                "WHERE ref = ?",
+                (*_first_messages(messages), thread_id),
+            )
+
+    def add_thread(
+        self, user: str, thread_id: str, title: str, created_date: str, messages: Iterable[Tuple[str, str]]
+    ) -> None:
+        """Adds a new thread after the user's other threads, with its (role, content) pairs."""
+        messages = list(messages)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO threads (ref, user, position, title, created_date, first_user, first_other) "
+                "VALUES (?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM threads WHERE user = ?), ?, ?, ?, ?)",
+                (thread_id, user, user, title, created_date, *_first_messages(messages)),
+            )
+            self._insert_messages(user, thread_id, title, 0, messages)
+
+    def _insert_messages(
+        self, user: str, thread_id: str, title: str, start_position: int, messages: List[Tuple[str, str]]
+    ) -> None:
+        rows = [
+            ("message", user, thread_id, position, title, content)
+            for position, (role, content) in enumerate(messages, start=start_position)
+            if role != "system"
+        ]
+        self._conn.executemany(
+            "INSERT INTO documents (kind, user, ref, position, title, content) VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+
+    def set_threads(self, user: str, threads: Iterable[Tuple[str, str, str, Iterable[Tuple[str, str]]]]) -> None:
+        """Replaces the summaries of the user's threads with (id, title, created date, messages) in order."""
+        rows = [
+            (thread_id, user, position, title, created_date, *_first_messages(messages))
+            for position, (thread_id, title, created_date, messages) in enumerate(threads)
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM threads WHERE user = ?", (user,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO threads (ref, user, position, title, created_date, first_user, first_other) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM documents WHERE kind = 'message' AND ref = ?", (thread_id,))
+            self._conn.execute("DELETE FROM threads WHERE ref = ?", (thread_id,))
+
+    def set_template(self, user: str, template_id: str, name: str, text: str) -> None:
+        """Indexes a template, replacing its previous version."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM documents WHERE kind = 'template' AND user = ? AND ref = ?", (user, template_id)
+            )
+            self._conn.execute(
+                "INSERT INTO documents (kind, user, ref, position, title, content) "
+                "VALUES ('template', ?, ?, NULL, ?, ?)",
+                (user, template_id, name, f"{name}: {text}"),
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM documents")
+            self._conn.execute("DELETE FROM threads")
+        self._summaries_missing = False
+
+    def is_empty(self) -> bool:
+        """True if nothing is indexed, or the thread summaries are missing, and the index has to be filled."""
+        with self._lock:
+            return self._summaries_missing or self._conn.execute("SELECT 1 FROM documents LIMIT 1").fetchone() is None
+
+    def page_threads(self, user: str, offset: int, limit: int, search: str) -> Tuple[List[ChatThreadSummary], int]:
+        """
+        Newest-first page of the user's threads whose title or first message contains `search`, compared like
+        SQLite's LIKE, i.e. case-insensitive for ASCII letters. Returns the page and the number of matches.
+        """
+        pattern = like_pattern(search)
+        where = (
+            "WHERE user = ? AND (title LIKE ? ESCAPE '\\' OR COALESCE(first_user, first_other) LIKE ? ESCAPE '\\')"
+        )
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ref, title, created_date, substr(COALESCE(first_user, first_other, ''), 1, ?) FROM threads "
+                f"{where} ORDER BY position DESC LIMIT ? OFFSET ?",
+                (PREVIEW_CHARS, user, pattern, pattern, limit, offset),
+            ).fetchall()
+            total = self._conn.execute(f"SELECT COUNT(*) FROM threads {where}", (user, pattern, pattern)).fetchone()[0]
+        return [ChatThreadSummary(*row) for row in rows], total
+
+    def search(self, user: str, query: str, limit: int = 20, kinds: Tuple[str, ...] = SEARCH_KINDS) -> List[SearchHit]:
+        """Returns the user's best matching messages and templates, best first."""
+        match = fts_query(query)
+        if not match or not kinds:
+            return []
+        placeholders = ",".join("?" * len(kinds))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.kind, d.ref, d.title, snippet(documents_fts, 0, ?, ?, ?, ?), bm25(documents_fts), "
+                "d.position FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid "
+                f"WHERE documents_fts MATCH ? AND d.user = ? AND d.kind IN ({placeholders}) "
+                "ORDER BY bm25(documents_fts) LIMIT ?",
+                (*SNIPPET_MARKERS, SNIPPET_TOKENS, match, user, *kinds, limit),
+            ).fetchall()
+        return [SearchHit(row[0], row[1], row[2], row[3], -row[4], row[5]) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
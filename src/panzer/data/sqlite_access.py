@@ -0,0 +1,392 @@
+import os
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+from data.base_storage import DEFAULT_CHAT_USERS, PREVIEW_CHARS, BaseStorage, default_templates
+from data.search_index import SNIPPET_MARKERS, SNIPPET_TOKENS, TOKENIZER, fts_query, like_pattern
+from shared.data_class.chat_message import ChatMessage
+from shared.data_class.chat_thread import ChatThread
+from shared.data_class.chat_user import ChatUser
+from shared.data_class.chat_thread_summary import ChatThreadSummary
+from shared.data_class.search_hit import SearchHit
+from shared.data_class.prompt_template import PromptTemplate
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS threads (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    created_date TEXT NOT NULL,
+    usage INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_threads_user ON threads(user_id, position);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    thread_id TEXT NOT NULL REFERENCES threads(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_thread ON messages(thread_id, position);
+CREATE TABLE IF NOT EXISTS templates (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_templates_user ON templates(user_id);
+"""
+
+# Full-text indexes over the message and template tables, kept in sync by triggers inside the writing transaction.
+FTS_SCHEMA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='id', tokenize='{TOKENIZER}'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages WHEN new.role != 'system' BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages WHEN old.role != 'system' BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+CREATE VIRTUAL TABLE IF NOT EXISTS templates_fts USING fts5(
+    name, text, content='templates', content_rowid='id', tokenize='{TOKENIZER}'
+);
+CREATE TRIGGER IF NOT EXISTS templates_ai AFTER INSERT ON templates BEGIN
+    INSERT INTO templates_fts(rowid, name, text) VALUES (new.id, new.name, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS templates_ad AFTER DELETE ON templates BEGIN
+    INSERT INTO templates_fts(templates_fts, rowid, name, text) VALUES ('delete', old.id, old.name, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS templates_au AFTER UPDATE ON templates BEGIN
+    INSERT INTO templates_fts(templates_fts, rowid, name, text) VALUES ('delete', old.id, old.name, old.text);
+    INSERT INTO templates_fts(rowid, name, text) VALUES (new.id, new.name, new.text);
+END;
+"""
+
+# A user's threads with the content of their first user message, else of their first non-system message. Each
+# subquery stops at the first matching row of the (thread_id, position) index.
+SUMMARIES = """
+SELECT t.id, t.title, t.created_date, t.position, COALESCE(
+    (SELECT m.content FROM messages m WHERE m.thread_id = t.id AND m.role = 'user' ORDER BY m.position LIMIT 1),
+    (SELECT m.content FROM messages m WHERE m.thread_id = t.id AND m.role != 'system' ORDER BY m.position LIMIT 1)
+) AS first
+FROM threads t JOIN users u ON u.id = t.user_id WHERE u.name = ?
+"""
+
+
+class SQLiteAccess(BaseStorage):
+    """SQLite access class
+
+    Same interface as TinyDBAccess, but users, threads, messages and templates live in normalised tables of a
+    single WAL-mode database, so loading or saving one user never touches the others.
+
+    Every write bumps the version of the user it changes, in the same transaction. `upsert_chat_user` is checked
+    against it like in TinyDBAccess: it fails if the user was written since the ChatUser was loaded.
+    """
+
+    def __init__(self, db_dir: str):
+        self.db_path = f"{db_dir}/db.sqlite"
+        self.db_dir = db_dir
+        self._lock = threading.RLock()
+
+        os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(users)")]
+        if "version" not in columns:
+            # Databases created before versioning start every user at version 0.
+            self._conn.execute("ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        indexed = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone()
+        self._conn.executescript(FTS_SCHEMA)
+        if indexed is None:
+            # Databases created before full-text search get their existing rows indexed once.
+            self.rebuild_search_index()
+
+    def _user_id(self, user: str) -> int:
+        """Returns the id of the user, creating the user if needed. Must be called inside a transaction."""
+        self._conn.execute("INSERT OR IGNORE INTO users (name) VALUES (?)", (user,))
+        return self._conn.execute("SELECT id FROM users WHERE name = ?", (user,)).fetchone()[0]
+
+    def _bump_version(self, user_id: int) -> int:
+        """Marks the user as changed and returns the new version. Must be called inside the writing transaction."""
+        self._conn.execute("UPDATE users SET version = version + 1 WHERE id = ?", (user_id,))
+        return self._conn.execute("SELECT version FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+
+    def _transaction(self):
+        return _Transaction(self._conn, self._lock)
+
+    def initialize_database(self, user: str):
+        """Seeds an empty database with the default users, chats and templates."""
+        with self._transaction():
+            if self._conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is not None:
+                return
+
+            for template in default_templates(user):
+                self._insert_template(self._user_id(template["user"]), template["name"], template["text"])
+            for chat_user in DEFAULT_CHAT_USERS:
+                user_id = self._user_id(chat_user["user"])
+                threads = [ChatThread.from_dict(chat) for chat in chat_user["chats"]]
+                self._write_threads(user_id, threads)
+
+    def load_templates(self, user: str) -> List[PromptTemplate]:
+        """Loads the templates from the database."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t.id, t.name, t.text FROM templates t JOIN users u ON u.id = t.user_id WHERE u.name = ? "
+                "ORDER BY t.id",
+                (user,),
+            ).fetchall()
+        return [PromptTemplate(id=row[0], name=row[1], text=row[2]) for row in rows]
+
+    def load_chat_user(self, user: str) -> ChatUser:
+        """
+        Loads the chats from the database.
+        The returned user carries the user's version, which `upsert_chat_user` checks.
+        """
+        with self._transaction():
+            user_id = self._user_id(user)
+            version = self._conn.execute("SELECT version FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+            threads = self._conn.execute(
+                "SELECT id, title, created_date, usage FROM threads WHERE user_id = ? ORDER BY position",
+                (user_id,),
+            ).fetchall()
+            messages = self._conn.execute(
+                "SELECT m.thread_id, m.role, m.content FROM messages m JOIN threads t ON t.id = m.thread_id "
+                "WHERE t.user_id = ? ORDER BY m.thread_id, m.position",
+                (user_id,),
+            ).fetchall()
+
+        by_thread = {}
+        for thread_id, role, content in messages:
+            by_thread.setdefault(thread_id, []).append(ChatMessage(role=role, content=content))
+
+        chats = [
+            ChatThread(id=row[0], title=row[1], created_date=row[2], usage=row[3], messages=by_thread.get(row[0], []))
+            for row in threads
+        ]
+        return ChatUser(id=user_id, user=user, chats=chats, version=version)
+
+    def list_thread_summaries(self, user: str) -> List[ChatThreadSummary]:
+        """Lists the user's threads, each preview stops at the first matching message of the thread index."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, title, created_date, substr(first, 1, ?) FROM ({SUMMARIES}) ORDER BY position",
+                (PREVIEW_CHARS, user),
+            ).fetchall()
+        return [ChatThreadSummary(row[0], row[1], row[2], row[3] or "") for row in rows]
+
+    def page_thread_summaries(
+        self, user: str, offset: int, limit: int, search: str = ""
+    ) -> Tuple[List[ChatThreadSummary], int]:
+        """Newest-first page of summaries whose title or first message contains `search`."""
+        pattern = like_pattern(search)
+        where = "WHERE title LIKE ? ESCAPE '\\' OR first LIKE ? ESCAPE '\\'" if search else ""
+        filters = (pattern, pattern) if search else ()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, title, created_date, substr(first, 1, ?) FROM ({SUMMARIES}) {where} "
+                "ORDER BY position DESC LIMIT ? OFFSET ?",
+                (PREVIEW_CHARS, user, *filters, limit, offset),
+            ).fetchall()
+            if search:
+                total = self._conn.execute(
+                    f"SELECT COUNT(*) FROM ({SUMMARIES}) {where}", (user, *filters)
+                ).fetchone()[0]
+            else:
+                total = self._conn.execute(
+                    "SELECT COUNT(*) FROM threads t JOIN users u ON u.id = t.user_id WHERE u.name = ?", (user,)
+                ).fetchone()[0]
+        return [ChatThreadSummary(row[0], row[1], row[2], row[3] or "") for row in rows], total
+
+    def load_thread(self, thread_id: str) -> Optional[ChatThread]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, title, created_date, usage FROM threads WHERE id = ?", (thread_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            messages = self._conn.execute(
+                "SELECT role, content FROM messages WHERE thread_id = ? ORDER BY position", (thread_id,)
+            ).fetchall()
+        return ChatThread(
+            id=row[0],
+            title=row[1],
+            created_date=row[2],
+            usage=row[3],
+            messages=[ChatMessage(role=role, content=content) for role, content in messages],
+        )
+
+    def upsert_chat_user(self, chat_user: ChatUser):
+        """
+        Updates or creates a chat_user in the database, replacing the stored threads with the given ones.
+
+        :raises ValueError: If the user was loaded with `load_chat_user` and has been written since, by this or
+            another process. Load the user again and reapply the change.
+        """
+        with self._transaction():
+            user_id = self._user_id(chat_user.user)
+            version = self._conn.execute("SELECT version FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+            if chat_user.version is not None and chat_user.version != version:
+                raise ValueError(
+                    "Chat user was changed since it was loaded", chat_user.user, chat_user.version, version
+                )
+            chat_user.id = user_id
+            keep = [thread.id for thread in chat_user.chats]
+            placeholders = ",".join("?" * len(keep))
+            self._conn.execute(
+                f"DELETE FROM threads WHERE user_id = ? AND id NOT IN ({placeholders})", (user_id, *keep)
+            )
+            self._write_threads(user_id, chat_user.chats)
+            chat_user.version = self._bump_version(user_id)
+
+    def _write_threads(self, user_id: int, threads: Iterable[ChatThread]) -> None:
+        for position, thread in enumerate(threads):
+            self._conn.execute(
+                "INSERT INTO threads (id, user_id, position, title, created_date, usage) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET position = excluded.position, title = excluded.title, "
+                "created_date = excluded.created_date, usage = excluded.usage",
+                (thread.id, user_id, position, thread.title, thread.created_date, int(thread.usage or 0)),
+            )
+            # Messages are only ever appended, so rows already stored for the thread are left untouched.
+            stored = self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE thread_id = ?", (thread.id,)
+            ).fetchone()[0]
+            if stored > len(thread.messages):
+                self._conn.execute("DELETE FROM messages WHERE thread_id = ?", (thread.id,))
+                stored = 0
+            self._insert_messages(thread.id, stored, thread.messages[stored:])
+
+    def create_thread(self, user: str, chat_thread: ChatThread) -> None:
+        """Stores a new thread after the user's existing ones."""
+        with self._transaction():
+            user_id = self._user_id(user)
+            position = self._conn.execute(
+                "SELECT COALESCE(MAX(position), -1) + 1 FROM threads WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+            self._conn.execute(
+                "INSERT INTO threads (id, user_id, position, title, created_date, usage) VALUES (?, ?, ?, ?, ?, ?)",
+                (chat_thread.id, user_id, position, chat_thread.title, chat_thread.created_date,
+                 int(chat_thread.usage or 0)),
+            )  # fmt: skip
+            self._insert_messages(chat_thread.id, 0, chat_thread.messages)
+            self._bump_version(user_id)
+
+    def append_messages(self, thread_id: str, messages: List[ChatMessage]) -> None:
+        """Inserts the messages after the last stored message of the thread."""
+        with self._transaction():
+            row = self._conn.execute(
+                "SELECT COALESCE(MAX(m.position), -1) + 1, t.user_id FROM threads t "
+                "LEFT JOIN messages m ON m.thread_id = t.id WHERE t.id = ?",
+                (thread_id,),
+            ).fetchone()
+            if row[1] is None:
+                raise ValueError("Unknown chat thread", thread_id)
+            self._insert_messages(thread_id, row[0], messages)
+            self._bump_version(row[1])
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._transaction():
+            row = self._conn.execute("SELECT user_id FROM threads WHERE id = ?", (thread_id,)).fetchone()
+            if row is not None:
+                self._conn.execute("DELETE FROM threads WHERE id = ?", (thread_id,))
+                self._bump_version(row[0])
+
+    def _insert_messages(self, thread_id: str, start_position: int, messages: Iterable[ChatMessage]) -> None:
+        self._conn.executemany(
+            "INSERT INTO messages (thread_id, position, role, content) VALUES (?, ?, ?, ?)",
+            [
+                (thread_id, position, message.role, message.content)
+                for position, message in enumerate(messages, start=start_position)
+            ],
+        )
+
+    def _insert_template(self, user_id: int, name: str, text: str) -> int:
+        cursor = self._conn.execute(
+            "INSERT INTO templates (user_id, name, text) VALUES (?, ?, ?)", (user_id, name, text)
+        )
+        return cursor.lastrowid
+
+    def upsert_prompt_template(self, user: str, template: PromptTemplate):
+        """Updates or creates a template in the database."""
+        with self._transaction():
+            user_id = self._user_id(user)
+            if template.id is None:
+                template.id = self._insert_template(user_id, template.name, template.text)
+            else:
+                self._conn.execute(
+                    "UPDATE templates SET name = ?, text = ? WHERE id = ?", (template.name, template.text, template.id)
+                )
+            self._bump_version(user_id)
+
+    def search(self, user: str, query: str, limit: int = 20) -> List[SearchHit]:
+        """Ranked full-text search over the user's messages and templates, best first."""
+        match = fts_query(query)
+        if not match:
+            return []
+        with self._lock:
+            messages = self._conn.execute(
+                "SELECT t.id, t.title, snippet(messages_fts, 0, ?, ?, ?, ?), bm25(messages_fts), m.position "
+                "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                "JOIN threads t ON t.id = m.thread_id JOIN users u ON u.id = t.user_id "
+                "WHERE messages_fts MATCH ? AND u.name = ? ORDER BY bm25(messages_fts) LIMIT ?",
+                (*SNIPPET_MARKERS, SNIPPET_TOKENS, match, user, limit),
+            ).fetchall()
+            templates = self._conn.execute(
+                "SELECT t.id, t.name, snippet(templates_fts, 1, ?, ?, ?, ?), bm25(templates_fts) "
+                "FROM templates_fts JOIN templates t ON t.id = templates_fts.rowid JOIN users u ON u.id = t.user_id "
+                "WHERE templates_fts MATCH ? AND u.name = ? ORDER BY bm25(templates_fts) LIMIT ?",
+                (*SNIPPET_MARKERS, SNIPPET_TOKENS, match, user, limit),
+            ).fetchall()
+
+        hits = [SearchHit("message", row[0], row[1], row[2], -row[3], row[4]) for row in messages]
+        hits += [SearchHit("template", str(row[0]), row[1], row[2], -row[3]) for row in templates]
+        return sorted(hits, key=lambda hit: hit.score, reverse=True)[:limit]
+
+    def rebuild_search_index(self) -> None:
+        """Indexes every stored message and template again."""
+        with self._transaction():
+            self._conn.execute("INSERT INTO messages_fts(messages_fts) VALUES ('delete-all')")
+            self._conn.execute(
+                "INSERT INTO messages_fts(rowid, content) SELECT id, content FROM messages WHERE role != 'system'"
+            )
+            self._conn.execute("INSERT INTO templates_fts(templates_fts) VALUES ('rebuild')")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class _Transaction:
+    """Holds the connection lock for the duration of an explicit BEGIN IMMEDIATE ... COMMIT block."""
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.RLock):
+        self._conn = conn
+        self._lock = lock
+
+    def __enter__(self):
+        self._lock.acquire()
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            # __exit__ does not run when __enter__ raises, e.g. SQLITE_BUSY from another process.
+            self._lock.release()
+            raise
+        return self._conn
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self._lock.release()
+        return False
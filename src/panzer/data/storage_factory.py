@@ -0,0 +1,45 @@
+from data.base_storage import BaseStorage
+
+
+STORAGE_BACKENDS = ("tinydb", "sqlite")
+
+
+def get_storage(
+    backend: str,
+    db_dir: str,
+    codec: str = "orjson",
+    write_behind: bool = False,
+    write_batch: int = 100,
+    flush_writes: int = 50,
+    flush_seconds: float = 2.0,
+) -> BaseStorage:
+    """
+    Returns the storage backend selected in the config.
+
+    :param backend: One of STORAGE_BACKENDS.
+    :param db_dir: Directory holding the database files.
+    :param codec: TinyDB only, serialisation of the database file.
+    :param write_behind: Perform writes on a background worker, see WriteBehindStorage.
+    :param write_batch: Maximum number of queued writes applied per backend flush.
+    :param flush_writes: TinyDB only, a user's document writes after which they are forced to stable storage.
+    :param flush_seconds: TinyDB only, seconds after which a user's document writes are forced to stable storage.
+    """
+    storage = _open_backend(backend, db_dir, codec, flush_writes, flush_seconds)
+    if write_behind:
+        from data.write_behind import WriteBehindStorage
+
+        return WriteBehindStorage(storage, write_batch)
+    return storage
+
+
+def _open_backend(backend: str, db_dir: str, codec: str, flush_writes: int, flush_seconds: float) -> BaseStorage:
+    # Backends are imported on demand so the unused one is never loaded.
+    if backend == "tinydb":
+        from data.tinydb_access import TinyDBAccess
+
+        return TinyDBAccess(db_dir, codec=codec, sync_writes=flush_writes, sync_seconds=flush_seconds)
+    if backend == "sqlite":
+        from data.sqlite_access import SQLiteAccess
+
+        return SQLiteAccess(db_dir)
+    raise ValueError("Invalid storage backend", backend)
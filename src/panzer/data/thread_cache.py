@@ -0,0 +1,47 @@
+from collections import OrderedDict
+from typing import Optional
+
+from data.base_storage import BaseStorage
+from shared.data_class.chat_thread import ChatThread
+
+
+class ThreadCache:
+    """Per-session LRU of hydrated threads.
+
+    The sidebar only holds thread summaries. A thread's messages are loaded from storage when it is opened and kept
+    here, so switching back and forth between recent threads does not hit storage, while memory stays bounded by
+    `capacity` threads however long the history is.
+    """
+
+    def __init__(self, storage: BaseStorage, capacity: int = 8):
+        self.storage = storage
+        self.capacity = capacity
+        self._threads: "OrderedDict[str, ChatThread]" = OrderedDict()
+
+    def get(self, thread_id: str) -> Optional[ChatThread]:
+        """Returns the thread, loading it from storage on a miss. None if it does not exist."""
+        thread = self._threads.get(thread_id)
+        if thread is not None:
+            self._threads.move_to_end(thread_id)
+            return thread
+
+        thread = self.storage.load_thread(thread_id)
+        if thread is not None:
+            self.put(thread)
+        return thread
+
+    def put(self, thread: ChatThread) -> None:
+        """Caches a thread, e.g. one just created in this session. The cached object is the live one."""
+        self._threads[thread.id] = thread
+        self._threads.move_to_end(thread.id)
+        while len(self._threads) > self.capacity:
+            self._threads.popitem(last=False)
+
+    def discard(self, thread_id: str) -> None:
+        self._threads.pop(thread_id, None)
+
+    def __contains__(self, thread_id: str) -> bool:
+        return thread_id in self._threads
+
+    def __len__(self) -> int:
+        return len(self._threads)
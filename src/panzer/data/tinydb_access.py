@@ -1,142 +1,421 @@
 import os
-from dataclasses import asdict
+import copy
+import shutil
+import uuid
+import threading
+from typing import Dict, List, Optional, Tuple
 
-from pathlib import Path
 from shared.data_class.prompt_template import PromptTemplate
 from shared.data_class.chat_thread import ChatThread
 from shared.data_class.chat_thread import ChatMessage
 from shared.data_class.chat_user import ChatUser
+from shared.data_class.chat_thread_summary import ChatThreadSummary
+from shared.data_class.search_hit import SearchHit
 
-from tinydb import Query, TinyDB
+from tinydb import TinyDB
 from tinydb.table import Document
 
+from data.base_storage import DEFAULT_CHAT_USERS, PREVIEW_CHARS, BaseStorage, default_templates, thread_preview
+from data.file_lock import FileLock
+from data.message_log import MessageLog
+from data.search_index import SearchIndex
+from data.tinydb_shard import USERS_DIR, UserShard, shard_name, shard_user
+from data.tinydb_storage import CodecStorage, database_file
 
-class TinyDBAccess:
-    """TinyDB access class"""
 
-    def __init__(self, db_dir: str):
-        self.db_path = f"{db_dir}/db.json"
+class TinyDBAccess(BaseStorage):
+    """TinyDB access class
+
+    Every user has a shard of their own under `users/`, a TinyDB document with the user's threads and templates
+    plus an append-only MessageLog. Several processes, e.g. Streamlit replicas on one shared volume, may use the
+    same directory: each shard is guarded by an advisory file lock, reloaded when another process changed it, and
+    written to the OS before its lock is released (see UserShard). Forcing the writes to stable storage is batched
+    per shard and done by `flush`. Writes to different users never block each other and only ever rewrite that
+    user's file.
+
+    Messages added with `append_messages` only go to the shard's log. The log is replayed on load and folded into
+    the document once it exceeds `compact_bytes`. `upsert_chat_user` replaces the whole user and is checked
+    optimistically: it fails if the shard or its log was written since the ChatUser was loaded.
+
+    Every write also updates a full-text SearchIndex in search.sqlite, rebuilt from the shards if it is missing. Its
+    thread summaries answer searched pages of `page_thread_summaries`.
+    A database in the single-file layout of earlier versions is split into shards when first opened.
+    """
+
+    _shards: Dict[Tuple[str, str], UserShard] = {}
+    _shards_lock = threading.Lock()
+    _thread_users: Dict[str, Dict[str, str]] = {}
+    _thread_users_lock = threading.Lock()
+    _indexes: Dict[str, SearchIndex] = {}
+    _indexes_lock = threading.Lock()
+
+    def __init__(
+        self,
+        db_dir: str,
+        compact_bytes: int = 1024 * 1024,
+        codec: str = "orjson",
+        sync_writes: int = 50,
+        sync_seconds: float = 2.0,
+    ):
+        """
+        :param db_dir: Directory of the shards.
+        :param compact_bytes: Size of a user's message log that triggers its compaction into the user's document.
+        :param codec: Serialisation of the shard files, see `data.tinydb_storage.CODECS`.
+        :param sync_writes: Document writes of a shard after which they are forced to stable storage.
+        :param sync_seconds: Age of the oldest unforced document write of a shard after which they are forced.
+        """
         self.db_dir = db_dir
+        self.codec = codec
+        self.sync_writes = sync_writes
+        self.sync_seconds = sync_seconds
+        self.search_path = f"{db_dir}/search.sqlite"
+        self.compact_bytes = compact_bytes
+        self._initialized = set()
+        self._split_legacy_database()
 
-    def initialize_database(self, user: str):
-        """Initialize all tables."""
+    # Shards and indexes
+
+    def _shard(self, user: str) -> UserShard:
+        with TinyDBAccess._shards_lock:
+            shard = TinyDBAccess._shards.get((self.db_dir, user))
+            if shard is None:
+                shard = UserShard(self.db_dir, user, self.codec, self.sync_writes, self.sync_seconds)
+                self._store_thread_ids(shard)
+                TinyDBAccess._shards[(self.db_dir, user)] = shard
+            return shard
+
+    @staticmethod
+    def _store_thread_ids(shard: UserShard) -> None:
+        """Stores an id for threads saved without one, otherwise every load would give them a new random id."""
+        with shard.reading() as db:
+            chats = TinyDBAccess._chats(db)
+            if all(chat.get("id") for chat in chats):
+                return
+        with shard.writing() as db:
+            doc = TinyDBAccess._chat_doc(db)
+            chats = [chat if chat.get("id") else {**chat, "id": uuid.uuid4().hex} for chat in doc["chats"]]
+            db.table("chat_threads").update({"chats": chats}, doc_ids=[doc.doc_id])
+
+    def users(self) -> List[str]:
+        """Users that have a shard, including shards created by other processes."""
+        users_dir = os.path.join(self.db_dir, USERS_DIR)
+        if not os.path.isdir(users_dir):
+            return []
+        names = [name for name in os.listdir(users_dir) if os.path.isdir(os.path.join(users_dir, name))]
+        return sorted(shard_user(name) for name in names)
+
+    def _remember_threads(self, user: str, thread_ids) -> None:
+        with TinyDBAccess._thread_users_lock:
+            owners = TinyDBAccess._thread_users.setdefault(self.db_dir, {})
+            for thread_id in thread_ids:
+                owners[thread_id] = user
+
+    def _thread_shard(self, thread_id: str) -> Optional[UserShard]:
+        """The shard holding the thread. Threads created by other processes are found by scanning the shards once."""
+        with TinyDBAccess._thread_users_lock:
+            user = TinyDBAccess._thread_users.get(self.db_dir, {}).get(thread_id)
+        if user is None:
+            for candidate in self.users():
+                with self._shard(candidate).reading() as db:
+                    chat_ids = [chat["id"] for chat in self._chats(db)]
+                self._remember_threads(candidate, chat_ids)
+                if thread_id in chat_ids:
+                    user = candidate
+                    break
+        return self._shard(user) if user is not None else None
+
+    def _search_index(self) -> SearchIndex:
+        with TinyDBAccess._indexes_lock:
+            index = TinyDBAccess._indexes.get(self.db_dir)
+            if index is None:
+                index = SearchIndex(self.search_path)
+                TinyDBAccess._indexes[self.db_dir] = index
+                if index.is_empty():
+                    self._rebuild_search_index(index)
+            return index
+
+    @staticmethod
+    def _chat_doc(db: TinyDB) -> Optional[Document]:
+        docs = db.table("chat_threads").all()
+        return docs[0] if docs else None
+
+    @staticmethod
+    def _chats(db: TinyDB) -> List[dict]:
+        doc = TinyDBAccess._chat_doc(db)
+        return doc.get("chats", []) if doc else []
+
+    @staticmethod
+    def _find_chat(db: TinyDB, thread_id: str) -> Optional[dict]:
+        return next((chat for chat in TinyDBAccess._chats(db) if chat["id"] == thread_id), None)
 
-        file_path = Path(self.db_path)
-        if file_path.is_file():
+    def flush(self) -> None:
+        """Forces the document writes of this directory's shards to stable storage, other processes see them already."""
+        with TinyDBAccess._shards_lock:
+            shards = [shard for key, shard in TinyDBAccess._shards.items() if key[0] == self.db_dir]
+        for shard in shards:
+            shard.sync()
+
+    def close(self) -> None:
+        """Closes this directory's shards and search index, the next operation opens them again."""
+        with TinyDBAccess._shards_lock:
+            keys = [key for key in TinyDBAccess._shards if key[0] == self.db_dir]
+            shards = [TinyDBAccess._shards.pop(key) for key in keys]
+        for shard in shards:
+            shard.close()
+        with TinyDBAccess._indexes_lock:
+            index = TinyDBAccess._indexes.pop(self.db_dir, None)
+        if index is not None:
+            index.close()
+
+    # Setup
+
+    def _split_legacy_database(self) -> None:
+        """
+        Moves every user of a single-file database (db.json and messages.log in `db_dir`) into a shard.
+
+        The shards are written to a scratch directory that is renamed to `users/` in one step, so a split that was
+        interrupted is started over instead of being applied twice. The legacy files are renamed last, an existing
+        `users/` next to them means only that is left to do.
+        """
+        legacy_path = database_file(self.db_dir, self.codec)
+        if not os.path.exists(legacy_path):
             return
 
-        print("Database does not exist, creating...")
-        os.makedirs(self.db_dir, exist_ok=True)
+        with FileLock(f"{self.db_dir}/.lock"):
+            if not os.path.exists(legacy_path):
+                return  # split by another process meanwhile
+            users_dir = os.path.join(self.db_dir, USERS_DIR)
+            log_path = f"{self.db_dir}/messages.log"
+            if not os.path.isdir(users_dir):
+                print("Splitting the database into per-user shards...")
+                scratch_dir = f"{users_dir}.splitting"
+                shutil.rmtree(scratch_dir, ignore_errors=True)
+                self._write_legacy_shards(legacy_path, log_path, scratch_dir)
+                os.replace(scratch_dir, users_dir)
+                print("Database split.")
+
+            if os.path.exists(log_path):
+                os.replace(log_path, f"{log_path}.unsharded")
+            os.replace(legacy_path, f"{legacy_path}.unsharded")
+            if os.path.exists(self.search_path):
+                # Template ids are per shard now, index everything again.
+                self.rebuild_search_index()
+
+    def _write_legacy_shards(self, legacy_path: str, log_path: str, shards_dir: str) -> None:
+        """Writes one shard document per user of the legacy database into `shards_dir`, logged messages included."""
+        log = MessageLog(log_path)
+        shards: Dict[str, TinyDB] = {}
+
+        def shard_db(user: str) -> TinyDB:
+            if user not in shards:
+                directory = os.path.join(shards_dir, shard_name(user))
+                os.makedirs(directory)
+                shards[user] = TinyDB(database_file(directory, self.codec), codec=self.codec, storage=CodecStorage)
+            return shards[user]
 
-        with TinyDB(self.db_path) as db:
+        try:
+            with TinyDB(legacy_path, codec=self.codec, storage=CodecStorage) as legacy:
+                for doc in legacy.table("chat_threads").all():
+                    chats = []
+                    for chat in doc.get("chats", []):
+                        chat_id = chat.get("id") or uuid.uuid4().hex
+                        chat = {**chat, "id": chat_id, "messages": list(chat["messages"])}
+                        self._replay(chat["messages"], log.read(chat["id"]), dict)
+                        chats.append(chat)
+                    shard_db(doc["user"]).table("chat_threads").insert({"user": doc["user"], "chats": chats})
+                for doc in legacy.table("prompt_template").all():
+                    shard_db(doc["user"]).table("prompt_template").insert(dict(doc))
+        finally:
+            for db in shards.values():
+                db.close()
+
+    def initialize_database(self, user: str):
+        """Creates the user's shard with the default templates and, for the demo users, the default chats."""
+
+        if user in self._initialized:
+            return
+
+        shard = self._shard(user)
+        index = self._search_index()
+        with shard.writing() as db:
             prompts_table = db.table("prompt_template")
             chats_table = db.table("chat_threads")
+            if len(prompts_table) == 0 and len(chats_table) == 0:
+                print("Database does not exist, creating...")
+                prompts_table.insert_multiple(default_templates(user))
+                defaults = next((doc for doc in DEFAULT_CHAT_USERS if doc["user"] == user), {"chats": []})
+                chats = [ChatThread.from_dict(chat).to_dict() for chat in copy.deepcopy(defaults["chats"])]
+                chats_table.insert({"user": user, "chats": chats})
+                shard.commit()
+
+                for chat in chats:
+                    index.add_thread(
+                        user, chat["id"], chat["title"], chat["created_date"],
+                        ((m["role"], m["content"]) for m in chat["messages"]),
+                    )  # fmt: skip
+                for doc in prompts_table.all():
+                    index.set_template(user, str(doc.doc_id), doc["name"], doc["text"])
+                print("Database successfully initialized.")
+
+        self._initialized.add(user)
 
-            template_dummy = [
-                {"user": user, "name": "None", "text": "{}"},
-                {
-                    "user": user,
-                    "name": "Summarize",
-                    "text": "Summarize the following text: {}",
-                },
-            ]
-
-            chat_dummy = [
-                {
-                    "user": "Emile",
-                    "chats": [
-                        {
-                            "title": "Basic Chat 1",
-                            "created_date": "2019-05-31",
-                            "usage": "5",
-                            "messages": [
-                                {
-                                    "role": "system",
-                                    "content": "You are an all-knowing, highly compliant AI assistant."
-                                },
-                                {"role": "assistant", "content": "Test chat"},
-                            ],
-                        }
-                    ],
-                },
-                {
-                    "user": "Bob",
-                    "chats": [
-                        {
-                            "title": "Basic Chat 2",
-                            "created_date": "2020-05-31",
-                            "usage": "5",
-                            "messages": [
-                                {
-                                    "role": "system",
-                                    "content": "You are an all-knowing, highly compliant AI assistant."
-                                },
-                                {"role": "assistant", "content": "Test chat 2"},
-                            ],
-                        }
-                    ],
-                },
-            ]
-
-            if len(prompts_table.search((Query().name == "None") and (Query().user == user))) == 0:
-                prompts_table.insert_multiple(template_dummy)
-
-            if len(chats_table.search((Query().name == "None") and (Query().user == user))) == 0:
-                chats_table.insert_multiple(chat_dummy)
-
-        print("Database successfully initialized.")
+    # Reads
 
     def load_templates(self, user: str):
         """Loads the templates from the database."""
-        with TinyDB(self.db_path) as db:
-            results = db.table("prompt_template").search(Query().user == user)
-            documents_with_ids = [PromptTemplate(id=doc.doc_id, name=doc["name"], text=doc["text"]) for doc in results]
-            return documents_with_ids
+        with self._shard(user).reading() as db:
+            return [PromptTemplate.from_dict(doc, id=doc.doc_id) for doc in db.table("prompt_template").all()]
 
     def load_chat_user(self, user: str):
-        """Loads the chats from the database."""
-        with TinyDB(self.db_path) as db:
-            results = db.table("chat_threads").search(Query().user == user)
-            documents_with_ids = [
-                ChatUser(
-                    id=doc.doc_id,
-                    user=doc["user"],
-                    chats=[
-                        ChatThread(
-                            title=chatt["title"],
-                            created_date=chatt["created_date"],
-                            usage=chatt["usage"],
-                            messages=[
-                                ChatMessage(role=message["role"], content=message["content"])
-                                for message in chatt["messages"]
-                            ],
-                        )
-                        for chatt in doc["chats"]
-                    ],
-                )
-                for doc in results
-            ]
+        """
+        Loads the chats from the database, including messages that are only in the message log so far.
+        The returned user carries the shard version, which `upsert_chat_user` checks.
+        """
+        shard = self._shard(user)
+        with shard.reading() as db:
+            doc = self._chat_doc(db)
+            chat_user = ChatUser.from_dict(doc, id=doc.doc_id) if doc else ChatUser(None, user, [])
+            for chat_thread in chat_user.chats:
+                self._replay(chat_thread.messages, shard.log.read(chat_thread.id), ChatMessage)
+            chat_user.version = shard.version()
+        self._remember_threads(user, [chat_thread.id for chat_thread in chat_user.chats])
+        return chat_user
 
-            if len(documents_with_ids) > 1:
-                raise ValueError("More than one chat user found", len(documents_with_ids) )
-            else:
-                return documents_with_ids[0]
+    @staticmethod
+    def _first_message(chat: dict, log: MessageLog) -> str:
+        """Whole message the thread's preview is cut from, the log is only read if the document has no user message."""
+
+        def messages():
+            yield from ((message["role"], message["content"]) for message in chat["messages"])
+            # The first exchange of a thread can still be in the message log only.
+            yield from ((message.role, message.content) for _, message in log.read(chat["id"]))
+
+        return thread_preview(messages(), length=None)
+
+    @staticmethod
+    def _summary(chat: dict, first_message: str) -> ChatThreadSummary:
+        return ChatThreadSummary(chat["id"], chat["title"], chat["created_date"], first_message[:PREVIEW_CHARS])
+
+    def list_thread_summaries(self, user: str) -> List[ChatThreadSummary]:
+        """Lists the user's threads straight from the cached document, no message objects are built."""
+        shard = self._shard(user)
+        with shard.reading() as db:
+            return [self._summary(chat, self._first_message(chat, shard.log)) for chat in self._chats(db)]
+
+    def page_thread_summaries(
+        self, user: str, offset: int, limit: int, search: str = ""
+    ) -> Tuple[List[ChatThreadSummary], int]:
+        """
+        Newest-first page of summaries whose title or whole first message contains `search`, like SQLiteAccess.
+        A search is answered by the thread summaries of the search index, without one only the threads on the page
+        are summarised.
+        """
+        shard = self._shard(user)
+        with shard.reading() as db:
+            if search:
+                return self._search_index().page_threads(user, offset, limit, search)
+
+            chats = self._chats(db)
+            stop = max(len(chats) - offset, 0)
+            page = chats[max(stop - limit, 0) : stop]
+            summaries = [self._summary(chat, self._first_message(chat, shard.log)) for chat in reversed(page)]
+            return summaries, len(chats)
+
+    def load_thread(self, thread_id: str) -> Optional[ChatThread]:
+        """Loads one thread, including messages that are only in the message log so far."""
+        shard = self._thread_shard(thread_id)
+        if shard is None:
+            return None
+        with shard.reading() as db:
+            chat = self._find_chat(db, thread_id)
+            if chat is None:
+                return None
+            chat_thread = ChatThread.from_dict(chat)
+            self._replay(chat_thread.messages, shard.log.read(thread_id), ChatMessage)
+            return chat_thread
+
+    def search(self, user: str, query: str, limit: int = 20) -> List[SearchHit]:
+        """Ranked full-text search over the user's messages and templates, served by the search index."""
+        return self._search_index().search(user, query, limit)
+
+    # Writes
 
     def upsert_chat_user(self, chat_user: ChatUser):
-        """Updates or creates a chat_user in the database."""
+        """
+        Updates or creates a chat_user in the database.
 
-        with TinyDB(self.db_path) as db:
-            if chat_user.id is None:
-                db.table("chat_threads").insert(asdict(chat_user))
+        :raises ValueError: If the user was loaded with `load_chat_user` and the shard has been written since, by
+            this or another process, including messages appended to the log. Load the user again and reapply the
+            change.
+        """
+        shard = self._shard(chat_user.user)
+        index = self._search_index()
+        with shard.writing() as db:
+            version = shard.version()
+            if chat_user.version is not None and chat_user.version != version:
+                raise ValueError(
+                    "Chat user was changed since it was loaded", chat_user.user, chat_user.version, version
+                )
+
+            doc = self._chat_doc(db)
+            stored = self._indexed_threads(shard, doc["chats"] if doc is not None else [])
+            chats = self.convert_dataclass_to_dict(chat_user.chats)
+            if doc is None:
+                chat_user.id = db.table("chat_threads").insert({"user": chat_user.user, "chats": chats})
             else:
-                db.table("chat_threads").upsert(Document({"chats": self.convert_dataclass_to_dict(chat_user.chats)}, doc_id=chat_user.id))
+                db.table("chat_threads").upsert(Document({"user": chat_user.user, "chats": chats}, doc_id=doc.doc_id))
+                chat_user.id = doc.doc_id
+
+            self._index_changed_threads(index, chat_user, stored)
+            shard.commit()
+            chat_user.version = shard.version()
+        self._remember_threads(chat_user.user, [chat_thread.id for chat_thread in chat_user.chats])
+
+    @staticmethod
+    def _indexed_threads(shard: UserShard, chats: List[dict]) -> Dict[str, Tuple[str, List[Tuple[str, str]]]]:
+        """The title and (role, content) pairs, logged ones included, the index holds for each stored thread."""
+        threads = {}
+        for chat in chats:
+            messages = [(message["role"], message["content"]) for message in chat["messages"]]
+            TinyDBAccess._replay(messages, shard.log.read(chat["id"]), lambda role, content: (role, content))
+            threads[chat["id"]] = (chat["title"], messages)
+        return threads
+
+    @staticmethod
+    def _index_changed_threads(
+        index: SearchIndex, chat_user: ChatUser, stored: Dict[str, Tuple[str, List[Tuple[str, str]]]]
+    ) -> None:
+        """
+        Brings the index from the `stored` threads to the user's threads. Messages appended to a thread are added,
+        a thread whose title or earlier messages changed is indexed again and a removed thread is dropped. The
+        thread summaries are replaced, they are one row per thread.
+        """
+        summaries = []
+        for chat_thread in chat_user.chats:
+            messages = [(message.role, message.content) for message in chat_thread.messages]
+            title, indexed = stored.pop(chat_thread.id, (None, None))
+            start_position = 0
+            if indexed is not None:
+                if title == chat_thread.title and messages[: len(indexed)] == indexed:
+                    start_position = len(indexed)
+                else:
+                    index.delete_thread(chat_thread.id)
+            if len(messages) > start_position:
+                index.add_messages(
+                    chat_user.user, chat_thread.id, chat_thread.title, start_position, messages[start_position:]
+                )
+            summaries.append((chat_thread.id, chat_thread.title, chat_thread.created_date, messages))
+        for thread_id in stored:
+            index.delete_thread(thread_id)
+        index.set_threads(chat_user.user, summaries)
 
     def upsert_prompt_template(self, user: str, template: PromptTemplate):
         """Updates or creates a template in the database."""
 
-        with TinyDB(self.db_path) as db:
+        index = self._search_index()
+        with self._shard(user).writing() as db:
             if template.id is None:
-                db.table("prompt_template").insert(
+                template.id = db.table("prompt_template").insert(
                     {
                         "user": user,
                         "name": template.name,
@@ -145,13 +424,120 @@ class TinyDBAccess:
                 )
             else:
                 db.table("prompt_template").upsert(
-                    Document({"name": template.name, "text": template.text}, doc_id=template.id)
+                    Document({"user": user, "name": template.name, "text": template.text}, doc_id=template.id)
                 )
+            index.set_template(user, str(template.id), template.name, template.text)
+
+    @staticmethod
+    def _replay(messages: list, logged: List[Tuple[int, ChatMessage]], factory) -> bool:
+        """Appends logged messages that are not in `messages` yet, built with `factory`. Returns True on change."""
+        changed = False
+        for position, message in logged:
+            if position == len(messages):
+                messages.append(factory(role=message.role, content=message.content))
+                changed = True
+        return changed
+
+    def create_thread(self, user: str, chat_thread: ChatThread) -> None:
+        """Adds a new thread, with the messages it already has, to the user's chats."""
+        index = self._search_index()
+        with self._shard(user).writing() as db:
+            table = db.table("chat_threads")
+            doc = self._chat_doc(db)
+            if doc is not None:
+                table.update({"chats": doc["chats"] + [chat_thread.to_dict()]}, doc_ids=[doc.doc_id])
+            else:
+                table.insert({"user": user, "chats": [chat_thread.to_dict()]})
+            index.add_thread(
+                user, chat_thread.id, chat_thread.title, chat_thread.created_date,
+                ((message.role, message.content) for message in chat_thread.messages),
+            )  # fmt: skip
+        self._remember_threads(user, [chat_thread.id])
+
+    def append_messages(self, thread_id: str, messages: List[ChatMessage]) -> None:
+        """
+        Appends messages to an existing thread by writing only them to the user's message log.
+
+        The cost does not depend on the size of the history, except for an occasional compaction once the log
+        exceeds `compact_bytes`.
+        """
+        shard = self._thread_shard(thread_id)
+        if shard is None:
+            raise ValueError("Unknown chat thread", thread_id)
+        index = self._search_index()
+        with shard.writing() as db:
+            chat = self._find_chat(db, thread_id)
+            if chat is None:
+                raise ValueError("Unknown chat thread", thread_id)
+            start_position = max(len(chat["messages"]), shard.log.next_position(thread_id))
+            shard.log.append(thread_id, start_position, messages)
+            index.add_messages(
+                shard.user, thread_id, chat["title"], start_position,
+                ((message.role, message.content) for message in messages),
+            )  # fmt: skip
+
+            if shard.log.size() > self.compact_bytes:
+                self._compact(shard, db)
+
+    def delete_thread(self, thread_id: str) -> None:
+        shard = self._thread_shard(thread_id)
+        if shard is not None:
+            with shard.writing() as db:
+                doc = self._chat_doc(db)
+                if doc is not None:
+                    chats = [chat for chat in doc["chats"] if chat["id"] != thread_id]
+                    db.table("chat_threads").update({"chats": chats}, doc_ids=[doc.doc_id])
+        self._search_index().delete_thread(thread_id)
+
+    def compact(self, user: Optional[str] = None) -> None:
+        """Folds the message log of the user, or of every user, into their document and empties it."""
+        for name in [user] if user is not None else self.users():
+            shard = self._shard(name)
+            with shard.writing() as db:
+                self._compact(shard, db)
+
+    @staticmethod
+    def _compact(shard: UserShard, db: TinyDB) -> None:
+        """Must be called inside `shard.writing()`."""
+        doc = TinyDBAccess._chat_doc(db)
+        if doc is not None:
+            logged_threads = set(shard.log.threads())
+            chats, changed = [], False
+            for chat in doc.get("chats", []):
+                if chat["id"] in logged_threads:
+                    chat = {**chat, "messages": list(chat["messages"])}
+                    changed |= TinyDBAccess._replay(chat["messages"], shard.log.read(chat["id"]), dict)
+                chats.append(chat)
+            if changed:
+                db.table("chat_threads").update({"chats": chats}, doc_ids=[doc.doc_id])
+
+        # The log may only be emptied once its messages are on disk in the document.
+        shard.commit(force=True)
+        shard.log.clear()
+
+    def rebuild_search_index(self) -> None:
+        """Indexes every shard again, e.g. after a shard file was edited by hand."""
+        self._rebuild_search_index(self._search_index())
+
+    def _rebuild_search_index(self, index: SearchIndex) -> None:
+        index.clear()
+        for user in self.users():
+            shard = self._shard(user)
+            with shard.reading() as db:
+                summaries = []
+                for chat in self._chats(db):
+                    messages = [(message["role"], message["content"]) for message in chat["messages"]]
+                    self._replay(messages, shard.log.read(chat["id"]), lambda role, content: (role, content))
+                    index.add_messages(user, chat["id"], chat["title"], 0, messages)
+                    summaries.append((chat["id"], chat["title"], chat["created_date"], messages))
+                index.set_threads(user, summaries)
+                for doc in db.table("prompt_template").all():
+                    index.set_template(user, str(doc.doc_id), doc["name"], doc["text"])
 
     def convert_dataclass_to_dict(self, obj):
         if isinstance(obj, list):
             return [self.convert_dataclass_to_dict(item) for item in obj]
         elif isinstance(obj, ChatUser) or isinstance(obj, ChatThread) or isinstance(obj, ChatMessage):
-            return asdict(obj)
+            return obj.to_dict()
         else:
-            return obj
\ No newline at end of file
+            return obj
@@ -0,0 +1,199 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from tinydb import TinyDB
+from tinydb.middlewares import Middleware
+from tinydb.table import Document
+
+from data.file_lock import FileLock
+from data.message_log import MessageLog
+from data.tinydb_storage import CodecStorage, database_file
+
+
+USERS_DIR = "users"
+META_TABLE = "_meta"
+
+
+def shard_directory(db_dir: str, user: str) -> str:
+    """Directory of the user's shard."""
+    return os.path.join(db_dir, USERS_DIR, shard_name(user))
+
+
+def shard_name(user: str) -> str:
+    """Directory name of the user's shard. It is percent-encoded, so any user name maps to one safe directory."""
+    return quote(user, safe="")
+
+
+def shard_user(directory_name: str) -> str:
+    return unquote(directory_name)
+
+
+class DocumentCache(Middleware):
+    """Keeps the shard document in memory and writes it only on `flush`, and only if a write changed it."""
+
+    def __init__(self, storage_cls):
+        super().__init__(storage_cls)
+        self.data: Optional[dict] = None
+        self.loaded = False
+        self.modified = False
+
+    def read(self) -> Optional[dict]:
+        if not self.loaded:
+            self.data, self.loaded = self.storage.read(), True
+        return self.data
+
+    def write(self, data: dict) -> None:
+        self.data, self.loaded, self.modified = data, True, True
+
+    def flush(self) -> None:
+        if self.modified:
+            self.storage.write(self.data)
+            self.modified = False
+
+    def close(self) -> None:
+        """Closes the file without writing, unflushed changes are dropped."""
+        self.storage.close()
+
+
+class UserShard:
+    """One user's TinyDB document and message log, shared by every TinyDBAccess of the process.
+
+    Processes coordinate through an advisory lock file in the shard directory: `reading` holds it shared and
+    `writing` exclusively. Both first compare the document's file stamp with the one last seen and reload the
+    document and the log when another process changed them, so the in-memory copy is never stale while locked.
+    Every `writing` block that changed the document writes it to the OS and bumps the shard's version before the
+    lock is released. The file is forced to stable storage after `sync_writes` such writes or `sync_seconds`, and by
+    `sync`, so a burst of writes costs one fsync instead of one each.
+
+    The version counts the log's entries on top of the number stored in the document, so appends to the log move
+    it as well. Every commit stores a number above the current version, which keeps it increasing when a
+    compaction empties the log.
+    """
+
+    def __init__(self, db_dir: str, user: str, codec: str, sync_writes: int = 50, sync_seconds: float = 2.0):
+        self.user = user
+        self.directory = shard_directory(db_dir, user)
+        self.codec = codec
+        self.db_path = database_file(self.directory, codec)
+        self.lock_path = os.path.join(self.directory, ".lock")
+        self.sync_writes = sync_writes
+        self.sync_seconds = sync_seconds
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._exclusive = False
+        self._db: Optional[TinyDB] = None
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._unsynced = 0
+        self._unsynced_since = 0.0
+        # Opened on the first locked access, indexing may truncate a torn tail and must not race a writer.
+        self.log: Optional[MessageLog] = None
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.db_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _refresh(self) -> None:
+        if self.log is None:
+            self.log = MessageLog(os.path.join(self.directory, "messages.log"))
+
+        stamp = self._file_stamp()
+        if self._db is None or stamp != self._stamp:
+            self._discard()
+            self._db = TinyDB(self.db_path, codec=self.codec, fsync=False, storage=DocumentCache(CodecStorage))
+            self._stamp = stamp
+            # A rewritten document may have absorbed (compacted) the log, index it from scratch.
+            self.log.refresh(reload=True)
+        else:
+            self.log.refresh()
+
+    def _discard(self) -> None:
+        """Drops the in-memory document without writing it, the next access reads it from disk."""
+        if self._db is not None:
+            self._sync()
+            self._db.storage.close()
+            self._db = None
+
+    @contextmanager
+    def _locked(self, shared: bool) -> Iterator[TinyDB]:
+        with self._lock:
+            if self._depth:
+                # Nested in a block of this thread that already holds the file lock.
+                if not shared and not self._exclusive:
+                    raise RuntimeError("Cannot write inside a read block of the same shard")
+                self._depth += 1
+                try:
+                    yield self._db
+                finally:
+                    self._depth -= 1
+                return
+
+            with FileLock(self.lock_path, shared=shared):
+                self._refresh()
+                self._depth, self._exclusive = 1, not shared
+                try:
+                    yield self._db
+                    if not shared:
+                        self.commit()
+                except BaseException:
+                    # Changes of a failed block are never written, not even by a later block.
+                    self._discard()
+                    raise
+                finally:
+                    self._depth, self._exclusive = 0, False
+
+    def reading(self):
+        """Context manager yielding the up-to-date document, other processes may read but not write meanwhile."""
+        return self._locked(shared=True)
+
+    def writing(self):
+        """Context manager yielding the up-to-date document for changes written to disk when the block exits."""
+        return self._locked(shared=False)
+
+    def version(self) -> int:
+        """Changes whenever the document or the log is written. Must be called inside `reading` or `writing`."""
+        meta = self._db.table(META_TABLE).get(doc_id=1)
+        return (meta["version"] if meta else 0) + self.log.count()
+
+    def commit(self, force: bool = False) -> None:
+        """
+        Writes the changes of the current `writing` block now instead of when it exits.
+
+        :param force: Bump the version even if the document is unchanged, required before the log is emptied.
+        """
+        if not self._db.storage.modified and not force:
+            return
+        self._db.table(META_TABLE).upsert(Document({"version": self.version() + 1}, doc_id=1))
+        self._db.storage.flush()
+        self._stamp = self._file_stamp()
+
+        if not self._unsynced:
+            self._unsynced_since = time.monotonic()
+        self._unsynced += 1
+        if self._unsynced >= self.sync_writes or time.monotonic() - self._unsynced_since >= self.sync_seconds:
+            self._sync()
+
+    def sync(self) -> None:
+        """Forces the document writes so far to stable storage, e.g. once per batch of writes."""
+        with self._lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        if self._unsynced and self._db is not None:
+            self._db.storage.storage.sync()
+        self._unsynced = 0
+
+    def exists(self) -> bool:
+        return os.path.exists(self.db_path)
+
+    def close(self) -> None:
+        with self._lock:
+            self._discard()
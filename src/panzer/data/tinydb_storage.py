@@ -0,0 +1,88 @@
+import os
+import json
+from typing import Callable, Dict, Optional, Tuple
+
+from tinydb.storages import Storage
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib codec
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional, only needed for the msgpack codec
+    msgpack = None
+
+
+Codec = Tuple[Callable[[dict], bytes], Callable[[bytes], dict]]
+
+
+def _json_codec() -> Codec:
+    return (lambda data: json.dumps(data).encode("utf-8"), lambda raw: json.loads(raw))
+
+
+def _orjson_codec() -> Codec:
+    if orjson is None:
+        return _json_codec()
+    return (lambda data: orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS), orjson.loads)
+
+
+def _msgpack_codec() -> Codec:
+    if msgpack is None:
+        raise ImportError("The msgpack codec requires the msgpack package")
+    return (lambda data: msgpack.packb(data, use_bin_type=True), lambda raw: msgpack.unpackb(raw, raw=False))
+
+
+# codec name -> (file extension, codec factory)
+CODECS: Dict[str, Tuple[str, Callable[[], Codec]]] = {
+    "json": ("json", _json_codec),
+    "orjson": ("json", _orjson_codec),
+    "msgpack": ("msgpack", _msgpack_codec),
+}
+
+
+def database_file(db_dir: str, codec: str) -> str:
+    """Path of the database file for the codec. JSON codecs share db.json, so switching between them is free."""
+    return f"{db_dir}/db.{CODECS[codec][0]}"
+
+
+class CodecStorage(Storage):
+    """TinyDB storage that reads and writes the whole document with a pluggable codec.
+
+    `orjson` writes the same file format as TinyDB's JSONStorage several times faster and falls back to the stdlib
+    when orjson is not installed. `msgpack` writes a smaller binary file and requires msgpack.
+    """
+
+    def __init__(self, path: str, codec: str = "orjson", create_dirs: bool = False, fsync: bool = True):
+        """:param fsync: Force every write to stable storage, otherwise only to the OS until `sync` is called."""
+        if codec not in CODECS:
+            raise ValueError("Invalid storage codec", codec)
+        self.path = path
+        self.fsync = fsync
+        self._encode, self._decode = CODECS[codec][1]()
+        if create_dirs:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._handle = open(path, "r+b" if os.path.exists(path) else "w+b")
+
+    def read(self) -> Optional[dict]:
+        self._handle.seek(0)
+        raw = self._handle.read()
+        if not raw:
+            return None
+        return self._decode(raw)
+
+    def write(self, data: dict) -> None:
+        self._handle.seek(0)
+        self._handle.write(self._encode(data))
+        self._handle.truncate()
+        self._handle.flush()
+        if self.fsync:
+            os.fsync(self._handle.fileno())
+
+    def sync(self) -> None:
+        """Forces the writes so far to stable storage."""
+        os.fsync(self._handle.fileno())
+
+    def close(self) -> None:
+        self._handle.close()
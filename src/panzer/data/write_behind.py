@@ -0,0 +1,336 @@
+import atexit
+import logging
+import threading
+import itertools
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Callable, Deque, List, Optional, Tuple, TypeVar
+
+from data.base_storage import BaseStorage, thread_preview
+from shared.data_class.chat_message import ChatMessage
+from shared.data_class.chat_thread import ChatThread
+from shared.data_class.chat_thread_summary import ChatThreadSummary
+from shared.data_class.chat_user import ChatUser
+from shared.data_class.prompt_template import PromptTemplate
+from shared.data_class.search_hit import SearchHit
+
+
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
+class Mutation:
+    """One pending write. `key` identifies what it changes, consecutive mutations of the same key may coalesce."""
+
+    kind: str
+    key: str
+    apply: Callable[[BaseStorage], None]
+    payload: object = None
+    count: int = 1
+    '''Number of submitted writes merged into this mutation'''
+    user: Optional[str] = None
+    '''User a create, user or template mutation belongs to, appends and deletes only know their thread'''
+
+
+class WriteBehindStorage(BaseStorage):
+    """Wraps a storage backend and performs its writes on a background worker.
+
+    Writes return as soon as their mutation record is queued, so storage time is no longer part of a page rerun.
+    Arguments are copied when queued, later changes by the caller do not leak into the pending write.
+
+    - Coalescing: a write is merged into the newest pending mutation when both touch the same thread, user or
+      template, e.g. the two appends of a chat turn or a thread created and appended to before it was written.
+    - Batching: the worker drains up to `batch_size` mutations at once and flushes the backend once per batch.
+    - Ordering: mutations are applied strictly in submission order by a single worker, so after a crash the store
+      holds a prefix of the submitted writes, never a later write without an earlier one.
+    - Reads: a read does not wait for the queue. It sees the backend with the pending mutations laid over it, so a
+      session still reads its own writes. It only waits for the pending mutations it cannot overlay, e.g. a delete
+      under a page of summaries or a new template whose id is not known yet.
+    - Barrier: `flush` blocks until everything submitted before it is written and flushed, for shutdown and callers
+      that need the writes on disk.
+    - Errors: a failed background write is raised as RuntimeError by the next write, `raise_errors` or `flush`,
+      whichever comes first, so it is never only logged.
+    """
+
+    def __init__(self, storage: BaseStorage, batch_size: int = 100):
+        self.storage = storage
+        self.batch_size = batch_size
+        self._pending: Deque[Mutation] = deque()
+        self._in_flight = 0
+        '''Number of mutations at the head of `_pending` the worker is applying, they no longer coalesce'''
+        self._condition = threading.Condition()
+        self._applying = threading.Lock()
+        '''Held while one mutation is applied or the backend is read, so reads never see half of a mutation'''
+        self._submitted = 0
+        self._applied = 0
+        self._errors: List[Exception] = []
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="storage-write-behind", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    # Queueing
+
+    def _submit(self, mutation: Mutation) -> None:
+        """:raises RuntimeError: An earlier write failed, `mutation` is not queued."""
+        self.raise_errors()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Storage is closed")
+            tail = self._pending[-1] if len(self._pending) > self._in_flight else None
+            if tail is not None and self._coalesce(tail, mutation):
+                tail.count += 1
+            else:
+                self._pending.append(mutation)
+            self._submitted += 1
+            self._condition.notify_all()
+
+    @staticmethod
+    def _coalesce(tail: Mutation, mutation: Mutation) -> bool:
+        """Merges `mutation` into the pending `tail` in place. Returns False if they must stay separate."""
+        if tail.key != mutation.key:
+            return False
+
+        if mutation.kind == "append" and tail.kind in ("append", "create"):
+            messages = tail.payload.messages if tail.kind == "create" else tail.payload
+            messages.extend(mutation.payload)
+            return True
+        if mutation.kind == tail.kind and mutation.kind in ("user", "template"):
+            # The newer full state replaces the older one.
+            tail.apply, tail.payload = mutation.apply, mutation.payload
+            return True
+        if mutation.kind == "delete" and tail.kind in ("append", "delete"):
+            tail.kind, tail.apply, tail.payload = mutation.kind, mutation.apply, mutation.payload
+            return True
+        return False
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending and self._closed:
+                    return
+                # A mutation stays queued, and visible to reads, until it is applied.
+                self._in_flight = min(self.batch_size, len(self._pending))
+                batch = list(itertools.islice(self._pending, self._in_flight))
+
+            for mutation in batch:
+                with self._applying:
+                    try:
+                        mutation.apply(self.storage)
+                    except Exception as error:
+                        logging.error("Write-behind %s of %s failed: %s", mutation.kind, mutation.key, error)
+                        self._record_error(error)
+                    with self._condition:
+                        self._pending.popleft()
+                        self._in_flight -= 1
+                        self._condition.notify_all()
+            try:
+                self.storage.flush()
+            except Exception as error:
+                logging.error("Write-behind flush failed: %s", error)
+                self._record_error(error)
+
+            with self._condition:
+                self._applied += sum(mutation.count for mutation in batch)
+                self._condition.notify_all()
+
+    def _record_error(self, error: Exception) -> None:
+        with self._condition:
+            self._errors.append(error)
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """
+        Waits until every write submitted so far is applied and flushed to disk.
+
+        :param timeout: Seconds to wait at most, None waits for as long as it takes.
+        :raises TimeoutError: The writes did not complete in time.
+        :raises RuntimeError: A write failed since errors were last raised, the error is attached as its cause.
+        """
+        self._wait(timeout)
+        self.raise_errors()
+
+    def _wait(self, timeout: Optional[float] = None) -> None:
+        with self._condition:
+            target = self._submitted
+            if not self._condition.wait_for(lambda: self._applied >= target, timeout):
+                raise TimeoutError("Pending writes were not flushed in time")
+
+    def raise_errors(self) -> None:
+        """
+        Raises the background errors collected so far, once, without waiting for the pending writes.
+
+        :raises RuntimeError: A write failed since errors were last raised, the error is attached as its cause.
+        """
+        with self._condition:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise RuntimeError(f"{len(errors)} background write(s) failed: {errors[0]}") from errors[0]
+
+    def pending(self) -> int:
+        """Number of submitted writes that are not on disk yet."""
+        with self._condition:
+            return self._submitted - self._applied
+
+    def close(self) -> None:
+        """Drains the queue, stops the worker and closes the wrapped backend."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._worker.join()
+        atexit.unregister(self.close)
+        self.storage.close()
+
+    # Writes
+
+    def create_thread(self, user: str, chat_thread: ChatThread) -> None:
+        snapshot = ChatThread(
+            chat_thread.title, chat_thread.created_date, list(chat_thread.messages), chat_thread.usage, chat_thread.id
+        )
+        apply = lambda storage: storage.create_thread(user, snapshot)  # noqa: E731
+        self._submit(Mutation("create", chat_thread.id, apply, snapshot, user=user))
+
+    def append_messages(self, thread_id: str, messages: List[ChatMessage]) -> None:
+        batch = list(messages)
+        self._submit(Mutation("append", thread_id, lambda storage: storage.append_messages(thread_id, batch), batch))
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._submit(Mutation("delete", thread_id, lambda storage: storage.delete_thread(thread_id)))
+
+    def upsert_chat_user(self, chat_user: ChatUser) -> None:
+        snapshot = ChatUser.from_dict(chat_user.to_dict())
+        snapshot.version = chat_user.version
+
+        def apply(storage: BaseStorage) -> None:
+            storage.upsert_chat_user(snapshot)
+            chat_user.id, chat_user.version = snapshot.id, snapshot.version
+
+        self._submit(Mutation("user", f"user:{chat_user.user}", apply, snapshot, user=chat_user.user))
+
+    def upsert_prompt_template(self, user: str, template: PromptTemplate) -> None:
+        snapshot = PromptTemplate(template.id, template.name, template.text)
+
+        def apply(storage: BaseStorage) -> None:
+            storage.upsert_prompt_template(user, snapshot)
+            template.id = snapshot.id
+
+        # New templates have no id yet, each one is its own mutation. TinyDB template ids are only unique per user.
+        key = f"template:{user}:{template.id}" if template.id is not None else f"template:new:{id(template)}"
+        self._submit(Mutation("template", key, apply, snapshot, user=user))
+
+    # Reads overlay the pending writes on the backend
+
+    def _read(
+        self, read: Callable[[BaseStorage, List[Mutation]], T], blocks: Callable[[Mutation], bool] = lambda _: False
+    ) -> T:
+        """
+        Calls `read` with the backend and copies of the pending mutations, oldest first, while no mutation is half
+        applied. Waits only as long as a pending mutation selected by `blocks` exists.
+        """
+        while True:
+            with self._applying:
+                with self._condition:
+                    pending = [self._copy(mutation) for mutation in self._pending]
+                if not any(blocks(mutation) for mutation in pending):
+                    return read(self.storage, pending)
+            with self._condition:
+                self._condition.wait_for(lambda: not any(blocks(mutation) for mutation in self._pending))
+
+    @staticmethod
+    def _copy(mutation: Mutation) -> Mutation:
+        """Copies what coalescing or the overlay change in place, user snapshots are only ever replaced."""
+        payload = mutation.payload
+        if mutation.kind == "create":
+            payload = ChatThread(payload.title, payload.created_date, list(payload.messages), payload.usage, payload.id)
+        elif mutation.kind == "append":
+            payload = list(payload)
+        elif mutation.kind == "template":
+            payload = PromptTemplate(payload.id, payload.name, payload.text)
+        return replace(mutation, payload=payload)
+
+    @staticmethod
+    def _summary(chat_thread: ChatThread) -> ChatThreadSummary:
+        pairs = [(message.role, message.content) for message in chat_thread.messages]
+        return ChatThreadSummary(chat_thread.id, chat_thread.title, chat_thread.created_date, thread_preview(pairs))
+
+    def initialize_database(self, user: str) -> None:
+        self._read(lambda storage, _: storage.initialize_database(user))
+
+    def load_templates(self, user: str) -> List[PromptTemplate]:
+        def read(storage: BaseStorage, pending: List[Mutation]) -> List[PromptTemplate]:
+            templates = storage.load_templates(user)
+            for mutation in pending:
+                if mutation.kind == "template" and mutation.user == user:
+                    templates = [mutation.payload if t.id == mutation.payload.id else t for t in templates]
+            return templates
+
+        # A new template is only listed once its id is known, otherwise updating it would store a copy.
+        def blocks(mutation: Mutation) -> bool:
+            return mutation.kind == "template" and mutation.user == user and mutation.payload.id is None
+
+        return self._read(read, blocks)
+
+    def load_chat_user(self, user: str) -> ChatUser:
+        # The returned version must be the stored one, or writing the user back would conflict with its own writes.
+        self._wait()
+        return self.storage.load_chat_user(user)
+
+    def list_thread_summaries(self, user: str) -> List[ChatThreadSummary]:
+        def read(storage: BaseStorage, pending: List[Mutation]) -> List[ChatThreadSummary]:
+            summaries = storage.list_thread_summaries(user)
+            for mutation in pending:
+                if mutation.kind == "create" and mutation.user == user:
+                    summaries.append(self._summary(mutation.payload))
+                elif mutation.kind == "delete":
+                    summaries = [summary for summary in summaries if summary.id != mutation.key]
+            return summaries
+
+        return self._read(read, lambda mutation: mutation.kind == "user")
+
+    def page_thread_summaries(
+        self, user: str, offset: int, limit: int, search: str = ""
+    ) -> Tuple[List[ChatThreadSummary], int]:
+        def read(storage: BaseStorage, pending: List[Mutation]) -> Tuple[List[ChatThreadSummary], int]:
+            # Pending threads are the newest ones, they come before every stored thread.
+            needle = search.lower()
+            created = [
+                self._summary(mutation.payload)
+                for mutation in reversed(pending)
+                if mutation.kind == "create" and mutation.user == user and self._matches(mutation.payload, needle)
+            ]
+            page = created[offset : offset + limit]
+            stored, total = storage.page_thread_summaries(
+                user, max(offset - len(created), 0), limit - len(page), search
+            )
+            return page + stored, total + len(created)
+
+        # Where a deleted thread was on the stored pages is unknown, a pending delete has to be written first.
+        return self._read(read, lambda mutation: mutation.kind in ("delete", "user"))
+
+    @staticmethod
+    def _matches(chat_thread: ChatThread, needle: str) -> bool:
+        first_message = thread_preview(((message.role, message.content) for message in chat_thread.messages), None)
+        return needle in chat_thread.title.lower() or needle in first_message.lower()
+
+    def load_thread(self, thread_id: str) -> Optional[ChatThread]:
+        def read(storage: BaseStorage, pending: List[Mutation]) -> Optional[ChatThread]:
+            chat_thread = storage.load_thread(thread_id)
+            for mutation in pending:
+                if mutation.key != thread_id:
+                    continue
+                if mutation.kind == "create":
+                    chat_thread = mutation.payload
+                elif mutation.kind == "append" and chat_thread is not None:
+                    chat_thread.messages.extend(mutation.payload)
+                elif mutation.kind == "delete":
+                    chat_thread = None
+            return chat_thread
+
+        return self._read(read, lambda mutation: mutation.kind == "user")
+
+    def search(self, user: str, query: str, limit: int = 20) -> List[SearchHit]:
+        # Served from the last written state, the index of pending messages is only built when they are written.
+        return self._read(lambda storage, _: storage.search(user, query, limit))
@@ -1,9 +1,14 @@
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class ChatMessage:
     role: str
     content: str
 
+    def to_dict(self) -> dict:
+        return {"role": self.role, "content": self.content}
 
+    @staticmethod
+    def from_dict(data: dict) -> "ChatMessage":
+        return ChatMessage(data["role"], data["content"])
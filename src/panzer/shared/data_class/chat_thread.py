@@ -1,14 +1,37 @@
-from dataclasses import dataclass, asdict
+import uuid
+from dataclasses import dataclass, field
 from typing import List
 from .chat_message import ChatMessage
 
 
-@dataclass
+@dataclass(slots=True)
 class ChatThread:
     title: str
     created_date: str
     messages: List[ChatMessage]
     usage: int
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    '''Stable identifier of the thread, used as its key in storage'''
 
     def messages_to_dict(self):
-        return [asdict(message) for message in self.messages]
+        return [{"role": message.role, "content": message.content} for message in self.messages]
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "created_date": self.created_date,
+            "usage": self.usage,
+            "messages": self.messages_to_dict(),
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> "ChatThread":
+        """Builds a thread from its stored form. Threads stored before ids existed get a new one."""
+        return ChatThread(
+            title=data["title"],
+            created_date=data["created_date"],
+            messages=[ChatMessage(message["role"], message["content"]) for message in data["messages"]],
+            usage=data["usage"],
+            id=data.get("id") or uuid.uuid4().hex,
+        )
@@ -0,0 +1,11 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class ChatThreadSummary:
+    """What the sidebar needs to list a thread, without its messages."""
+
+    id: str
+    title: str
+    created_date: str
+    preview: str
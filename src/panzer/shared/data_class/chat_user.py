@@ -3,9 +3,22 @@ from typing import List, Optional
 from .chat_thread import ChatThread
 
 
-@dataclass
+@dataclass(slots=True)
 class ChatUser:
     id: Optional[int]
     user: str
     chats: List[ChatThread]
+    version: Optional[int] = None
+    '''Storage version the user was loaded at, checked when it is written back. Not stored itself.'''
 
+    def to_dict(self) -> dict:
+        return {"id": self.id, "user": self.user, "chats": [chat.to_dict() for chat in self.chats]}
+
+    @staticmethod
+    def from_dict(data: dict, id: Optional[int] = None) -> "ChatUser":
+        """Builds a user from its stored form, `id` overrides the stored one (e.g. a TinyDB doc_id)."""
+        return ChatUser(
+            id=id if id is not None else data.get("id"),
+            user=data["user"],
+            chats=[ChatThread.from_dict(chat) for chat in data.get("chats", [])],
+        )
@@ -2,8 +2,15 @@ from dataclasses import dataclass
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class PromptTemplate:
     id: Optional[int]
     name: str
     text: str
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "name": self.name, "text": self.text}
+
+    @staticmethod
+    def from_dict(data: dict, id: Optional[int] = None) -> "PromptTemplate":
+        return PromptTemplate(id=id if id is not None else data.get("id"), name=data["name"], text=data["text"])
@@ -0,0 +1,18 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(slots=True)
+class SearchHit:
+    """One full-text search result, a chat message or a prompt template."""
+
+    kind: str
+    '''"message" or "template"'''
+    ref: str
+    '''Thread id of a message, template id of a template'''
+    title: str
+    snippet: str
+    score: float
+    '''Relevance, higher is better'''
+    position: Optional[int] = None
+    '''Position of a message in its thread'''
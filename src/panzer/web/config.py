@@ -49,6 +49,103 @@ DATABRICKS = "databricks"
 CHATS_PATH = "./data/chats"
 ASSETS_PATH = "./web/assets"
 DB_PATH = "./data/db"
+# "tinydb" keeps one locked file per user under users/, "sqlite" uses normalised tables in db.sqlite.
+# Both are safe for several server processes on one shared volume.
+# Existing data is copied over with `python -m data.migrate_tinydb_to_sqlite ./data/db`.
+DB_BACKEND = "tinydb"
+# TinyDB file codec: "json" (stdlib), "orjson" (same db.json, faster) or "msgpack" (db.msgpack, needs msgpack).
+DB_CODEC = "orjson"
+# Writes are queued and performed by a background worker in batches of up to DB_WRITE_BATCH, off the page rerun.
+DB_WRITE_BEHIND = True
+DB_WRITE_BATCH = 100
+# TinyDB writes reach the OS, and so other processes, before their lock is released. They are forced to stable
+# storage after DB_FLUSH_WRITES writes or DB_FLUSH_SECONDS seconds per user, and after every write-behind batch.
+DB_FLUSH_WRITES = 50
+DB_FLUSH_SECONDS = 2.0
+# Number of opened threads whose messages each session keeps in memory, the sidebar only holds summaries.
+HYDRATED_THREADS_MAX = 8
+# Threads per sidebar page, each rerun renders one page however long the history is.
+THREAD_PAGE_SIZE = 20
+# Full-text matches shown for a search, see BaseStorage.search.
+SEARCH_RESULTS_MAX = 10
+CACHE_PATH = "./data/cache"
+
+RESPONSE_CACHE_PATH = f"{CACHE_PATH}/responses.sqlite"
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RESPONSE_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+# Compressed transcription results keyed by the audio content, model and options.
+TRANSCRIPTION_CACHE_PATH = f"{CACHE_PATH}/transcriptions"
+TRANSCRIPTION_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Finished bulk transcription jobs, transcript included, are kept in memory this long for the Speech page.
+TRANSCRIPTION_JOB_TTL_SECONDS = 3600
+
+# Generated images are downloaded once into a content-addressed store and shown from disk afterwards.
+IMAGE_STORE_PATH = f"{CACHE_PATH}/images"
+IMAGE_STORE_MAX_BYTES = 1024 * 1024 * 1024
+IMAGE_CONCURRENCY = 4
+
+MODEL_CATALOGUE_PATH = f"{CACHE_PATH}/models"
+MODEL_CATALOGUE_TTL_SECONDS = 24 * 3600
+
+# Client-side quotas per provider, optionally overridden per model under "models".
+RATE_LIMITS = {
+    "TogetherAI": {"requests_per_minute": 600, "tokens_per_minute": 180_000},
+    "OpenAI": {"requests_per_minute": 500, "tokens_per_minute": 200_000},
+    "Azure": {
+        "requests_per_minute": 300,
+        "tokens_per_minute": 50_000,
+        "models": {"o1-preview": {"requests_per_minute": 50, "tokens_per_minute": 30_000}},
+    },
+    "Cohere": {"requests_per_minute": 100, "tokens_per_minute": 100_000},
+}
+RATE_LIMIT_HEADROOM = 0.95
+
+# Ordered (provider, model) routes tried with hedging and failover when the "Router" provider is selected.
+ROUTER_PROVIDER = "Router"
+ROUTING_GROUPS = {
+    "Llama 3.1 70B (TogetherAI, Azure fallback)": [
+        ("TogetherAI", "meta-llama/Meta-Llama-3.1-70B-Instruct-Turbo"),
+        ("Azure", "gpt-4o"),
+    ],
+    "GPT-4o mini (Azure, OpenAI fallback)": [
+        ("Azure", "gpt-4o-mini"),
+        ("OpenAI", "gpt-4o-mini"),
+    ],
+}
+HEDGE_AFTER_SECONDS = 5.0
+
+# Prometheus text endpoint for call telemetry, served next to Streamlit. It has no authentication, so it only
+# listens on the loopback interface. Set METRICS_HOST = "0.0.0.0" to let a scraper on another host reach it, and
+# restrict access to the port with a firewall or network policy.
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+TELEMETRY_CAPACITY = 10_000
+
+# Providers warmed up in background threads at server start, with the models to preload for each.
+# Readiness is reported on the metrics server at /health. Nothing is preloaded by default: warming a local
+# checkpoint imports torch and loads the weights on every start, e.g. about 3 GB for whisper-large-v3. Opt in with
+#     WARMUP_MODELS = {"Ollama": ["mistral"], "Transformers": ["openai/whisper-large-v3"]}
+WARMUP_MODELS = {}
+
+# Speech-to-text checkpoints offered on the Speech page. The distilled ones are several times faster on CPU.
+TRANSCRIPTION_MODELS = [
+    "openai/whisper-large-v3",
+    "distil-whisper/distil-large-v3",
+    "distil-whisper/distil-medium.en",
+    "distil-whisper/distil-small.en",
+]
+
+# Named InferenceProfile settings, compare them on a host with `python -m benchmarks.transcription_rtf`.
+TRANSCRIPTION_PROFILES = {
+    "default": {},
+    "cpu-int8": {"device": "cpu", "quantize": True},
+    "cpu-int8-compiled": {"device": "cpu", "quantize": True, "compile": True},
+}
+# Torch thread pools are process-wide and shared by every session and model, so they are set once from here when
+# the first speech model loads. None keeps torch's default, one intra-op thread per physical core.
+TORCH_INTRA_OP_THREADS = None
+TORCH_INTER_OP_THREADS = 1
 
 LOGO_CONFIG = {"image": f"{ASSETS_PATH}/surreal-logo-and-text.png", "icon_image": f"{ASSETS_PATH}/surreal-logo.jpg"}
 
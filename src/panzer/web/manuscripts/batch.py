@@ -0,0 +1,118 @@
+import json
+import streamlit as st
+from streamlit_extras.colored_header import colored_header
+
+from core.factory.model_factory import ModelFactory
+from core.models.base_model_client import BaseModelClient
+from core.models.rate_limited_model import RateLimitedModel
+from core.models.requests.chat_request import ChatRequest
+from core.models.responses.batch_chat_response import BatchChatResult
+from core.services.rate_limit.rate_limiter import get_rate_limiter
+from data.base_storage import BaseStorage
+from data.storage_factory import get_storage
+
+from web.config import (
+    SUPPORTED_MODELS,
+    DB_PATH,
+    DB_BACKEND,
+    DB_CODEC,
+    DB_WRITE_BEHIND,
+    DB_WRITE_BATCH,
+    DB_FLUSH_WRITES,
+    DB_FLUSH_SECONDS,
+    SYSTEM_PROMPT,
+    RATE_LIMITS,
+    RATE_LIMIT_HEADROOM,
+)
+
+
+colored_header(
+    label="Panzer of the Regiment",
+    description="Apply a prompt template to many inputs at once.",
+    color_name="blue-green-70",
+)
+
+
+@st.cache_resource
+def get_model_client(model_provider: str) -> BaseModelClient:
+    """Instantiate and return the model client using the ModelFactory, throttled by the shared rate limiter"""
+    model_factory = ModelFactory()
+    limiter = get_rate_limiter(RATE_LIMITS, RATE_LIMIT_HEADROOM)
+    return RateLimitedModel(model_factory.get_model(model_provider), model_provider, limiter)
+
+
+@st.cache_resource
+def get_storage_client(db_path: str) -> BaseStorage:
+    """Instantiate and return the storage backend selected by DB_BACKEND"""
+    client = get_storage(
+        DB_BACKEND, db_path, DB_CODEC, DB_WRITE_BEHIND, DB_WRITE_BATCH, DB_FLUSH_WRITES, DB_FLUSH_SECONDS
+    )
+    return client
+
+
+storage_client = get_storage_client(DB_PATH)
+
+
+def initialize_session_variables() -> None:
+    """Initializes session variables and loads user data."""
+
+    if "user" not in st.session_state:
+        st.session_state["user"] = "Emile"
+
+    if "batch_results" not in st.session_state:
+        st.session_state["batch_results"] = []
+
+    storage_client.initialize_database(st.session_state["user"])
+
+
+initialize_session_variables()
+templates = storage_client.load_templates(st.session_state["user"])
+
+with st.sidebar:
+    model_provider = st.selectbox("Provider:", SUPPORTED_MODELS.keys()) or "Ollama"
+    model_name = st.selectbox("Model:", SUPPORTED_MODELS[model_provider]) or "Ollama"
+    template_name = st.selectbox("Prompt Template:", [item.name for item in templates])
+    max_concurrency = st.slider("Concurrency", 1, 64, 8)
+
+inputs_file = st.file_uploader("Inputs, one per line", type=["txt", "csv"])
+inputs_text = st.text_area("Or paste inputs, one per line", height=200)
+
+run = st.button("Run batch", icon=":material/play_arrow:")
+if run:
+    raw = inputs_file.getvalue().decode("utf-8") if inputs_file else inputs_text
+    rows = [line for line in raw.splitlines() if line.strip()]
+    template_text = [t.text for t in templates if t.name == template_name][0]
+    system_message = {"role": "system", "content": SYSTEM_PROMPT.format(st.session_state["user"])}
+    requests = [
+        ChatRequest(model_name, [system_message, {"role": "user", "content": template_text.format(row)}])
+        for row in rows
+    ]
+
+    progress = st.progress(0.0, text=f"0 / {len(requests)}")
+    failures = 0
+
+    def report_progress(completed: int, total: int, result: BatchChatResult) -> None:
+        global failures
+        failures += result.error is not None
+        progress.progress(completed / total, text=f"{completed} / {total} ({failures} failed)")
+
+    client = get_model_client(model_provider)
+    results = client.chat_many(requests, max_concurrency=max_concurrency, on_progress=report_progress)
+    st.session_state["batch_results"] = [
+        {
+            "input": row,
+            "output": result.response.message.get("content") if result.response and not result.error else None,
+            "error": result.error,
+            "seconds": round(result.elapsed, 3),
+        }
+        for row, result in zip(rows, results)
+    ]
+
+if st.session_state["batch_results"]:
+    st.dataframe(st.session_state["batch_results"], use_container_width=True)
+    st.download_button(
+        "Download results",
+        json.dumps(st.session_state["batch_results"], indent=2),
+        file_name="batch_results.json",
+        mime="application/json",
+    )
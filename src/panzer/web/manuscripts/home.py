@@ -2,20 +2,54 @@ import streamlit as st
 from streamlit.runtime.uploaded_file_manager import UploadedFile
 from streamlit_extras.colored_header import colored_header
 from datetime import datetime
+from typing import List, Optional, Tuple
 
 
 from core.services.rag.rag_manager import RAGManager
 from core.services.rag.document_engine import DocumentEngine
 
 from core.factory.model_factory import ModelFactory
+from core.models.cached_model import CachedModel
+from core.models.rate_limited_model import RateLimitedModel
+from core.models.routing_model import RoutingModel, ModelRoute
+from core.services.cache.response_cache import ResponseCache
+from core.services.rate_limit.rate_limiter import get_rate_limiter
+from core.services.catalogue.model_catalogue import peek_catalogue
 from core.models.responses.model_response import ModelResponse
 from core.models.base_model_client import BaseModelClient
-from data.tinydb_access import TinyDBAccess
-from shared.data_class.chat_user import ChatUser
+from data.base_storage import BaseStorage
+from data.storage_factory import get_storage
+from data.thread_cache import ThreadCache
 from shared.data_class.chat_thread import ChatThread
+from shared.data_class.chat_thread_summary import ChatThreadSummary
+from shared.data_class.search_hit import SearchHit
 from shared.data_class.chat_message import ChatMessage
-
-from web.config import SUPPORTED_MODELS, ASSETS_PATH, DB_PATH, SYSTEM_PROMPT
+from shared.data_class.aimodel import AIModel
+
+from web.config import (
+    SUPPORTED_MODELS,
+    ASSETS_PATH,
+    DB_PATH,
+    DB_BACKEND,
+    DB_CODEC,
+    DB_WRITE_BEHIND,
+    DB_WRITE_BATCH,
+    DB_FLUSH_WRITES,
+    DB_FLUSH_SECONDS,
+    HYDRATED_THREADS_MAX,
+    THREAD_PAGE_SIZE,
+    SEARCH_RESULTS_MAX,
+    SYSTEM_PROMPT,
+    RESPONSE_CACHE_PATH,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RATE_LIMITS,
+    RATE_LIMIT_HEADROOM,
+    ROUTER_PROVIDER,
+    ROUTING_GROUPS,
+    HEDGE_AFTER_SECONDS,
+    MODEL_CATALOGUE_PATH,
+)
 
 from web.utils import encode_image
 
@@ -43,9 +77,45 @@ with maincol2:
 
 @st.cache_resource
 def get_model_client(model_provider: str) -> BaseModelClient:
-    """Instantiate and return the model client using the ModelFactory"""
+    """Instantiate and return the model client using the ModelFactory, throttled by the shared rate limiter"""
     model_factory = ModelFactory()
-    return model_factory.get_model(model_provider)
+    limiter = get_rate_limiter(RATE_LIMITS, RATE_LIMIT_HEADROOM)
+    return RateLimitedModel(model_factory.get_model(model_provider), model_provider, limiter)
+
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    """Instantiate and return the response cache shared by all sessions"""
+    return ResponseCache(RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL_SECONDS)
+
+
+@st.cache_resource
+def get_router_client(group_name: str) -> RoutingModel:
+    """Build a routing client over the configured routes of a routing group"""
+    routes = [
+        ModelRoute(provider, get_model_client(provider), route_model)
+        for provider, route_model in ROUTING_GROUPS[group_name]
+    ]
+    return RoutingModel(routes, hedge_after=HEDGE_AFTER_SECONDS)
+
+
+def get_chat_client(model_provider: str, model_name: str) -> BaseModelClient:
+    """Return the router for routing groups, otherwise the provider client"""
+    if model_provider == ROUTER_PROVIDER:
+        return get_router_client(model_name)
+    return get_model_client(model_provider)
+
+
+@st.cache_resource
+def get_cached_model_client(model_provider: str, model_name: str) -> BaseModelClient:
+    """Wrap the model client so that identical deterministic requests are served from the response cache"""
+    return CachedModel(get_chat_client(model_provider, model_name), model_provider, get_response_cache())
+
+
+def get_model_info(model_provider: str, model_name: str) -> Optional[AIModel]:
+    """Look up a model's capabilities in the cached catalogue, without building a client or any network call"""
+    index = peek_catalogue(model_provider, MODEL_CATALOGUE_PATH)
+    return index.get(model_name) if index else None
 
 
 @st.cache_resource
@@ -55,12 +125,33 @@ def get_rag_manager(model_provider: str):
 
 
 @st.cache_resource
-def get_tinydb_client(db_path: str) -> TinyDBAccess:
-    """Instantiate and return the TinyDB access client"""
-    client = TinyDBAccess(db_path)
+def get_storage_client(db_path: str) -> BaseStorage:
+    """Instantiate and return the storage backend selected by DB_BACKEND"""
+    client = get_storage(
+        DB_BACKEND, db_path, DB_CODEC, DB_WRITE_BEHIND, DB_WRITE_BATCH, DB_FLUSH_WRITES, DB_FLUSH_SECONDS
+    )
     return client
 
-tinydb_client = get_tinydb_client(DB_PATH)
+storage_client = get_storage_client(DB_PATH)
+
+
+def report_storage_errors() -> None:
+    """Shows writes of earlier reruns that failed in the background"""
+    try:
+        storage_client.raise_errors()
+    except RuntimeError as error:
+        st.error(f"The chat could not be saved: {error}")
+
+
+report_storage_errors()
+
+def start_new_thread() -> None:
+    """Makes an empty, not yet stored thread the current one"""
+    st.session_state["chat_thread"] = ChatThread(
+        title="", created_date=str(datetime.now()), usage=0, messages=[ChatMessage("system", SYSTEM_PROMPT.format(st.session_state["user"]))]
+    )
+    st.session_state["chat_thread_stored"] = False
+
 
 def initialize_session_variables() -> None:
     """Initializes session variables and loads user data."""
@@ -71,18 +162,22 @@ def initialize_session_variables() -> None:
     if "user" not in st.session_state:
         st.session_state["user"] = "Emile"
 
-    tinydb_client.initialize_database(st.session_state["user"])
+    storage_client.initialize_database(st.session_state["user"])
+
+    if "thread_cache" not in st.session_state:
+        st.session_state["thread_cache"] = ThreadCache(storage_client, HYDRATED_THREADS_MAX)
+
+    if "thread_page" not in st.session_state:
+        st.session_state["thread_page"] = 0
 
-    if "user_chats" not in st.session_state:
-        st.session_state["user_chats"] = tinydb_client.load_chat_user(st.session_state["user"])
+    if "thread_search" not in st.session_state:
+        st.session_state["thread_search"] = ""
 
     if "chat_thread" not in st.session_state:
-        st.session_state["chat_thread"] = ChatThread(
-            title="", created_date=str(datetime.now()), usage=0, messages=[ChatMessage("system", SYSTEM_PROMPT.format(st.session_state["user"]))]
-        )
+        start_new_thread()
 
     if "templates" not in st.session_state:
-        st.session_state["templates"] = tinydb_client.load_templates(st.session_state["user"])
+        st.session_state["templates"] = storage_client.load_templates(st.session_state["user"])
 
     if "model" not in st.session_state:
         st.session_state["model"] = None
@@ -105,19 +200,59 @@ def initialize_session_variables() -> None:
 initialize_session_variables()
 
 
-def update_chat_user():
+def update_chat_user(new_messages: List[ChatMessage]):
     """
-    Saves the current thread into the chat-user object
-    A quicksave function.
+    Persists the turn of the current thread.
+    A new thread is stored whole and listed in the sidebar, an existing one only gets the new messages appended.
+    The writes may still be pending when the turn ends, one that fails is shown by a later rerun.
     """
-    if st.session_state["chat_thread"] not in st.session_state["user_chats"].chats:
-        st.session_state["user_chats"].chats.append(st.session_state["chat_thread"])
-    else:
-        # overwrite existing one
-        for i, item in enumerate(st.session_state["user_chats"].chats):
-            if item == st.session_state["chat_thread"]:
-                st.session_state["user_chats"].chats[i] = st.session_state["chat_thread"]
-                break
+    chat_thread = st.session_state["chat_thread"]
+    try:
+        if st.session_state["chat_thread_stored"]:
+            storage_client.append_messages(chat_thread.id, new_messages)
+        else:
+            storage_client.create_thread(st.session_state["user"], chat_thread)
+            st.session_state["chat_thread_stored"] = True
+            st.session_state["thread_cache"].put(chat_thread)
+    except (RuntimeError, ValueError) as error:
+        st.error(f"The chat could not be saved: {error}")
+    invalidate_thread_listing()
+
+
+def invalidate_thread_listing():
+    """Makes the next sidebar render query storage again, after threads or messages were added or removed"""
+    st.session_state.pop("thread_listing", None)
+    st.session_state.pop("message_hits", None)
+
+
+def get_message_hits(query: str) -> List[SearchHit]:
+    """Returns the full-text matches in the user's messages, searched once per query and change of the history"""
+    cached = st.session_state.get("message_hits")
+    if cached is None or cached[0] != query:
+        hits = storage_client.search(st.session_state["user"], query, SEARCH_RESULTS_MAX)
+        cached = (query, [hit for hit in hits if hit.kind == "message"])
+        st.session_state["message_hits"] = cached
+    return cached[1]
+
+
+def get_thread_listing() -> Tuple[List[ChatThreadSummary], int]:
+    """
+    Returns the sidebar page and the number of matching threads.
+    Storage is only queried when the page, the search or the stored threads changed, other reruns reuse the result.
+    """
+    while True:
+        key = (st.session_state["thread_search"], st.session_state["thread_page"])
+        listing = st.session_state.get("thread_listing")
+        if listing is None or listing[0] != key:
+            summaries, total = storage_client.page_thread_summaries(
+                st.session_state["user"], key[1] * THREAD_PAGE_SIZE, THREAD_PAGE_SIZE, key[0]
+            )
+            listing = (key, summaries, total)
+            st.session_state["thread_listing"] = listing
+        if listing[1] or st.session_state["thread_page"] == 0:
+            return listing[1], listing[2]
+        # The page emptied, e.g. its last thread was deleted.
+        st.session_state["thread_page"] = (listing[2] - 1) // THREAD_PAGE_SIZE if listing[2] else 0
 
 
 def render_chats(chat_thread: ChatThread):
@@ -134,31 +269,57 @@ def render_chats(chat_thread: ChatThread):
                         st.markdown(item.content)
 
 
-def populate_chats(user_chats: ChatUser):
-    """Loads conversation from file memory"""
-    def load_conversation(i: int):
-        st.session_state["chat_thread"] = user_chats.chats[i]
-        render_chats(st.session_state["chat_thread"])
-
-    def delete_conversation(i: int):
-        del user_chats.chats[i]
-        tinydb_client.upsert_chat_user(user_chats)
-
-    for i, chat_thread in enumerate(user_chats.chats):
+def populate_chats():
+    """
+    Lists one page of thread summaries with a search box and page controls.
+    Every rerun renders at most THREAD_PAGE_SIZE tiles, a thread's messages are only loaded when it is opened.
+    """
+    def load_conversation(thread_id: str):
+        chat_thread = st.session_state["thread_cache"].get(thread_id)
+        if chat_thread is None:
+            invalidate_thread_listing()
+            return
+        st.session_state["chat_thread"] = chat_thread
+        st.session_state["chat_thread_stored"] = True
+        render_chats(chat_thread)
+
+    def delete_conversation(thread_id: str):
+        st.session_state["thread_cache"].discard(thread_id)
+        storage_client.delete_thread(thread_id)
+        if st.session_state["chat_thread"].id == thread_id:
+            # The next turn must not append to the deleted thread.
+            start_new_thread()
+        invalidate_thread_listing()
+
+    def reset_page():
+        st.session_state["thread_page"] = 0
+
+    def change_page(step: int):
+        st.session_state["thread_page"] += step
+
+    st.text_input(
+        "Search threads", key="thread_search", on_change=reset_page, placeholder="Search threads",
+        label_visibility="collapsed",
+    )  # fmt: skip
+    thread_summaries, total = get_thread_listing()
+    if not thread_summaries:
+        st.caption("No threads found." if st.session_state["thread_search"] else "No threads yet.")
+
+    for summary in thread_summaries:
         chat_tile_container = st.container()
         col_delete, colspace, col_load = st.columns((1, 2, 1))
         with chat_tile_container:
-            if chat_thread:
+            if summary:
                 colored_header(
                     label="",
-                    description=chat_thread.messages[1].content[:70],
+                    description=summary.preview,
                     color_name="blue-green-70",
                 )
                 col_load.button(
                     "",
                     on_click=load_conversation,
-                    args=(i,),
-                    key=i,
+                    args=(summary.id,),
+                    key=f"load_{summary.id}",
                     help="Load thread",
                     use_container_width=True,
                     icon=":material/arrow_right_alt:",
@@ -166,13 +327,38 @@ def populate_chats(user_chats: ChatUser):
                 col_delete.button(
                     "",
                     on_click=delete_conversation,
-                    args=(i,),
-                    key=i + 10000,
+                    args=(summary.id,),
+                    key=f"delete_{summary.id}",
                     help="Delete thread",
                     use_container_width=True,
                     icon=":material/delete:",
                 )
 
+    page = st.session_state["thread_page"]
+    pages = max((total + THREAD_PAGE_SIZE - 1) // THREAD_PAGE_SIZE, 1)
+    if pages > 1:
+        col_previous, col_page, col_next = st.columns((1, 2, 1))
+        col_previous.button(
+            "", on_click=change_page, args=(-1,), key="threads_previous", disabled=page == 0,
+            help="Newer threads", use_container_width=True, icon=":material/chevron_left:",
+        )  # fmt: skip
+        col_page.caption(f"Page {page + 1} of {pages} · {total} threads")
+        col_next.button(
+            "", on_click=change_page, args=(1,), key="threads_next", disabled=page >= pages - 1,
+            help="Older threads", use_container_width=True, icon=":material/chevron_right:",
+        )  # fmt: skip
+
+    if st.session_state["thread_search"]:
+        message_hits = get_message_hits(st.session_state["thread_search"])
+        if message_hits:
+            st.caption("Found in messages")
+        for hit in message_hits:
+            col_snippet, col_load = st.columns((3, 1))
+            col_snippet.markdown(hit.snippet)
+            col_load.button(
+                "", on_click=load_conversation, args=(hit.ref,), key=f"hit_{hit.ref}_{hit.position}",
+                help="Load thread", use_container_width=True, icon=":material/arrow_right_alt:",
+            )  # fmt: skip
 
 
 
@@ -192,11 +378,21 @@ def file_uploader():
 
 voice_enabled = False
 with st.sidebar:
-    model_provider = st.selectbox("Provider:", SUPPORTED_MODELS.keys()) or "Ollama"
-    model_name = st.selectbox("Model:", SUPPORTED_MODELS[model_provider]) or "Ollama"
+    model_provider = st.selectbox("Provider:", [*SUPPORTED_MODELS.keys(), ROUTER_PROVIDER]) or "Ollama"
+    if model_provider == ROUTER_PROVIDER:
+        model_name = st.selectbox("Routing group:", ROUTING_GROUPS.keys()) or ""
+    else:
+        model_name = st.selectbox("Model:", SUPPORTED_MODELS[model_provider]) or "Ollama"
+        model_info = get_model_info(model_provider, model_name)
+        if model_info:
+            st.caption(
+                f"{model_info.context_length} token context · "
+                f"${model_info.price_input:.2f}/mil in · ${model_info.price_output:.2f}/mil out"
+            )
     template_name = st.selectbox("Prompt Template:", [item.name for item in st.session_state["templates"]])
     st.divider()
     voice_enabled = st.toggle("Voice Mode")
+    cache_enabled = st.toggle("Cache Responses", help="Reuse answers to identical prompts. Forces temperature to 0.")
     hyperparameters_enabled = st.toggle("Hyperparameters")
     if hyperparameters_enabled:
         temp = st.slider("Temperature", 0.0, 1.0, 0.5, 0.1)
@@ -207,7 +403,7 @@ with st.sidebar:
     side_chats_container = st.container()
     side_chats_container.empty()
     with side_chats_container:
-        populate_chats(st.session_state["user_chats"])
+        populate_chats()
 
 
 def evaluate_image(templated_message: str, image_type: str):
@@ -243,6 +439,8 @@ def handle_model_response(model_response: ModelResponse):
         st.error(model_response.message["content"])
     else:
         st.session_state["total_tokens_used"] = model_response.usage["total_tokens"]
+        st.session_state["cache_hit"] = bool(model_response.metadata and model_response.metadata.get("cache") == "hit")
+        st.session_state["route"] = model_response.metadata.get("route") if model_response.metadata else None
         update_conversation(ChatMessage(role=model_response.message["role"], content=model_response.message["content"],))
 
 
@@ -302,15 +500,19 @@ def process_query(query_string: str) -> str:
                 working_chat_hist = st.session_state["chat_thread"].messages.copy()
                 working_chat_hist.append(message_data)
 
+            stored_messages = len(st.session_state["chat_thread"].messages)
             update_conversation(ChatMessage(role="user", content=templated_message))
             render_chats(st.session_state["chat_thread"])
-            client = get_model_client(model_provider)
             chats = working_chat_hist if working_chat_hist else st.session_state["chat_thread"].messages_to_dict()
-            model_response = client.chat(model_name, chats)
+            if cache_enabled:
+                client = get_cached_model_client(model_provider, model_name)
+                model_response = client.chat(model_name, chats, temperature=0)
+            else:
+                client = get_chat_client(model_provider, model_name)
+                model_response = client.chat(model_name, chats)
             handle_model_response(model_response)
 
-            update_chat_user() # update local chat user
-            tinydb_client.upsert_chat_user(st.session_state["user_chats"])
+            update_chat_user(st.session_state["chat_thread"].messages[stored_messages:])
 
             # if voice_enabled:
             #     status.update(label="Weaving resonance...", state="running", expanded=False)
@@ -335,3 +537,7 @@ if query := st.chat_input("O Panzer of the Lake, what is your wisdom?"):
     else:
         st.chat_message("ai", avatar=f"{ASSETS_PATH}/tank.jpeg").write(response)
         st.write("Total tokens:", st.session_state["total_tokens_used"])
+        if st.session_state.get("cache_hit"):
+            st.caption("Served from the response cache, no tokens were spent.")
+        if st.session_state.get("route"):
+            st.caption(f"Answered by {st.session_state['route']}")
@@ -1,13 +1,19 @@
+import os
+
 import streamlit as st
 from streamlit_extras.colored_header import colored_header
 
 from core.factory.model_factory import ModelFactory
 from core.models.responses.image_response import ImageResponse
 from core.models.base_model_client import BaseModelClient
+from core.services.batch.batch_images import iter_generate_images
+from core.services.cache.blob_store import BlobStore
 from data.tinydb_access import TinyDBAccess
-from core.models.togetherai_model import TogetherAIModel
 
 from web.config import (
+    IMAGE_CONCURRENCY,
+    IMAGE_STORE_MAX_BYTES,
+    IMAGE_STORE_PATH,
     SUPPORTED_IMAGE_MODELS,
 )
 
@@ -23,6 +29,9 @@ def set_session_variables() -> None:
     if "containers" not in st.session_state:
         st.session_state["containers"] = {}
 
+    if "gallery" not in st.session_state:
+        st.session_state["gallery"] = []
+
 
 set_session_variables()
 
@@ -30,6 +39,7 @@ set_session_variables()
 with st.sidebar:
     model_provider = st.selectbox("Provider:", SUPPORTED_IMAGE_MODELS.keys()) or "Ollama"
     model_name = st.selectbox("Model:", SUPPORTED_IMAGE_MODELS[model_provider]) or "Ollama"
+    image_count = st.number_input("Images:", min_value=1, max_value=8, value=1)
 
 
 @st.cache_resource
@@ -40,21 +50,41 @@ def get_model_client(model_provider: str, model_label: str) -> BaseModelClient:
     return model_client
 
 
+@st.cache_resource
+def get_image_store() -> BlobStore:
+    """Instantiate and return the image blob store shared by all sessions"""
+    return BlobStore(IMAGE_STORE_PATH, IMAGE_STORE_MAX_BYTES)
+
+
 # TODO: Save images to DB
 
 
-def generate_image(image_prompt: str):
-    """Generate image from prompt using model. Returns a URL"""
+def generate_images(image_prompt: str, n: int) -> None:
+    """Generate `n` images from the prompt concurrently, showing each as soon as it is stored on disk."""
     client = get_model_client(model_provider, model_name)
-    response = client.image(prompt=image_prompt, model_name=model_name)
-    return response.image_url
+    columns = st.columns(min(n, 4))
+    responses = iter_generate_images(
+        client, model_name, image_prompt, n, get_image_store(), max_concurrency=IMAGE_CONCURRENCY
+    )
+    for response in responses:
+        column = columns[response.metadata["index"] % len(columns)]
+        if response.path is None:
+            column.error(response.metadata["error"])
+            continue
+        column.image(response.path, caption=image_prompt)
+        st.session_state["gallery"].append({"prompt": image_prompt, "path": response.path})
 
 
 prompt = st.text_input("An image prompt")
 
 confirm = st.button("Generate", icon=":material/circle:")
+# Earlier images are rendered from the local store, so reruns do not touch the network. Evicted ones are skipped.
+gallery = [image for image in st.session_state["gallery"] if os.path.exists(image["path"])]
 if confirm and prompt:
-    with st.status("I'm thinking...", expanded=False) as status:
-        image = generate_image(prompt)
+    generate_images(prompt, image_count)
 
-    st.image(image, caption=prompt)
+if gallery:
+    st.divider()
+    columns = st.columns(4)
+    for i, image in enumerate(reversed(gallery)):
+        columns[i % 4].image(image["path"], caption=image["prompt"])
@@ -0,0 +1,47 @@
+import streamlit as st
+from streamlit_extras.colored_header import colored_header
+
+from core.services.telemetry.telemetry import get_telemetry
+from web.config import METRICS_HOST, METRICS_PORT
+
+colored_header(
+    label="Metrics",
+    description="Latency, token and retry telemetry for every model call since the server started.",
+    color_name="blue-green-70",
+)
+
+
+def format_seconds(value):
+    return f"{value * 1000:.0f} ms" if value is not None else "-"
+
+
+with st.sidebar:
+    window = st.selectbox("Window", ["5 minutes", "1 hour", "All buffered calls"], index=2)
+    window_seconds = {"5 minutes": 300, "1 hour": 3600, "All buffered calls": None}[window]
+    st.caption(f"Prometheus endpoint: {METRICS_HOST}:{METRICS_PORT}, path /metrics")
+    st.button("Refresh", icon=":material/refresh:")
+
+summary = get_telemetry().summary(window_seconds)
+if not summary:
+    st.info("No model calls recorded yet.")
+else:
+    rows = [
+        {
+            "Provider": provider,
+            "Model": model_name,
+            "Call": call,
+            "Calls": stats["count"],
+            "Errors": stats["errors"],
+            "Retries": stats["retries"],
+            "p50": format_seconds(stats["duration"][0.5]),
+            "p95": format_seconds(stats["duration"][0.95]),
+            "p99": format_seconds(stats["duration"][0.99]),
+            "TTFB p50": format_seconds(stats["ttfb"][0.5]),
+            "Prompt tokens": stats["prompt_tokens"],
+            "Completion tokens": stats["completion_tokens"],
+            "Request KB": round(stats["request_bytes"] / 1024, 1),
+            "Response KB": round(stats["response_bytes"] / 1024, 1),
+        }
+        for (provider, model_name, call), stats in summary.items()
+    ]
+    st.dataframe(rows, use_container_width=True, hide_index=True)
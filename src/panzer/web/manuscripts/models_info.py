@@ -5,10 +5,13 @@ from dataclasses import dataclass
 from typing import List, Dict, Optional
 from core.factory.model_factory import ModelFactory
 from core.models.base_model_client import BaseModelClient
+from core.services.catalogue.model_catalogue import ModelCatalogue, get_catalogue
 from shared.data_class.aimodel import AIModel
 
 from web.config import (
-    SUPPORTED_MODELS
+    SUPPORTED_MODELS,
+    MODEL_CATALOGUE_PATH,
+    MODEL_CATALOGUE_TTL_SECONDS,
 )
 
 colored_header(
@@ -35,6 +38,13 @@ def get_model_client(model_provider: str) -> BaseModelClient:
     model_factory = ModelFactory()
     return model_factory.get_model(model_provider)
 
+
+def get_model_catalogue(model_provider: str) -> ModelCatalogue:
+    """Return the catalogue shared by all sessions for the provider"""
+    return get_catalogue(
+        model_provider, get_model_client(model_provider), MODEL_CATALOGUE_PATH, MODEL_CATALOGUE_TTL_SECONDS
+    )
+
 # TODO: have a dropdown list for providers that when selected calls the list method for a specific model provider
 # and then shows all availble model as cards. Also be able to set preference of main model for the chat page
 
@@ -47,34 +57,26 @@ def model_card(model: AIModel):
     st.divider()
 model_provider = st.selectbox("Provider:", SUPPORTED_MODELS.keys()) or "Ollama"
 
-getm = st.button("Get Models")
-if getm:
-    model_client = get_model_client(model_provider)
-    st.session_state["models"] = model_client.models()
-    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(
-        ["Chat", "Image", "Embedding", "Code", "Language", "Moderation", "Rerank"]
-    )
-    for model in st.session_state["models"]:
-        if model.type == "chat":
-            with tab1:
-                model_card(model)
-        elif model.type == "image":
-            with tab2:
-                model_card(model)
-        elif model.type == "embedding":
-            with tab3:
-                model_card(model)
-        elif model.type == "code":
-            with tab4:
-                model_card(model)
-        elif model.type == "language":
-            with tab5:
-                model_card(model)
-        elif model.type == "moderation":
-            with tab6:
-                model_card(model)
-        elif model.type == "rerank":
-            with tab7:
+MODEL_TABS = {
+    "chat": "Chat",
+    "image": "Image",
+    "embedding": "Embedding",
+    "code": "Code",
+    "language": "Language",
+    "moderation": "Moderation",
+    "rerank": "Rerank",
+}
+
+col_get, col_refresh = st.columns((1, 1))
+getm = col_get.button("Get Models")
+refresh = col_refresh.button("Refresh", help="Fetch the latest model list from the provider")
+if getm or refresh:
+    catalogue = get_model_catalogue(model_provider)
+    if refresh:
+        catalogue.refresh()
+    index = catalogue.get()
+    tabs = st.tabs(list(MODEL_TABS.values()))
+    for tab, model_type in zip(tabs, MODEL_TABS):
+        with tab:
+            for model in index.by_type(model_type):
                 model_card(model)
-        else:
-            print(model)
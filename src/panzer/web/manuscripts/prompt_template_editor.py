@@ -2,8 +2,18 @@ import streamlit as st
 from streamlit_extras.colored_header import colored_header
 from shared.data_class.prompt_template import PromptTemplate
 
-from web.config import DB_PATH
-from data.tinydb_access import TinyDBAccess
+from web.config import (
+    DB_PATH,
+    DB_BACKEND,
+    DB_CODEC,
+    DB_WRITE_BEHIND,
+    DB_WRITE_BATCH,
+    DB_FLUSH_WRITES,
+    DB_FLUSH_SECONDS,
+    SEARCH_RESULTS_MAX,
+)
+from data.base_storage import BaseStorage
+from data.storage_factory import get_storage
 
 
 colored_header(
@@ -14,17 +24,30 @@ colored_header(
 
 
 @st.cache_resource
-def get_tinydb_client(db_path: str) -> TinyDBAccess:
-    """Instantiate and return the TinyDB access client"""
-    client = TinyDBAccess(db_path)
+def get_storage_client(db_path: str) -> BaseStorage:
+    """Instantiate and return the storage backend selected by DB_BACKEND"""
+    client = get_storage(
+        DB_BACKEND, db_path, DB_CODEC, DB_WRITE_BEHIND, DB_WRITE_BATCH, DB_FLUSH_WRITES, DB_FLUSH_SECONDS
+    )
     return client
 
 
-tinydb_client = get_tinydb_client(DB_PATH)
+storage_client = get_storage_client(DB_PATH)
+
+
+def report_storage_errors() -> None:
+    """Shows writes of earlier reruns that failed in the background"""
+    try:
+        storage_client.raise_errors()
+    except RuntimeError as error:
+        st.error(f"A template could not be saved: {error}")
+
+
+report_storage_errors()
 
 
 def refresh_session_templates():
-    st.session_state["user_templates"] = tinydb_client.load_templates(st.session_state["user"])
+    st.session_state["user_templates"] = storage_client.load_templates(st.session_state["user"])
 
 
 def init_session_states() -> None:
@@ -37,7 +60,7 @@ def init_session_states() -> None:
         st.session_state["edit"] = ""
 
     if "user_templates" not in st.session_state:
-        tinydb_client.initialize_database(st.session_state["user"])
+        storage_client.initialize_database(st.session_state["user"])
         refresh_session_templates()
 
 
@@ -59,7 +82,16 @@ def populate_template():
     def delete_template(i: int):
         pass
 
-    for i, prompt_template in enumerate(st.session_state["user_templates"]):
+    query = st.text_input("Search templates", placeholder="Search templates", label_visibility="collapsed")
+    templates = st.session_state["user_templates"]
+    if query:
+        hits = storage_client.search(st.session_state["user"], query, SEARCH_RESULTS_MAX)
+        matching = {hit.ref: hit for hit in hits if hit.kind == "template"}
+        templates = sorted(
+            (pt for pt in templates if str(pt.id) in matching), key=lambda pt: matching[str(pt.id)].score, reverse=True
+        )
+
+    for i, prompt_template in enumerate(templates):
         template_tile_container = st.container()
         col_load, col_delete = st.columns(2)
         if prompt_template.name == "None":
@@ -112,10 +144,13 @@ with edit_template_column:
             "name": title,
             "text": body,
         }
-        tinydb_client.upsert_prompt_template(
-            st.session_state["user"], PromptTemplate(None, name=new_template["name"], text=new_template["text"])
-        )
-        st.toast(f"Saved {title}", icon=":material/article:")
+        try:
+            storage_client.upsert_prompt_template(
+                st.session_state["user"], PromptTemplate(None, name=new_template["name"], text=new_template["text"])
+            )
+            st.toast(f"Saved {title}", icon=":material/article:")
+        except RuntimeError as error:
+            st.error(f"{title} could not be saved: {error}")
         refresh_session_templates()
 
     if update:
@@ -124,6 +159,9 @@ with edit_template_column:
             "name": title,
             "text": body,
         }
-        tinydb_client.upsert_prompt_template(st.session_state["user"], PromptTemplate(**updated_template))
-        st.toast(f"Updated {title}", icon=":material/ink_pen:")
+        try:
+            storage_client.upsert_prompt_template(st.session_state["user"], PromptTemplate(**updated_template))
+            st.toast(f"Updated {title}", icon=":material/ink_pen:")
+        except RuntimeError as error:
+            st.error(f"{title} could not be updated: {error}")
         refresh_session_templates()
@@ -4,9 +4,17 @@ import json
 
 from core.factory.model_factory import ModelFactory
 from core.models.responses.model_response import ModelResponse
-from panzer.core.models.base_model_client import BaseModelClient
-from data.tinydb_access import TinyDBAccess
-from core.models.transformers_model import TransformersModel
+from core.models.base_model_client import BaseModelClient
+from core.models.inference_profile import InferenceProfile
+from core.services.audio.transcription_queue import TranscriptionQueue
+from core.services.cache.transcription_cache import TranscriptionCache
+from web.config import (
+    TRANSCRIPTION_CACHE_MAX_BYTES,
+    TRANSCRIPTION_CACHE_PATH,
+    TRANSCRIPTION_JOB_TTL_SECONDS,
+    TRANSCRIPTION_MODELS,
+    TRANSCRIPTION_PROFILES,
+)
 
 
 colored_header(
@@ -22,11 +30,14 @@ def initialize_session_variables() -> None:
     if "result" not in st.session_state:
         st.session_state["result"] = ""
 
+    if "transcription_jobs" not in st.session_state:
+        st.session_state["transcription_jobs"] = []
+
 
 initialize_session_variables()
 
 
-# @st.cache_resource
+@st.cache_resource
 def get_model_client(model_provider: str, model_label: str) -> BaseModelClient:
     """Instantiate and return the model client using the ModelFactory"""
     model_factory = ModelFactory()
@@ -34,10 +45,39 @@ def get_model_client(model_provider: str, model_label: str) -> BaseModelClient:
     return model_client
 
 
-# @st.cache_resource
-# def load_model(transformer_model_client: TransformersModel) -> TransformersModel:
-#     return transformer_model_client.load_model(model_id="openai/whisper-large-v3")
+@st.cache_resource
+def get_transcription_cache() -> TranscriptionCache:
+    """Instantiate and return the transcription cache shared by all sessions"""
+    return TranscriptionCache(TRANSCRIPTION_CACHE_PATH, TRANSCRIPTION_CACHE_MAX_BYTES)
+
+
+def get_profile(profile_name: str) -> InferenceProfile:
+    return InferenceProfile.from_dict(profile_name, TRANSCRIPTION_PROFILES[profile_name])
+
 
+@st.cache_resource
+def get_transcription_queue(model_id: str, profile_name: str) -> TranscriptionQueue:
+    """One queue per model and profile in the process, so bulk jobs from every session share batches."""
+    transformer_model_client = get_model_client(model_provider="Transformers", model_label="whisper-v3-large")
+    profile = get_profile(profile_name)
+    return TranscriptionQueue(
+        lambda windows: transformer_model_client.transcribe_batch(windows, model_id, profile=profile),
+        batch_size=16,
+        cache=get_transcription_cache(),
+        cache_scope=transformer_model_client.cache_scope(model_id, profile),
+        job_ttl_s=TRANSCRIPTION_JOB_TTL_SECONDS,
+    )
+
+
+with st.expander("Inference settings"):
+    model_id = st.selectbox("Model", TRANSCRIPTION_MODELS, key="transcription_model")
+    profile_name = st.selectbox(
+        "Profile",
+        list(TRANSCRIPTION_PROFILES),
+        key="transcription_profile",
+        help="CPU profiles quantise the model to int8 and tune threading, compare them with the RTF benchmark.",
+    )
+profile = get_profile(profile_name)
 
 file = st.file_uploader("Upload your media.", type=["mp3", "mp4", "wav", "opus"], key="media")
 if file:
@@ -45,21 +85,79 @@ if file:
 
 # TODO: Add history for transcriptions - connect to tiny DB
 
+stream = st.toggle("Stream segments", value=True, help="Show the transcript segment by segment while it is produced.")
 confirm = st.button("Transcribe")
 if confirm and file:
     with st.status("I'm thinking...", expanded=False) as status:
         transformer_model_client = get_model_client(model_provider="Transformers", model_label="whisper-v3-large")
-        status.update(label="Loading model...", state="running", expanded=False)
+        # Imported here so opening the page does not import torch, the client above already loaded the module.
+        from core.models.transformers_model import TransformersModel
 
         # satisfy type checker
-        if isinstance(transformer_model_client, TransformersModel):
-            transformer_model_client.load_model(model_id="openai/whisper-large-v3")
-        else:
+        # The model is loaded by the first transcription call, a cached result does not need it at all.
+        if not isinstance(transformer_model_client.unwrap(), TransformersModel):
             raise TypeError(f"Expected a {TransformersModel} instance, but received a {type(transformer_model_client)}")
 
-        status.update(label="Running inference...", state="running", expanded=False)
-        result: dict = transformer_model_client.transcribe(bytes_data, "")
-        st.session_state["result"] = result["text"]
-
-    st.session_state["result"]
+        if not stream:
+            status.update(label="Running inference...", state="running", expanded=False)
+            result: dict = transformer_model_client.transcribe(
+                bytes_data, model_id, profile=profile, cache=get_transcription_cache()
+            )
+            st.session_state["result"] = result["text"]
+
+    if stream:
+        transcript = st.empty()
+        lines, texts = [], []
+        segments = transformer_model_client.transcribe_stream(
+            bytes_data, model_id, profile=profile, cache=get_transcription_cache()
+        )
+        for segment in segments:
+            minutes, seconds = divmod(int(segment.start), 60)
+            lines.append(f"`{minutes:02d}:{seconds:02d}` {segment.text}")
+            texts.append(segment.text)
+            transcript.markdown("\n\n".join(lines))
+        st.session_state["result"] = " ".join(texts)
+    else:
+        st.session_state["result"]
     st.audio(bytes_data)
+
+st.divider()
+st.subheader("Bulk transcription")
+files = st.file_uploader(
+    "Upload many files to transcribe them in the background.",
+    type=["mp3", "mp4", "wav", "opus"],
+    accept_multiple_files=True,
+    key="bulk_media",
+)
+if st.button("Queue files", disabled=not files):
+    queue = get_transcription_queue(model_id, profile_name)
+    for bulk_file in files:
+        job_id = queue.submit(bulk_file.name, bulk_file.getvalue())
+        st.session_state["transcription_jobs"].append((model_id, profile_name, job_id))
+
+
+@st.fragment(run_every=2)
+def show_transcription_jobs() -> None:
+    """Shows progress of this session's bulk jobs, refreshing on its own while the page stays interactive."""
+    if not st.session_state["transcription_jobs"]:
+        return
+
+    for entry in list(st.session_state["transcription_jobs"]):
+        queue_model_id, queue_profile_name, job_id = entry
+        job = get_transcription_queue(queue_model_id, queue_profile_name).get(job_id)
+        if job is None:
+            # Evicted by the queue once TRANSCRIPTION_JOB_TTL_SECONDS passed.
+            st.session_state["transcription_jobs"].remove(entry)
+            continue
+        progress = job.progress
+        label = f"{job.name}: {job.status}" + (f" ({progress:.0%})" if progress is not None else "")
+        st.progress(progress or 0.0, text=label)
+        if job.status == "failed":
+            st.error(job.error)
+        elif job.status == "done":
+            with st.expander(f"Transcript of {job.name}"):
+                st.write(job.text)
+                st.download_button("Download", job.text, file_name=f"{job.name}.txt", key=f"download_{job.id}")
+
+
+show_transcription_jobs()